@@ -20,6 +20,7 @@ st.set_page_config(
 # Import components - minimal imports at top level
 from components.auth import init_session_state, check_authentication, show_login_form, get_current_user, is_admin, logout_user, logout_admin
 from config.settings import COLORS, PLAN_FREE, PLAN_PRO, PLAN_PREMIUM, EMAIL_SHARING_WARNING
+from utils.tracing import span, traced
 
 
 @st.cache_data(ttl=3600, show_spinner=False)
@@ -321,8 +322,9 @@ def render_debug_info():
         """, unsafe_allow_html=True)
 
 
+@traced("app.rerun")
 def main():
-    """Main application entry point - OPTIMIZED."""
+    """Main application entry point - OPTIMIZED. Each rerun is one trace when tracing is on."""
     # Initialize session state ONCE
     init_session_state()
     
@@ -341,29 +343,30 @@ def main():
     current_page = st.session_state.get("current_page", "home")
     
     # Page routing - LAZY IMPORTS to reduce startup time
-    if current_page == "home":
-        from pages.home import render_home_page
-        render_home_page()
-    elif current_page == "upload":
-        from pages.upload_reviewer import render_upload_page
-        render_upload_page()
-    elif current_page == "practice":
-        from pages.practice_exam import render_practice_page
-        render_practice_page()
-    elif current_page == "upgrade":
-        from pages.upgrade import render_upgrade_page
-        render_upgrade_page()
-    elif current_page == "admin_login":
-        render_admin_login_page()
-    elif current_page == "admin":
-        if is_admin():
-            from pages.admin_panel import render_admin_page
-            render_admin_page()
-        else:
+    with span("page.render", page=current_page):
+        if current_page == "home":
+            from pages.home import render_home_page
+            render_home_page()
+        elif current_page == "upload":
+            from pages.upload_reviewer import render_upload_page
+            render_upload_page()
+        elif current_page == "practice":
+            from pages.practice_exam import render_practice_page
+            render_practice_page()
+        elif current_page == "upgrade":
+            from pages.upgrade import render_upgrade_page
+            render_upgrade_page()
+        elif current_page == "admin_login":
             render_admin_login_page()
-    else:
-        from pages.home import render_home_page
-        render_home_page()
+        elif current_page == "admin":
+            if is_admin():
+                from pages.admin_panel import render_admin_page
+                render_admin_page()
+            else:
+                render_admin_login_page()
+        else:
+            from pages.home import render_home_page
+            render_home_page()
     
     # Debug info (comment out in production)
     # render_debug_info()
@@ -0,0 +1,116 @@
+"""
+LEPT AI Reviewer - clean_extracted_text Benchmark
+Compares the single-pass normalizer against the previous implementation on
+multi-megabyte extracted text, after checking both produce identical output.
+
+Usage:
+    python benchmarks/bench_clean_text.py [--size-mb 8] [--repeat 5]
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.document_processor import clean_extracted_text, clean_text_stream  # noqa: E402
+
+
+def legacy_clean_extracted_text(text: str) -> str:
+    """clean_extracted_text as it was before the single-pass rewrite."""
+    if not text:
+        return ""
+    lines = text.split('\n')
+    cleaned_lines = []
+    for line in lines:
+        line = line.strip()
+        if not line:
+            if cleaned_lines and cleaned_lines[-1] != "":
+                cleaned_lines.append("")
+            continue
+        if all(c in '.-_=*#' for c in line.replace(' ', '')):
+            continue
+        cleaned_lines.append(line)
+    cleaned_text = '\n'.join(cleaned_lines)
+    while '\n\n\n' in cleaned_text:
+        cleaned_text = cleaned_text.replace('\n\n\n', '\n\n')
+    return cleaned_text.strip()
+
+
+WORDS = ("teacher learner curriculum assessment pedagogy motivation development "
+         "Piaget Vygotsky constructivism rubric formative summative LEPT Filipino").split()
+
+
+def make_pages(size_bytes: int, seed: int = 7) -> list:
+    """Page texts shaped like scanned-PDF output: prose, dot leaders, rules and long blank runs."""
+    rng = random.Random(seed)
+    pages, total = [], 0
+    while total < size_bytes:
+        lines = []
+        for _ in range(rng.randint(30, 60)):
+            kind = rng.random()
+            if kind < 0.6:
+                lines.append("  " + " ".join(rng.choice(WORDS) for _ in range(rng.randint(4, 16))) + "  ")
+            elif kind < 0.7:
+                lines.append("Chapter " + str(rng.randint(1, 20)) + " " + "." * rng.randint(10, 60) + " " + str(rng.randint(1, 300)))
+            elif kind < 0.8:
+                lines.append(rng.choice("-=_*#.") * rng.randint(5, 80))
+            else:
+                lines.extend([rng.choice(["", "   ", "\t"])] * rng.randint(1, 40))
+        page = "\n".join(lines)
+        pages.append(page)
+        total += len(page)
+    return pages
+
+
+def best_of(repeat: int, fn, *args) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(*args)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def check_equivalence(samples: int = 2000, seed: int = 11):
+    """Fuzz small inputs (blank runs, separator lines, odd whitespace) against the legacy output."""
+    rng = random.Random(seed)
+    alphabet = ["a", "b", " ", "\t", "\n", "\n", "\n", ".", "-", "_", "=", "*", "#", "\r", "\x0c", "x y"]
+    for _ in range(samples):
+        text = "".join(rng.choice(alphabet) for _ in range(rng.randint(0, 60)))
+        expected = legacy_clean_extracted_text(text)
+        assert clean_extracted_text(text) == expected, repr(text)
+        parts = text.split("\n\n")
+        assert clean_text_stream(parts) == legacy_clean_extracted_text("\n\n".join(parts)), repr(text)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size-mb", type=float, default=8.0, help="Size of the generated text")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per implementation (best is reported)")
+    args = parser.parse_args()
+
+    check_equivalence()
+
+    pages = make_pages(int(args.size_mb * 1024 * 1024))
+    text = "\n\n".join(pages)
+    assert clean_extracted_text(text) == legacy_clean_extracted_text(text)
+    assert clean_text_stream(pages) == legacy_clean_extracted_text(text)
+
+    legacy = best_of(args.repeat, legacy_clean_extracted_text, text)
+    single_pass = best_of(args.repeat, clean_extracted_text, text)
+    streamed = best_of(args.repeat, clean_text_stream, pages)
+
+    print(f"Input: {len(text) / 1024 / 1024:.1f} MB, {text.count(chr(10)) + 1:,} lines, {len(pages):,} pages "
+          f"(best of {args.repeat})")
+    print(f"{'implementation':<32}{'seconds':>10}{'speedup':>10}")
+    for name, seconds in (("legacy clean_extracted_text", legacy),
+                          ("clean_extracted_text", single_pass),
+                          ("clean_text_stream (per page)", streamed)):
+        print(f"{name:<32}{seconds:>10.3f}{legacy / seconds:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,366 @@
+"""
+LEPT AI Reviewer - Concurrent Session Load Test
+Drives the real app headlessly with Streamlit's AppTest: each simulated
+student is its own session (own session_state) that logs in through the
+login form (get_or_create_user), then keeps switching between the home,
+practice, upload and generate-questions views; optional admin sessions
+render the admin panel (every tab).
+
+Each session runs in its own process: AppTest installs a process-global
+mock Runtime on every run, so two sessions can't run concurrently in one
+process. The sessions therefore share the database but NOT a server's
+in-process state - connection pool, query caches, rate limiters, question
+bank, write-behind queue. What this measures is page latency with N
+concurrent clients on the shared backends (like N single-user servers),
+not contention inside one Streamlit server. Every process imports
+Streamlit, so budget roughly 150 MB of memory per session.
+
+Snowflake is replaced by SQLite with the same schema (each request sleeps
+--db-latency to model the round trip) behind the real connection pool, and
+OpenAI by a stub that answers after --openai-latency seconds. See
+benchmarks/local_backends.py.
+
+Reports per-view p50/p95/p99 latency, throughput and DB queries per page
+view (session-attributed; background writes are reported separately),
+summed over all session processes.
+
+Usage:
+    python benchmarks/load_test.py [--sessions 20] [--duration 60] [--db-latency 0.05]
+                                   [--openai-latency 2.0] [--premium-fraction 0.5] [--json out.json]
+"""
+
+import argparse
+import json
+import math
+import multiprocessing
+import os
+import queue
+import random
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from typing import Any, Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.local_backends import install_local_backends, seed_database  # noqa: E402
+
+APP_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app.py")
+
+# Relative frequency of each student view after login
+STUDENT_VIEWS = {"home": 2, "practice": 4, "generate": 3, "upload": 1}
+
+
+def percentile(values: List[float], q: float) -> float:
+    """Nearest-rank percentile of an unsorted list."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, math.ceil(q * len(ordered)) - 1))]
+
+
+class Recorder:
+    """Thread-safe collection of (view, seconds, db_queries, error) samples."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.samples: Dict[str, List[tuple]] = defaultdict(list)
+
+    def add(self, view: str, seconds: float, queries: int, error: bool):
+        with self._lock:
+            self.samples[view].append((seconds, queries, error))
+
+
+class SimulatedSession:
+    """One browser tab: an AppTest instance with its own session state."""
+
+    def __init__(self, email: str, ip_address: str, recorder: Recorder, timeout: float, admin: bool = False):
+        from streamlit.testing.v1 import AppTest
+
+        self.email = email
+        self.admin = admin
+        self.recorder = recorder
+        self.at = AppTest.from_file(APP_PATH, default_timeout=timeout)
+        self.at.secrets["openai"] = {"api_key": "sk-load-test"}
+        self.at.secrets["admin"] = {"password": "load-test"}
+        # get_client_ip memoizes the resolved address here - give each session its own
+        self.at.session_state["client_ip"] = ip_address
+
+    def view(self, name: str, action=None):
+        """Time one rerun (optionally after interacting with a widget) and record it."""
+        self.at.session_state["db_query_count"] = 0
+        start = time.perf_counter()
+        error = False
+        try:
+            (action or self.at.run)()
+            error = bool(self.at.exception)
+        except Exception as e:
+            print(f"[{self.email}] {name} failed: {e}")
+            error = True
+        elapsed = time.perf_counter() - start
+        try:
+            queries = self.at.session_state["db_query_count"]
+        except Exception:
+            queries = 0
+        self.recorder.add(name, elapsed, queries, error)
+
+    def login(self):
+        self.view("login_form")
+
+        def submit():
+            self.at.text_input[0].input(self.email)
+            self.at.checkbox[0].check()
+            self._button("Start Reviewing").click()
+            self.at.run()
+
+        self.view("login", submit)
+        if self.admin:
+            self.at.session_state["is_admin"] = True
+
+    def open_page(self, page: str, view_name: str = None):
+        self._refresh_stale_tree()
+        self.at.session_state["current_page"] = page
+        self.view(view_name or page)
+
+    def generate(self):
+        if "current_page" not in self.at.session_state or self.at.session_state["current_page"] != "practice":
+            self.open_page("practice")
+        self._refresh_stale_tree()
+        button = self._button("Generate Practice Questions")
+        if button is None:
+            # Out of quota - the page shows the upgrade prompt instead
+            self.open_page("practice")
+            return
+        self.view("generate", lambda: button.click().run())
+
+    def _button(self, label: str):
+        return next((b for b in self.at.button if label in b.label), None)
+
+    def _refresh_stale_tree(self):
+        """
+        Untimed rerun without widget values when the element tree is stale.
+
+        After an st.rerun() that drops widgets (e.g. the practice form once a
+        free user runs out of questions), AppTest still holds those widgets
+        but their state is gone, and the next run() raises KeyError. A
+        browser never does this, so it isn't recorded.
+        """
+        try:
+            self.at._tree.get_widget_states()
+        except KeyError:
+            self.at._run()
+
+
+def run_student(session: SimulatedSession, deadline: float, think_time: float):
+    session.login()
+    views, weights = zip(*STUDENT_VIEWS.items())
+    while time.monotonic() < deadline:
+        view = random.choices(views, weights)[0]
+        if view == "generate":
+            session.generate()
+        else:
+            session.open_page(view)
+        time.sleep(random.uniform(0, 2 * think_time))
+
+
+def run_admin(session: SimulatedSession, deadline: float, think_time: float):
+    session.login()
+    while time.monotonic() < deadline:
+        session.open_page("admin")
+        time.sleep(random.uniform(0, 2 * think_time))
+
+
+def relax_abuse_limits():
+    """Every simulated student hammers generation; keep the per-account limiter out of the measurement."""
+    import services.abuse_guard as abuse_guard
+    for name in ("RATE_LIMIT_IP_GENERATIONS_PER_MINUTE", "RATE_LIMIT_IP_BURST",
+                 "RATE_LIMIT_EMAIL_GENERATIONS_PER_MINUTE", "RATE_LIMIT_EMAIL_BURST"):
+        setattr(abuse_guard, name, 1_000_000)
+
+
+def session_process(role: str, email: str, ip_address: str, index: int, db_path: str,
+                    options: Dict[str, Any], start_barrier, results):
+    """One session's process: install the backends, wait for every session, run, report."""
+    report = {"email": email, "samples": {}, "elapsed": 0.0}
+    try:
+        random.seed(options["seed"] + index)
+        stub = install_local_backends(db_path, db_latency=options["db_latency"],
+                                      openai_latency=options["openai_latency"])
+        if not options["keep_rate_limits"]:
+            relax_abuse_limits()
+        recorder = Recorder()
+        session = SimulatedSession(email, ip_address, recorder, options["timeout"], admin=role == "admin")
+        start_barrier.wait(timeout=options["startup_timeout"])
+
+        start = time.monotonic()
+        run = run_admin if role == "admin" else run_student
+        run(session, start + options["duration"], options["think_time"])
+        report["elapsed"] = time.monotonic() - start
+
+        from database.metrics import get_query_metrics
+        from database.write_behind import get_write_behind_queue
+        get_write_behind_queue().flush()  # Count this session's queued background writes too
+        metrics = get_query_metrics()
+        report.update(
+            samples=dict(recorder.samples),
+            db_queries_total=metrics.get_totals()["calls"],
+            statements=[{key: stmt[key] for key in ("fingerprint", "calls", "total_ms")}
+                        for stmt in metrics.get_statements()],
+            openai_calls=stub.calls,
+        )
+    except Exception as e:
+        report["error"] = f"{type(e).__name__}: {e}"
+        try:
+            start_barrier.abort()  # Don't leave the other sessions waiting for this one
+        except Exception:
+            pass
+    results.put(report)
+
+
+def merge_statements(reports: List[Dict], limit: int = 5) -> List[Dict]:
+    """Sum per-fingerprint calls/time across session processes; most total time first."""
+    merged: Dict[str, Dict] = {}
+    for report in reports:
+        for stmt in report.get("statements", []):
+            entry = merged.setdefault(stmt["fingerprint"], {"fingerprint": stmt["fingerprint"], "calls": 0, "total_ms": 0.0})
+            entry["calls"] += stmt["calls"]
+            entry["total_ms"] += stmt["total_ms"]
+    return sorted(merged.values(), key=lambda entry: -entry["total_ms"])[:limit]
+
+
+def summarize(recorder: Recorder, elapsed: float, reports: List[Dict]) -> Dict:
+    views = {}
+    all_samples = []
+    for view, samples in sorted(recorder.samples.items()):
+        seconds = [s[0] for s in samples]
+        all_samples.extend(samples)
+        views[view] = {
+            "count": len(samples),
+            "errors": sum(1 for s in samples if s[2]),
+            "p50_ms": percentile(seconds, 0.50) * 1000,
+            "p95_ms": percentile(seconds, 0.95) * 1000,
+            "p99_ms": percentile(seconds, 0.99) * 1000,
+            "max_ms": max(seconds) * 1000,
+            "queries_per_view": sum(s[1] for s in samples) / len(samples),
+        }
+    session_queries = sum(s[1] for s in all_samples)
+    total_queries = sum(report.get("db_queries_total", 0) for report in reports)
+    return {
+        "elapsed_seconds": elapsed,
+        "page_views": len(all_samples),
+        "throughput_views_per_second": len(all_samples) / elapsed if elapsed else 0.0,
+        "queries_per_view": session_queries / len(all_samples) if all_samples else 0.0,
+        "db_queries_total": total_queries,
+        "db_queries_background": max(0, total_queries - session_queries),
+        "views": views,
+        "top_statements": merge_statements(reports),
+        "openai_calls": sum(report.get("openai_calls", 0) for report in reports),
+        "failed_sessions": {report["email"]: report["error"] for report in reports if "error" in report},
+    }
+
+
+def print_report(report: Dict, args):
+    print(f"\n{args.sessions} student + {args.admin_sessions} admin sessions (one process each) "
+          f"for {report['elapsed_seconds']:.0f}s "
+          f"(db latency {args.db_latency * 1000:.0f}ms, OpenAI latency {args.openai_latency:.1f}s, "
+          f"think time {args.think_time:.1f}s)")
+    print(f"{'view':<14}{'count':>7}{'errors':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}{'queries':>9}")
+    for view, stats in report["views"].items():
+        print(f"{view:<14}{stats['count']:>7}{stats['errors']:>8}{stats['p50_ms']:>10.0f}{stats['p95_ms']:>10.0f}"
+              f"{stats['p99_ms']:>10.0f}{stats['max_ms']:>10.0f}{stats['queries_per_view']:>9.2f}")
+    print(f"\nThroughput: {report['throughput_views_per_second']:.2f} page views/s "
+          f"({report['page_views']} views)")
+    print(f"DB queries: {report['queries_per_view']:.2f} per page view, "
+          f"{report['db_queries_background']} more from background writers/refills")
+    for email, error in report["failed_sessions"].items():
+        print(f"Session {email} failed: {error}")
+    print("\nMost expensive statements:")
+    for statement in report["top_statements"]:
+        print(f"  {statement['calls']:>6} calls  {statement['total_ms']:>9.0f}ms total  {statement['fingerprint'][:90]}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=20, help="Concurrent student sessions")
+    parser.add_argument("--admin-sessions", type=int, default=1, help="Concurrent admin sessions")
+    parser.add_argument("--duration", type=float, default=60.0, help="Seconds to keep sessions busy")
+    parser.add_argument("--think-time", type=float, default=0.5, help="Mean pause between views, in seconds")
+    parser.add_argument("--db-latency", type=float, default=0.05, help="Simulated Snowflake round trip, in seconds")
+    parser.add_argument("--openai-latency", type=float, default=2.0, help="Simulated completion time, in seconds")
+    parser.add_argument("--premium-fraction", type=float, default=0.5,
+                        help="Share of students on PREMIUM (AI questions); the rest are FREE (presets)")
+    parser.add_argument("--timeout", type=float, default=120.0, help="Max seconds for one rerun")
+    parser.add_argument("--startup-timeout", type=float, default=300.0,
+                        help="Max seconds to wait for every session process to start")
+    parser.add_argument("--keep-rate-limits", action="store_true", help="Leave the per-IP/account limits on")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--json", help="Also write the report to this file")
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    db_path = os.path.join(tempfile.mkdtemp(prefix="lept_load_"), "lept.db")
+
+    from config.settings import PLAN_FREE, PLAN_PREMIUM, FREE_QUESTION_LIMIT
+    students = [f"student{i}@loadtest.example" for i in range(args.sessions)]
+    admins = [f"admin{i}@loadtest.example" for i in range(args.admin_sessions)]
+    premium_count = int(round(args.sessions * args.premium_fraction))
+    seed_database(db_path, [
+        (email, PLAN_PREMIUM if i < premium_count else PLAN_FREE, 9999 if i < premium_count else FREE_QUESTION_LIMIT)
+        for i, email in enumerate(students)
+    ] + [(email, PLAN_PREMIUM, 9999) for email in admins])
+
+    specs = [
+        ("student", email, f"10.0.{i // 250}.{i % 250 + 1}") for i, email in enumerate(students)
+    ] + [
+        ("admin", email, f"10.1.0.{i + 1}") for i, email in enumerate(admins)
+    ]
+    options = {
+        "seed": args.seed, "db_latency": args.db_latency, "openai_latency": args.openai_latency,
+        "keep_rate_limits": args.keep_rate_limits, "timeout": args.timeout, "duration": args.duration,
+        "think_time": args.think_time, "startup_timeout": args.startup_timeout,
+    }
+
+    # spawn: a fresh interpreter per session, nothing inherited from this one
+    context = multiprocessing.get_context("spawn")
+    start_barrier = context.Barrier(len(specs))
+    results = context.Queue()
+    processes = [
+        context.Process(target=session_process, daemon=True,
+                        args=(role, email, ip_address, i, db_path, options, start_barrier, results))
+        for i, (role, email, ip_address) in enumerate(specs)
+    ]
+    for process in processes:
+        process.start()
+
+    # Drain results before joining - a child can't exit while its report sits in the pipe
+    reports = []
+    wait = args.startup_timeout + args.duration + args.timeout + 60
+    for _ in processes:
+        try:
+            reports.append(results.get(timeout=wait))
+        except queue.Empty:
+            print("Timed out waiting for session processes")
+            break
+    for process in processes:
+        process.join(timeout=5)
+
+    recorder = Recorder()
+    for session_report in reports:
+        for view, samples in session_report["samples"].items():
+            for sample in samples:
+                recorder.add(view, *sample)
+    elapsed = max((session_report["elapsed"] for session_report in reports), default=0.0)
+
+    report = summarize(recorder, elapsed, reports)
+    print_report(report, args)
+    print(f"OpenAI stub calls: {report['openai_calls']}  |  SQLite database: {db_path}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2, default=str)
+
+
+if __name__ == "__main__":
+    main()
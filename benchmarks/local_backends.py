@@ -0,0 +1,424 @@
+"""
+LEPT AI Reviewer - Local Stand-ins for Load Testing
+A SQLite database with the app's Snowflake schema behind the real
+ConnectionPool, and a latency-configurable OpenAI stub, so benchmarks can
+drive the app without Snowflake or OpenAI credentials.
+
+The SQLite cursor accepts the Snowflake dialect the app actually sends:
+%s placeholders, CURRENT_TIMESTAMP(), multi-statement requests
+(num_statements, one result set per statement), sequence-backed
+SET NEW_ID = (SELECT SEQ.NEXTVAL) / $NEW_ID, and the
+MERGE ... USING (SELECT columnN AS X FROM VALUES ...) upserts.
+
+Usage:
+    from benchmarks.local_backends import install_local_backends
+    install_local_backends("/tmp/lept_bench.db", db_latency=0.05, openai_latency=2.0)
+"""
+
+import json
+import random
+import re
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from types import SimpleNamespace
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+
+# ============== SCHEMA ==============
+
+_NOW = "(datetime('now', 'localtime'))"
+
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS USERS (
+    EMAIL TEXT, IP_ADDRESS TEXT, PLAN_STATUS TEXT,
+    QUESTIONS_USED_TOTAL INTEGER DEFAULT 0, QUESTIONS_REMAINING INTEGER DEFAULT 0,
+    PREMIUM_EXPIRY TIMESTAMP, IS_BLOCKED BOOLEAN DEFAULT FALSE,
+    CREATED_AT TIMESTAMP DEFAULT {_NOW}, UPDATED_AT TIMESTAMP DEFAULT {_NOW},
+    PRESET_SEEN TEXT
+);
+CREATE INDEX IF NOT EXISTS USERS_EMAIL ON USERS (EMAIL);
+
+CREATE TABLE IF NOT EXISTS IP_USAGE (
+    IP_ADDRESS TEXT PRIMARY KEY, QUESTIONS_USED_TOTAL INTEGER DEFAULT 0,
+    FIRST_SEEN TIMESTAMP DEFAULT {_NOW}, LAST_SEEN TIMESTAMP DEFAULT {_NOW},
+    IS_BLOCKED BOOLEAN DEFAULT FALSE
+);
+
+CREATE TABLE IF NOT EXISTS USER_IP_HISTORY (
+    EMAIL TEXT, IP_ADDRESS TEXT,
+    FIRST_SEEN TIMESTAMP DEFAULT {_NOW}, LAST_SEEN TIMESTAMP DEFAULT {_NOW}
+);
+CREATE INDEX IF NOT EXISTS USER_IP_HISTORY_KEY ON USER_IP_HISTORY (EMAIL, IP_ADDRESS);
+CREATE INDEX IF NOT EXISTS USER_IP_HISTORY_SEEN ON USER_IP_HISTORY (LAST_SEEN);
+
+CREATE TABLE IF NOT EXISTS USAGE_LOGS (
+    EVENT_ID INTEGER PRIMARY KEY AUTOINCREMENT, EMAIL TEXT, IP_ADDRESS TEXT,
+    EVENT_TIME TIMESTAMP DEFAULT {_NOW}, QUESTIONS_GENERATED INTEGER,
+    SOURCE_TYPE TEXT, CATEGORY TEXT, DIFFICULTY TEXT, NOTES TEXT
+);
+
+CREATE TABLE IF NOT EXISTS USER_DOCUMENTS (
+    DOC_ID INTEGER PRIMARY KEY, EMAIL TEXT, FILE_NAME TEXT, FILE_TYPE TEXT,
+    STORAGE_PATH TEXT, TEXT_STAGE_PATH TEXT, TEXT_HASH TEXT, EXTRACTED_TEXT TEXT,
+    UPLOADED_AT TIMESTAMP DEFAULT {_NOW}, IS_DELETED BOOLEAN DEFAULT FALSE
+);
+CREATE INDEX IF NOT EXISTS USER_DOCUMENTS_EMAIL ON USER_DOCUMENTS (EMAIL);
+
+CREATE TABLE IF NOT EXISTS ADMIN_DOCUMENTS (
+    ADMIN_DOC_ID INTEGER PRIMARY KEY, FILE_NAME TEXT, FILE_TYPE TEXT, STORAGE_PATH TEXT,
+    TEXT_STAGE_PATH TEXT, FILE_CONTENT TEXT, EXTRACTED_TEXT TEXT, CATEGORY TEXT DEFAULT 'General',
+    IS_DOWNLOADABLE BOOLEAN DEFAULT FALSE, UPLOADED_BY TEXT, TEXT_HASH TEXT,
+    UPLOADED_AT TIMESTAMP DEFAULT {_NOW}, IS_DELETED BOOLEAN DEFAULT FALSE
+);
+
+CREATE TABLE IF NOT EXISTS PAYMENTS (
+    PAYMENT_ID INTEGER PRIMARY KEY, FULL_NAME TEXT, EMAIL TEXT, GCASH_REF TEXT,
+    PLAN_REQUESTED TEXT, RECEIPT_STORAGE_PATH TEXT, STATUS TEXT, ADMIN_NOTES TEXT,
+    SUBMITTED_AT TIMESTAMP DEFAULT {_NOW}, APPROVED_AT TIMESTAMP, APPROVED_BY TEXT
+);
+
+CREATE TABLE IF NOT EXISTS ADMIN_ACTIONS (
+    ACTION_ID INTEGER PRIMARY KEY AUTOINCREMENT, ADMIN_USER TEXT,
+    ACTION_TIME TIMESTAMP DEFAULT {_NOW}, ACTION_TYPE TEXT, DETAILS TEXT
+);
+
+CREATE TABLE IF NOT EXISTS INGESTION_JOBS (
+    JOB_ID TEXT PRIMARY KEY, OWNER_EMAIL TEXT, DOC_KIND TEXT, FILE_NAME TEXT, STORAGE_PATH TEXT,
+    STATUS TEXT DEFAULT 'QUEUED', PAGES_DONE INTEGER DEFAULT 0, PAGE_COUNT INTEGER DEFAULT 0,
+    DOC_ID INTEGER, ERROR_MESSAGE TEXT,
+    CREATED_AT TIMESTAMP DEFAULT {_NOW}, UPDATED_AT TIMESTAMP DEFAULT {_NOW}
+);
+
+CREATE TABLE IF NOT EXISTS QUESTION_BANK (
+    QUESTION_ID TEXT, EDUCATION_LEVEL TEXT, EXAM_COMPONENT TEXT, SPECIALIZATION TEXT,
+    DIFFICULTY TEXT, QUESTION_JSON TEXT, CREATED_AT TIMESTAMP DEFAULT {_NOW},
+    PRIMARY KEY (EDUCATION_LEVEL, EXAM_COMPONENT, SPECIALIZATION, DIFFICULTY, QUESTION_ID)
+);
+
+CREATE TABLE IF NOT EXISTS QUESTION_BANK_SERVED (
+    EMAIL TEXT, BANK_KEY TEXT, QUESTION_ID TEXT, SERVED_AT TIMESTAMP DEFAULT {_NOW}
+);
+CREATE INDEX IF NOT EXISTS QUESTION_BANK_SERVED_KEY ON QUESTION_BANK_SERVED (EMAIL, BANK_KEY);
+
+-- Stand-in for the Snowflake sequences in add_id_sequences.sql
+CREATE TABLE IF NOT EXISTS SEQUENCES (NAME TEXT PRIMARY KEY, VALUE INTEGER);
+INSERT OR IGNORE INTO SEQUENCES VALUES
+    ('USER_DOCUMENTS_ID_SEQ', 1000000), ('ADMIN_DOCUMENTS_ID_SEQ', 1000000), ('PAYMENTS_ID_SEQ', 1000000);
+"""
+
+
+def _register_sqlite_types():
+    sqlite3.register_adapter(datetime, lambda value: value.isoformat(" ", timespec="seconds"))
+    sqlite3.register_converter("TIMESTAMP", lambda raw: datetime.fromisoformat(raw.decode()))
+    sqlite3.register_converter("BOOLEAN", lambda raw: bool(int(raw)))
+
+
+def create_database(path: str):
+    """Create (or reuse) a SQLite file with the app schema."""
+    _register_sqlite_types()
+    db = sqlite3.connect(path)
+    try:
+        db.execute("PRAGMA journal_mode=WAL")
+        db.executescript(SCHEMA)
+        db.commit()
+    finally:
+        db.close()
+
+
+# ============== SNOWFLAKE DIALECT ON SQLITE ==============
+
+_STATUS_ROW = [("Statement executed successfully.",)]
+_SET_SEQUENCE_RE = re.compile(r"^SET\s+(\w+)\s*=\s*\(\s*SELECT\s+(\w+)\.NEXTVAL\s*\)$", re.I)
+_VARIABLE_RE = re.compile(r"\$(\w+)")
+_MERGE_RE = re.compile(
+    r"^MERGE\s+INTO\s+(?P<table>\w+)\s+t\s+USING\s+\(\s*SELECT\s+(?P<columns>.+?)\s+FROM\s+VALUES\s+"
+    r"(?P<values>.+)\)\s+s\s+ON\s+(?P<on>.+?)\s+(?P<clauses>WHEN\s.+)$",
+    re.I | re.S
+)
+_MATCHED_RE = re.compile(r"WHEN\s+MATCHED\s+THEN\s+UPDATE\s+SET\s+(.+?)(?=\s+WHEN\s+NOT\s+MATCHED|$)", re.I | re.S)
+_NOT_MATCHED_RE = re.compile(
+    r"WHEN\s+NOT\s+MATCHED\s+THEN\s+INSERT\s*\((?P<columns>[^)]*)\)\s*VALUES\s*\((?P<values>[^)]*)\)", re.I | re.S
+)
+
+
+def _to_sqlite(sql: str) -> str:
+    sql = re.sub(r"CURRENT_TIMESTAMP\(\)", "datetime('now', 'localtime')", sql, flags=re.I)
+    return sql.replace("%s", "?")
+
+
+def _split_top_level(text: str) -> List[str]:
+    """Split on commas outside parentheses."""
+    parts, depth, current = [], 0, []
+    for char in text:
+        if char == "(":
+            depth += 1
+        elif char == ")":
+            depth -= 1
+        if char == "," and depth == 0:
+            parts.append("".join(current).strip())
+            current = []
+        else:
+            current.append(char)
+    if "".join(current).strip():
+        parts.append("".join(current).strip())
+    return parts
+
+
+class SQLiteCursor:
+    """DB-API-ish cursor with the subset of snowflake.connector's interface the app uses."""
+
+    def __init__(self, conn: "SQLiteConnection"):
+        self._conn = conn
+        self._results: List[List[tuple]] = []
+        self._index = 0
+        self.rowcount = -1
+
+    def execute(self, query: str, params: Optional[Sequence] = None, num_statements: Optional[int] = None):
+        # One simulated network round trip per request, however many statements it holds
+        if self._conn.latency:
+            time.sleep(self._conn.latency)
+        params = list(params or ())
+        statements = [s for s in query.split(";\n") if s.strip()] if num_statements else [query]
+        self._results, self._index, self.rowcount = [], 0, 0
+        for statement in statements:
+            count = statement.count("%s")
+            statement_params, params = params[:count], params[count:]
+            rows, rowcount = self._conn.run(statement.strip(), statement_params)
+            self._results.append(rows)
+            self.rowcount += max(rowcount, 0)
+        return self
+
+    def fetchall(self) -> List[tuple]:
+        return self._results[self._index] if self._index < len(self._results) else []
+
+    def nextset(self) -> Optional[bool]:
+        self._index += 1
+        return True if self._index < len(self._results) else None
+
+    def close(self):
+        self._results = []
+
+
+class SQLiteConnection:
+    """One SQLite connection speaking enough Snowflake SQL for the app's queries."""
+
+    def __init__(self, path: str, latency: float = 0.0):
+        self.latency = latency
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None,
+                                   detect_types=sqlite3.PARSE_DECLTYPES, timeout=30)
+        self._db.execute("PRAGMA busy_timeout=30000")
+        self._variables: Dict[str, int] = {}
+        self._closed = False
+
+    # ---- snowflake.connector connection interface ----
+
+    def cursor(self) -> SQLiteCursor:
+        return SQLiteCursor(self)
+
+    def commit(self):
+        # Autocommit, like Snowflake; explicit BEGIN/COMMIT statements manage transactions
+        pass
+
+    def rollback(self):
+        if self._db.in_transaction:
+            self._db.execute("ROLLBACK")
+
+    def close(self):
+        self._closed = True
+        self._db.close()
+
+    def is_closed(self) -> bool:
+        return self._closed
+
+    # ---- statement execution ----
+
+    def run(self, sql: str, params: List) -> Tuple[List[tuple], int]:
+        """Run one statement; returns (result rows, rows affected)."""
+        keyword = sql.split(None, 1)[0].upper() if sql else ""
+
+        if keyword in ("BEGIN", "COMMIT", "ROLLBACK"):
+            self._db.execute("BEGIN IMMEDIATE" if keyword == "BEGIN" else keyword)
+            return _STATUS_ROW, 0
+
+        match = _SET_SEQUENCE_RE.match(sql)
+        if match:
+            name, sequence = match.groups()
+            self._db.execute("UPDATE SEQUENCES SET VALUE = VALUE + 1 WHERE NAME = ?", (sequence.upper(),))
+            self._variables[name.upper()] = self._db.execute(
+                "SELECT VALUE FROM SEQUENCES WHERE NAME = ?", (sequence.upper(),)
+            ).fetchone()[0]
+            return _STATUS_ROW, 0
+
+        sql = _VARIABLE_RE.sub(lambda m: str(self._variables[m.group(1).upper()]), sql)
+
+        if keyword == "MERGE":
+            return self._merge(sql, params)
+
+        cursor = self._db.execute(_to_sqlite(sql), params)
+        if cursor.description is not None:
+            return cursor.fetchall(), -1
+        # Snowflake answers DML with one row holding the affected row count
+        return [(cursor.rowcount,)], cursor.rowcount
+
+    def _merge(self, sql: str, params: List) -> Tuple[List[tuple], int]:
+        """MERGE ... USING (SELECT columnN AS X FROM VALUES ...) s as an UPDATE then an INSERT."""
+        match = _MERGE_RE.match(sql)
+        if not match:
+            raise sqlite3.OperationalError(f"Unsupported MERGE form: {sql[:80]}")
+        table = match["table"]
+        names = [re.split(r"\s+AS\s+", column, flags=re.I)[1].strip()
+                 for column in _split_top_level(match["columns"])]
+        source = f"WITH s({', '.join(names)}) AS (VALUES {match['values']}) "
+        on = match["on"]
+        updated = inserted = 0
+
+        self._db.execute("SAVEPOINT merge_statement")
+        try:
+            matched = _MATCHED_RE.search(match["clauses"])
+            if matched:
+                assignments = []
+                for assignment in _split_top_level(matched.group(1)):
+                    column, expression = assignment.split("=", 1)
+                    assignments.append(
+                        f"{column.strip()} = (SELECT {expression.strip()} FROM s WHERE {on} LIMIT 1)"
+                    )
+                # The target row is referenced as t inside the correlated subqueries
+                cursor = self._db.execute(
+                    _to_sqlite(f"{source}UPDATE {table} AS t SET {', '.join(assignments)} "
+                               f"WHERE EXISTS (SELECT 1 FROM s WHERE {on})"),
+                    params
+                )
+                updated = cursor.rowcount
+
+            not_matched = _NOT_MATCHED_RE.search(match["clauses"])
+            if not_matched:
+                cursor = self._db.execute(
+                    _to_sqlite(f"{source}INSERT INTO {table} ({not_matched['columns']}) "
+                               f"SELECT {not_matched['values']} FROM s "
+                               f"WHERE NOT EXISTS (SELECT 1 FROM {table} t WHERE {on})"),
+                    params
+                )
+                inserted = cursor.rowcount
+            self._db.execute("RELEASE merge_statement")
+        except Exception:
+            self._db.execute("ROLLBACK TO merge_statement")
+            self._db.execute("RELEASE merge_statement")
+            raise
+        # Snowflake reports (rows inserted, rows updated)
+        return [(inserted, updated)], inserted + updated
+
+
+# ============== OPENAI STUB ==============
+
+_COUNT_RE = re.compile(r"Generate exactly (\d+) questions", re.I)
+
+
+class StubOpenAI:
+    """
+    Stands in for openai.OpenAI: chat.completions.create sleeps for
+    `latency` seconds (+/- jitter) and returns `count` well-formed questions,
+    as one message or streamed in `stream_chunks` pieces spread over the
+    same time.
+    """
+
+    def __init__(self, latency: float = 2.0, jitter: float = 0.25, stream_chunks: int = 20):
+        self.latency = latency
+        self.jitter = jitter
+        self.stream_chunks = stream_chunks
+        self.calls = 0
+        self._lock = threading.Lock()
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def create(self, messages: List[Dict], stream: bool = False, **options):
+        with self._lock:
+            self.calls += 1
+        prompt = " ".join(m.get("content", "") for m in messages)
+        match = _COUNT_RE.search(prompt)
+        text = json.dumps(self._questions(int(match.group(1)) if match else 10))
+        delay = max(0.0, self.latency * random.uniform(1 - self.jitter, 1 + self.jitter))
+
+        if stream:
+            return self._stream(text, delay)
+        time.sleep(delay)
+        tokens = len(prompt) // 4 + len(text) // 4
+        return SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content=text))],
+            usage=SimpleNamespace(total_tokens=tokens),
+        )
+
+    def _stream(self, text: str, delay: float) -> Iterator:
+        size = max(1, len(text) // self.stream_chunks)
+        pieces = [text[i:i + size] for i in range(0, len(text), size)]
+        for piece in pieces:
+            time.sleep(delay / len(pieces))
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=piece))])
+
+    @staticmethod
+    def _questions(count: int) -> List[Dict]:
+        return [
+            {
+                "question": f"Load-test question {random.getrandbits(48):x}: which principle applies?",
+                "options": {"A": "Option A", "B": "Option B", "C": "Option C", "D": "Option D"},
+                "correct_answer": random.choice("ABCD"),
+                "explanation": "Stub explanation.",
+            }
+            for _ in range(count)
+        ]
+
+
+# ============== INSTALL ==============
+
+def install_local_backends(db_path: str, db_latency: float = 0.05, openai_latency: float = 2.0,
+                           pool_size: Optional[int] = None) -> StubOpenAI:
+    """
+    Point the app at SQLite and the OpenAI stub for this process.
+
+    Replaces database.connection.get_connection_pool with a real
+    ConnectionPool of SQLite connections (each request sleeps `db_latency`
+    to model the Snowflake round trip) and services.ai_generator's client
+    factory with a StubOpenAI. Must run before the first page view.
+    """
+    import database.connection as connection
+    import services.ai_generator as ai_generator
+    from database.pool import ConnectionPool
+    from config.settings import (
+        DB_POOL_MIN_SIZE, DB_POOL_MAX_SIZE, DB_POOL_CHECKOUT_TIMEOUT_SECONDS, DB_POOL_IDLE_TIMEOUT_SECONDS
+    )
+
+    create_database(db_path)
+    pool = ConnectionPool(
+        connect=lambda: SQLiteConnection(db_path, latency=db_latency),
+        is_closed=lambda conn: conn.is_closed(),
+        min_size=DB_POOL_MIN_SIZE,
+        max_size=pool_size or DB_POOL_MAX_SIZE,
+        checkout_timeout=DB_POOL_CHECKOUT_TIMEOUT_SECONDS,
+        idle_timeout=DB_POOL_IDLE_TIMEOUT_SECONDS,
+    )
+    connection.get_connection_pool = lambda: pool
+
+    client = StubOpenAI(latency=openai_latency)
+    ai_generator.get_openai_client = lambda: client
+    return client
+
+
+def seed_database(db_path: str, users: Sequence[Tuple[str, str, int]], admin_documents: int = 5):
+    """Insert users as (email, plan, questions_remaining) plus a few admin reviewer documents."""
+    create_database(db_path)
+    db = sqlite3.connect(db_path, detect_types=sqlite3.PARSE_DECLTYPES)
+    try:
+        db.executemany(
+            "INSERT INTO USERS (EMAIL, IP_ADDRESS, PLAN_STATUS, QUESTIONS_REMAINING, PREMIUM_EXPIRY) "
+            "VALUES (?, ?, ?, ?, datetime('now', 'localtime', '+30 days'))",
+            [(email, "seed", plan, remaining) for email, plan, remaining in users]
+        )
+        text = "Principles of teaching and learning. " * 400
+        db.executemany(
+            "INSERT INTO ADMIN_DOCUMENTS (ADMIN_DOC_ID, FILE_NAME, FILE_TYPE, STORAGE_PATH, UPLOADED_BY, "
+            "EXTRACTED_TEXT, CATEGORY) VALUES (?, ?, 'pdf', '', 'admin', ?, 'General')",
+            [(i + 1, f"reviewer_{i + 1}.pdf", text) for i in range(admin_documents)]
+        )
+        db.commit()
+    finally:
+        db.close()
@@ -4,7 +4,7 @@ Modern Techy Theme
 """
 
 import streamlit as st
-from config.settings import COLORS, EMAIL_SHARING_WARNING
+from config.settings import COLORS, EMAIL_SHARING_WARNING, INGESTION_POLL_INTERVAL_SECONDS
 
 
 def show_email_warning():
@@ -125,3 +125,64 @@ def show_document_required_message():
     if st.button("📄 Upload Reviewer", key="upload_redirect_btn", use_container_width=True, type="primary"):
         st.session_state.current_page = "upload"
         st.rerun()
+
+
+def show_ingestion_progress(session_key: str) -> bool:
+    """
+    Display status/progress for the upload jobs whose IDs are in st.session_state[session_key].
+    
+    Finished jobs are reported once and dropped from the list; running jobs
+    are polled every INGESTION_POLL_INTERVAL_SECONDS (see _poll_ingestion_jobs).
+    
+    Returns:
+        True if a job finished storing its document (caller should reload its doc list)
+    """
+    job_ids = st.session_state.get(session_key) or []
+    if not job_ids:
+        return False
+    
+    from services.ingestion import get_ingestion_jobs
+    from config.settings import INGESTION_STORED, INGESTION_FAILED
+    
+    stored_any = False
+    still_running = []
+    for job in get_ingestion_jobs(job_ids):
+        filename = job.get("filename", "Document")
+        if job["status"] == INGESTION_STORED:
+            stored_any = True
+            if job.get("text_length"):
+                st.success(f"✅ {filename} uploaded! Extracted {job['text_length']:,} characters of text.")
+            else:
+                st.success(f"✅ {filename} uploaded! (Limited text extraction)")
+        elif job["status"] == INGESTION_FAILED:
+            st.error(f"❌ {filename} could not be processed: {job.get('error') or 'Unknown error'}")
+        else:
+            still_running.append(job["job_id"])
+    
+    st.session_state[session_key] = still_running
+    if still_running:
+        _poll_ingestion_jobs(session_key)
+    return stored_any
+
+
+@st.fragment(run_every=INGESTION_POLL_INTERVAL_SECONDS)
+def _poll_ingestion_jobs(session_key: str):
+    """
+    Progress bars for running jobs, re-rendered on a timer without rerunning
+    the page. Once any job finishes, the whole app reruns so the caller
+    reports it and reloads its document list.
+    """
+    from services.ingestion import get_ingestion_jobs
+    from config.settings import INGESTION_STORED, INGESTION_FAILED
+    
+    jobs = get_ingestion_jobs(st.session_state.get(session_key) or [])
+    if any(job["status"] in (INGESTION_STORED, INGESTION_FAILED) for job in jobs):
+        st.rerun()
+    
+    for job in jobs:
+        page_count = job.get("page_count") or 0
+        pages_done = job.get("pages_done") or 0
+        label = f"⏳ {job.get('filename', 'Document')} — {job['status'].title()}"
+        if page_count:
+            label += f" (page {pages_done}/{page_count})"
+        st.progress(min(pages_done / page_count, 1.0) if page_count else 0.0, text=label)
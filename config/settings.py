@@ -122,6 +122,12 @@ PAYMENT_PENDING = "PENDING"
 PAYMENT_APPROVED = "APPROVED"
 PAYMENT_REJECTED = "REJECTED"
 
+# Document Ingestion Job Status
+INGESTION_QUEUED = "QUEUED"
+INGESTION_EXTRACTING = "EXTRACTING"
+INGESTION_STORED = "STORED"
+INGESTION_FAILED = "FAILED"
+
 # Action Types for Logging
 ACTION_LOGIN = "LOGIN"
 ACTION_QUESTION_GENERATED = "QUESTION_GENERATED"
@@ -141,9 +147,108 @@ ACTION_DELETE_ADMIN_DOC = "DELETE_ADMIN_DOC"
 ALLOWED_EXTENSIONS = [".pdf", ".docx"]
 MAX_FILE_SIZE_MB = 200  # Allow large files up to 200MB
 
+# Document Binary Storage (content-addressed by SHA-256, stored once per unique file)
+STORAGE_BACKEND = "stage"                     # "stage" (Snowflake internal stage) or "local" (dev only - lost on redeploy)
+STORAGE_LOCAL_PATH = "storage/blobs"          # Local blob root (also the read cache for "stage")
+STORAGE_STAGE_NAME = "@APP.STAGE_ADMIN_DOCS"  # Internal stage used by the "stage" backend
+STORAGE_CHUNK_SIZE = 1024 * 1024              # Bytes per read/write chunk
+
+# Text Extraction Dedupe (results keyed by SHA-256 of the file bytes)
+EXTRACTION_CACHE_MAX_ENTRIES = 32             # Extracted texts kept in memory
+EXTRACTION_CACHE_TTL_SECONDS = 3600           # Same bytes always extract to the same text
+EXTRACTED_TEXT_MAX_CHARS = 15_000_000         # Stop extracting here (EXTRACTED_TEXT is a 16MB VARCHAR)
+
+# Parallel PDF Extraction (process pool, keeps CPU-bound parsing off the server's GIL)
+PDF_PARALLEL_MIN_BYTES = 5 * 1024 * 1024      # Smaller PDFs are parsed inline
+PDF_WORKER_PROCESSES = 4                      # Pool size (capped at CPU count); 0 disables the pool
+PDF_MAX_CONCURRENT_EXTRACTIONS = 2            # Pooled extractions at once per server (extra ones run inline)
+PDF_EXTRACTION_TIMEOUT_SECONDS = 180          # Per-document limit, then workers are killed
+
+# Background Document Ingestion (extract + save runs off the session's script thread)
+INGESTION_WORKERS = 2                         # Jobs processed at once per server
+INGESTION_PROGRESS_WRITE_INTERVAL_SECONDS = 2.0  # Min time between persisted progress updates
+INGESTION_JOB_RETENTION_SECONDS = 3600        # Finished jobs kept in memory for polling
+INGESTION_POLL_INTERVAL_SECONDS = 2           # Upload progress refresh while jobs are running
+
+# Document Retrieval Index (BM25 over chunks, built at ingestion)
+DOC_INDEX_CHUNK_CHARS = 1200                  # Target chunk size
+DOC_INDEX_PATH = "storage/indexes"            # Persisted indexes, named by file SHA-256
+DOC_INDEX_CACHE_MAX_ENTRIES = 32              # Indexes kept in memory
+DOC_CONTEXT_MAX_CHARS = 6000                  # Document text budget per generation prompt
+DOC_RETRIEVAL_TOP_K = 8                       # Best chunks considered per document
+
 # Warning Messages
 EMAIL_SHARING_WARNING = "⚠️ **DO NOT share your email address. Sharing may result in access issues or blocking.**"
 
 # Snowflake Configuration
 SNOWFLAKE_SCHEMA = "APP"
 SNOWFLAKE_WAREHOUSE = "COMPUTE_WH"
+
+# Database Connection Pool (shared by all sessions in one server process)
+DB_POOL_MIN_SIZE = 1                          # Idle connections kept warm
+DB_POOL_MAX_SIZE = 8                          # Hard cap on open Snowflake connections
+DB_POOL_CHECKOUT_TIMEOUT_SECONDS = 10         # Max wait for a free connection
+DB_POOL_IDLE_TIMEOUT_SECONDS = 300            # Close connections idle longer than this
+DB_POOL_HEALTH_CHECK_INTERVAL_SECONDS = 60    # Ping connections idle longer than this before reuse
+
+# Keyed Query Caches (per server process, LRU + TTL, per-key invalidation)
+QUERY_CACHE_MAX_ENTRIES = 5000                # Max cached entries per cache
+USER_CACHE_TTL_SECONDS = 60                   # USERS row by email
+USER_DOCS_CACHE_TTL_SECONDS = 120             # USER_DOCUMENTS list by email
+IP_BLOCK_CACHE_TTL_SECONDS = 30               # IP_USAGE blocked flag by IP
+DOC_TEXT_CACHE_MAX_ENTRIES = 64               # Full EXTRACTED_TEXT bodies kept in memory
+DOC_TEXT_CACHE_TTL_SECONDS = 600              # Extracted text by doc ID (text never changes after upload)
+
+# Write-Behind Queue for audit/usage/IP logs (background micro-batched writes)
+WRITE_BEHIND_MAX_QUEUE = 10000                # Max rows waiting to be written
+WRITE_BEHIND_BATCH_SIZE = 200                 # Max rows per multi-row INSERT/MERGE
+WRITE_BEHIND_FLUSH_INTERVAL_SECONDS = 1.0     # Max time a row waits before flushing
+WRITE_BEHIND_OVERFLOW_POLICY = "block"        # "block" (wait, then drop) or "drop" when full
+WRITE_BEHIND_PUT_TIMEOUT_SECONDS = 2.0        # Max wait for room under "block"
+
+# Pre-generated AI Question Bank (served instantly when no documents are selected)
+QUESTION_BANK_LOW_WATERMARK = 15              # Refill when a user has fewer unseen questions than this
+QUESTION_BANK_REFILL_BATCH = 15               # Questions generated per refill call
+QUESTION_BANK_MAX_PER_KEY = 1000              # Stop refilling a bank past this size
+QUESTION_BANK_REFILL_WORKERS = 1              # Concurrent background refills per server
+QUESTION_BANK_CACHE_TTL_SECONDS = 300         # Reload a bank from the DB (other servers' refills) after this
+
+# AI Generation Fan-out (large batches split into parallel completions)
+AI_FANOUT_CHUNK_SIZE = 10                     # Questions per sub-request
+AI_FANOUT_MAX_CONCURRENCY = 4                 # Sub-requests in flight at once per batch
+AI_FANOUT_MAX_ROUNDS = 3                      # Rounds (first pass + top-ups for duplicates/failures)
+OPENAI_TOKENS_PER_MINUTE = 200_000            # Token budget shared by all generation calls per server
+OPENAI_RATE_LIMIT_MAX_WAIT_SECONDS = 60       # Max wait for token budget before failing a call
+
+# Full-Length Mock Exam (PRO/PREMIUM)
+MOCK_EXAM_ITEMS = 150                         # Items per mock exam, split by EXAM_COMPONENTS weight
+MOCK_EXAM_MIN_ITEMS = 20                      # Smallest exam a PRO user's remaining quota can buy
+MOCK_EXAM_SECONDS_PER_ITEM = 60               # Time allowed per item (LEPT pace)
+MOCK_EXAM_PAGE_SIZE = 10                      # Items rendered per page
+
+# Client IP Resolution (from proxy headers; no outbound lookups)
+TRUSTED_PROXIES = [                           # Our own proxies/load balancers, skipped in X-Forwarded-For
+    "127.0.0.0/8", "::1/128",
+    "10.0.0.0/8", "172.16.0.0/12", "192.168.0.0/16", "fc00::/7",
+]
+
+# In-Process Abuse Guard (rate limits + IP signals, reconciled with Snowflake in the background)
+RATE_LIMIT_IP_GENERATIONS_PER_MINUTE = 6      # Sustained generations per IP
+RATE_LIMIT_IP_BURST = 10                      # Generations an IP can make back to back
+RATE_LIMIT_EMAIL_GENERATIONS_PER_MINUTE = 4   # Sustained generations per account
+RATE_LIMIT_EMAIL_BURST = 6                    # Generations an account can make back to back
+RATE_LIMIT_MAX_KEYS = 50000                   # IPs/emails tracked per limiter (LRU)
+ABUSE_RECONCILE_INTERVAL_SECONDS = 30         # Blocked IPs / IP history / usage counter sync
+ABUSE_MAX_EMAILS_PER_IP = 3                   # Flag IPs used by more accounts than this
+ABUSE_IP_HISTORY_WINDOW_DAYS = 30             # Only count accounts seen on an IP this recently
+
+# Database Query Metrics (per server process)
+DB_SLOW_QUERY_MS = 500                        # Statements at least this slow go to the slow-query log
+DB_SLOW_QUERY_LOG_SIZE = 200                  # Slow-query ring buffer length
+DB_METRICS_MAX_FINGERPRINTS = 500             # Distinct statements tracked before folding into "<other>"
+
+# Request Tracing (spans exported as a Chrome trace-event file for ui.perfetto.dev / chrome://tracing)
+TRACING_ENABLED = False                       # Can also be switched on at runtime from the admin panel
+TRACE_FILE = "traces/lept_trace.json"         # Appended per finished trace; rolls over to .1
+TRACE_MAX_FILE_MB = 50                        # Roll the trace file over past this size
+TRACE_MIN_ROOT_MS = 0                         # Only export traces whose root span took at least this long
@@ -1,31 +1,57 @@
 """
 LEPT AI Reviewer - Cached Database Queries
-OPTIMIZED: All SELECT queries are cached to reduce Snowflake calls
+OPTIMIZED: All SELECT queries are cached to reduce Snowflake calls.
+Per-user / per-IP lookups use keyed LRU+TTL caches so invalidating one
+email or IP does not wipe every other session's cached rows.
 """
 
 import streamlit as st
-from typing import Optional, List, Dict
+from typing import Optional, List, Dict, Any, Iterable, Tuple
 from database.connection import execute_query, execute_write
+from database.keyed_cache import KeyedTTLCache, keyed_cache
 from config.settings import (
     PLAN_FREE, PLAN_PRO, PLAN_PREMIUM,
     FREE_QUESTION_LIMIT, PRO_QUESTION_BONUS, PREMIUM_DURATION_DAYS,
-    PAYMENT_PENDING
+    PAYMENT_PENDING,
+    QUERY_CACHE_MAX_ENTRIES, USER_CACHE_TTL_SECONDS,
+    USER_DOCS_CACHE_TTL_SECONDS, IP_BLOCK_CACHE_TTL_SECONDS,
+    DOC_TEXT_CACHE_MAX_ENTRIES, DOC_TEXT_CACHE_TTL_SECONDS
 )
 
 
+# ============== KEYED CACHES ==============
+
+_user_cache = KeyedTTLCache(maxsize=QUERY_CACHE_MAX_ENTRIES, ttl=USER_CACHE_TTL_SECONDS, name="users")
+_user_docs_cache = KeyedTTLCache(maxsize=QUERY_CACHE_MAX_ENTRIES, ttl=USER_DOCS_CACHE_TTL_SECONDS, name="user_documents")
+_ip_blocked_cache = KeyedTTLCache(maxsize=QUERY_CACHE_MAX_ENTRIES, ttl=IP_BLOCK_CACHE_TTL_SECONDS, name="ip_blocked")
+_admin_doc_text_cache = KeyedTTLCache(maxsize=DOC_TEXT_CACHE_MAX_ENTRIES, ttl=DOC_TEXT_CACHE_TTL_SECONDS, name="admin_document_text")
+_user_doc_text_cache = KeyedTTLCache(maxsize=DOC_TEXT_CACHE_MAX_ENTRIES, ttl=DOC_TEXT_CACHE_TTL_SECONDS, name="user_document_text")
+
+
 # ============== CACHED SELECT QUERIES ==============
 
-@st.cache_data(ttl=60, show_spinner=False)
-def cached_get_user_by_email(email: str) -> Optional[Dict]:
-    """Get user by email - cached for 60 seconds."""
-    query = """
+def select_user_by_email(email: str) -> Optional[Dict]:
+    """Uncached USERS lookup shared by the cached and fresh getters."""
+    query_with_seen = """
     SELECT EMAIL, IP_ADDRESS, PLAN_STATUS, QUESTIONS_USED_TOTAL, QUESTIONS_REMAINING, 
-           PREMIUM_EXPIRY, IS_BLOCKED, CREATED_AT, UPDATED_AT
+           PREMIUM_EXPIRY, IS_BLOCKED, CREATED_AT, UPDATED_AT, PRESET_SEEN
     FROM USERS 
     WHERE EMAIL = %s
     LIMIT 1
     """
-    result = execute_query(query, (email,))
+    result = execute_query(query_with_seen, (email,))
+    
+    # Fallback if PRESET_SEEN column doesn't exist (migration not run yet)
+    if result is None:
+        query_basic = """
+        SELECT EMAIL, IP_ADDRESS, PLAN_STATUS, QUESTIONS_USED_TOTAL, QUESTIONS_REMAINING, 
+               PREMIUM_EXPIRY, IS_BLOCKED, CREATED_AT, UPDATED_AT
+        FROM USERS 
+        WHERE EMAIL = %s
+        LIMIT 1
+        """
+        result = execute_query(query_basic, (email,))
+    
     if result and len(result) > 0:
         row = result[0]
         return {
@@ -37,17 +63,24 @@ def cached_get_user_by_email(email: str) -> Optional[Dict]:
             "premium_expiry": row[5],
             "is_blocked": row[6],
             "created_at": row[7],
-            "updated_at": row[8]
+            "updated_at": row[8],
+            "preset_seen": row[9] if len(row) > 9 else None
         }
     return None
 
 
+@keyed_cache(_user_cache)
+def cached_get_user_by_email(email: str) -> Optional[Dict]:
+    """Get user by email - cached for 60 seconds."""
+    return select_user_by_email(email)
+
+
 @st.cache_data(ttl=300, show_spinner=False)
 def cached_get_admin_documents() -> List[Dict]:
-    """Get admin documents - cached for 5 minutes."""
+    """Get admin document metadata - cached for 5 minutes. Text is loaded per doc on demand."""
     query = """
     SELECT ADMIN_DOC_ID, FILE_NAME, FILE_TYPE, STORAGE_PATH, TEXT_STAGE_PATH, 
-           IS_DOWNLOADABLE, UPLOADED_AT, UPLOADED_BY, CATEGORY, EXTRACTED_TEXT
+           IS_DOWNLOADABLE, UPLOADED_AT, UPLOADED_BY, CATEGORY, LENGTH(EXTRACTED_TEXT), TEXT_HASH
     FROM ADMIN_DOCUMENTS 
     WHERE IS_DELETED = FALSE
     ORDER BY UPLOADED_AT DESC
@@ -67,17 +100,20 @@ def cached_get_admin_documents() -> List[Dict]:
                 "created_at": row[6],
                 "uploaded_by": row[7],
                 "category": row[8] or "General",
-                "extracted_text": row[9]
+                "text_length": row[9] or 0,
+                "has_text": row[9] is not None,
+                "text_hash": row[10]
             })
     return docs
 
 
-@st.cache_data(ttl=120, show_spinner=False)
+@keyed_cache(_user_docs_cache)
 def cached_get_user_documents(email: str) -> List[Dict]:
-    """Get user documents with extracted text - cached for 2 minutes."""
+    """Get user document metadata - cached for 2 minutes. Text is loaded per doc on demand."""
     # Try with EXTRACTED_TEXT column first
     query_with_text = """
-    SELECT DOC_ID, EMAIL, FILE_NAME, FILE_TYPE, STORAGE_PATH, TEXT_STAGE_PATH, UPLOADED_AT, EXTRACTED_TEXT
+    SELECT DOC_ID, EMAIL, FILE_NAME, FILE_TYPE, STORAGE_PATH, TEXT_STAGE_PATH, UPLOADED_AT,
+           TEXT_HASH, LENGTH(EXTRACTED_TEXT)
     FROM USER_DOCUMENTS 
     WHERE EMAIL = %s AND IS_DELETED = FALSE
     ORDER BY UPLOADED_AT DESC
@@ -88,31 +124,18 @@ def cached_get_user_documents(email: str) -> List[Dict]:
     # Fallback if EXTRACTED_TEXT column doesn't exist
     if result is None:
         query_basic = """
-        SELECT DOC_ID, EMAIL, FILE_NAME, FILE_TYPE, STORAGE_PATH, TEXT_STAGE_PATH, UPLOADED_AT
+        SELECT DOC_ID, EMAIL, FILE_NAME, FILE_TYPE, STORAGE_PATH, TEXT_STAGE_PATH, UPLOADED_AT, TEXT_HASH
         FROM USER_DOCUMENTS 
         WHERE EMAIL = %s AND IS_DELETED = FALSE
         ORDER BY UPLOADED_AT DESC
         LIMIT 20
         """
         result = execute_query(query_basic, (email,))
-        docs = []
-        if result:
-            for row in result:
-                docs.append({
-                    "doc_id": row[0],
-                    "email": row[1],
-                    "filename": row[2],
-                    "file_type": row[3],
-                    "storage_path": row[4],
-                    "text_stage_path": row[5],
-                    "created_at": row[6],
-                    "extracted_text": None
-                })
-        return docs
     
     docs = []
     if result:
         for row in result:
+            text_length = row[8] if len(row) > 8 else None
             docs.append({
                 "doc_id": row[0],
                 "email": row[1],
@@ -121,11 +144,43 @@ def cached_get_user_documents(email: str) -> List[Dict]:
                 "storage_path": row[4],
                 "text_stage_path": row[5],
                 "created_at": row[6],
-                "extracted_text": row[7] if len(row) > 7 else None
+                "text_hash": row[7],
+                "text_length": text_length or 0,
+                "has_text": text_length is not None
             })
     return docs
 
 
+@keyed_cache(_admin_doc_text_cache)
+def cached_get_admin_document_text(doc_id: int) -> Optional[Dict]:
+    """Get one admin document's extracted text - cached by doc ID."""
+    query = """
+    SELECT EXTRACTED_TEXT, FILE_NAME
+    FROM ADMIN_DOCUMENTS 
+    WHERE ADMIN_DOC_ID = %s AND IS_DELETED = FALSE
+    LIMIT 1
+    """
+    result = execute_query(query, (doc_id,))
+    if result and result[0]:
+        return {"text": result[0][0], "filename": result[0][1]}
+    return None
+
+
+@keyed_cache(_user_doc_text_cache)
+def cached_get_user_document_text(doc_id: int) -> Optional[Dict]:
+    """Get one user document's extracted text - cached by doc ID."""
+    query = """
+    SELECT EXTRACTED_TEXT, FILE_NAME, EMAIL
+    FROM USER_DOCUMENTS 
+    WHERE DOC_ID = %s AND IS_DELETED = FALSE
+    LIMIT 1
+    """
+    result = execute_query(query, (doc_id,))
+    if result and result[0]:
+        return {"text": result[0][0], "filename": result[0][1], "email": result[0][2]}
+    return None
+
+
 @st.cache_data(ttl=60, show_spinner=False)
 def cached_get_pending_payments_count() -> int:
     """Get count of pending payments - cached."""
@@ -136,7 +191,7 @@ def cached_get_pending_payments_count() -> int:
     return 0
 
 
-@st.cache_data(ttl=30, show_spinner=False)
+@keyed_cache(_ip_blocked_cache)
 def cached_is_ip_blocked(ip_address: str) -> bool:
     """Check if IP is blocked - cached for 30 seconds."""
     query = "SELECT IS_BLOCKED FROM IP_USAGE WHERE IP_ADDRESS = %s LIMIT 1"
@@ -149,8 +204,8 @@ def cached_is_ip_blocked(ip_address: str) -> bool:
 # ============== CACHE INVALIDATION FUNCTIONS ==============
 
 def invalidate_user_cache(email: str):
-    """Invalidate user cache after updates."""
-    cached_get_user_by_email.clear()
+    """Invalidate the cached row for one user after updates."""
+    cached_get_user_by_email.invalidate(email)
 
 
 def invalidate_admin_docs_cache():
@@ -159,8 +214,30 @@ def invalidate_admin_docs_cache():
 
 
 def invalidate_user_docs_cache(email: str):
-    """Invalidate user documents cache after updates."""
-    cached_get_user_documents.clear()
+    """Invalidate one user's cached document list after updates."""
+    cached_get_user_documents.invalidate(email)
+
+
+def invalidate_document_text_cache(doc_id: int, source: str = "admin"):
+    """Invalidate the cached extracted text for one document."""
+    if source == "admin":
+        cached_get_admin_document_text.invalidate(doc_id)
+    else:
+        cached_get_user_document_text.invalidate(doc_id)
+
+
+def invalidate_ip_cache(ip_address: str):
+    """Invalidate the cached blocked flag for one IP after updates."""
+    cached_is_ip_blocked.invalidate(ip_address)
+
+
+def get_cache_stats() -> Dict[str, Dict[str, Any]]:
+    """Get hit/miss/eviction counters for the keyed caches."""
+    return {
+        cache.name: cache.get_stats()
+        for cache in (_user_cache, _user_docs_cache, _ip_blocked_cache,
+                      _admin_doc_text_cache, _user_doc_text_cache)
+    }
 
 
 def invalidate_all_caches():
@@ -170,6 +247,8 @@ def invalidate_all_caches():
     cached_get_user_documents.clear()
     cached_get_pending_payments_count.clear()
     cached_is_ip_blocked.clear()
+    cached_get_admin_document_text.clear()
+    cached_get_user_document_text.clear()
 
 
 # ============== WRITE OPERATIONS (NO CACHING) ==============
@@ -220,34 +299,59 @@ def write_decrement_questions(email: str, count: int = 1) -> bool:
     return result
 
 
+# MERGE rejects a source with duplicate keys, and huge VALUES lists slow compilation
+IP_UPSERT_BATCH_SIZE = 500
+
+
 def write_log_ip_history(email: str, ip_address: str):
-    """Log IP in user history."""
-    # Check if exists
-    check_query = "SELECT ID FROM USER_IP_HISTORY WHERE EMAIL = %s AND IP_ADDRESS = %s LIMIT 1"
-    existing = execute_query(check_query, (email, ip_address))
+    """Log IP in user history - single MERGE upsert."""
+    return write_log_ip_history_batch([(email, ip_address)])
+
+
+def write_log_ip_history_batch(pairs: Iterable[Tuple[str, str]]) -> bool:
+    """Upsert many (email, ip) pairs into USER_IP_HISTORY, one MERGE per batch."""
+    unique_pairs = list(dict.fromkeys((email, ip) for email, ip in pairs if email and ip))
+    success = True
     
-    if existing and len(existing) > 0:
-        update_query = """
-        UPDATE USER_IP_HISTORY SET LAST_SEEN = CURRENT_TIMESTAMP() 
-        WHERE EMAIL = %s AND IP_ADDRESS = %s
+    for start in range(0, len(unique_pairs), IP_UPSERT_BATCH_SIZE):
+        batch = unique_pairs[start:start + IP_UPSERT_BATCH_SIZE]
+        values = ", ".join(["(%s, %s)"] * len(batch))
+        query = f"""
+        MERGE INTO USER_IP_HISTORY t
+        USING (SELECT column1 AS EMAIL, column2 AS IP_ADDRESS FROM VALUES {values}) s
+        ON t.EMAIL = s.EMAIL AND t.IP_ADDRESS = s.IP_ADDRESS
+        WHEN MATCHED THEN UPDATE SET LAST_SEEN = CURRENT_TIMESTAMP()
+        WHEN NOT MATCHED THEN INSERT (EMAIL, IP_ADDRESS) VALUES (s.EMAIL, s.IP_ADDRESS)
         """
-        execute_write(update_query, (email, ip_address))
-    else:
-        insert_query = "INSERT INTO USER_IP_HISTORY (EMAIL, IP_ADDRESS) VALUES (%s, %s)"
-        execute_write(insert_query, (email, ip_address))
+        params = tuple(value for pair in batch for value in pair)
+        success = execute_write(query, params) and success
+    
+    return success
 
 
 def write_log_ip_usage(ip_address: str):
-    """Log or update IP usage."""
-    check_query = "SELECT IP_ADDRESS FROM IP_USAGE WHERE IP_ADDRESS = %s LIMIT 1"
-    existing = execute_query(check_query, (ip_address,))
+    """Log or update IP usage - single MERGE upsert."""
+    return write_log_ip_usage_batch([ip_address])
+
+
+def write_log_ip_usage_batch(ip_addresses: Iterable[str]) -> bool:
+    """Upsert many IPs into IP_USAGE, one MERGE per batch."""
+    unique_ips = list(dict.fromkeys(ip for ip in ip_addresses if ip))
+    success = True
     
-    if existing and len(existing) > 0:
-        update_query = "UPDATE IP_USAGE SET LAST_SEEN = CURRENT_TIMESTAMP() WHERE IP_ADDRESS = %s"
-        execute_write(update_query, (ip_address,))
-    else:
-        insert_query = "INSERT INTO IP_USAGE (IP_ADDRESS) VALUES (%s)"
-        execute_write(insert_query, (ip_address,))
+    for start in range(0, len(unique_ips), IP_UPSERT_BATCH_SIZE):
+        batch = unique_ips[start:start + IP_UPSERT_BATCH_SIZE]
+        values = ", ".join(["(%s)"] * len(batch))
+        query = f"""
+        MERGE INTO IP_USAGE t
+        USING (SELECT column1 AS IP_ADDRESS FROM VALUES {values}) s
+        ON t.IP_ADDRESS = s.IP_ADDRESS
+        WHEN MATCHED THEN UPDATE SET LAST_SEEN = CURRENT_TIMESTAMP()
+        WHEN NOT MATCHED THEN INSERT (IP_ADDRESS) VALUES (s.IP_ADDRESS)
+        """
+        success = execute_write(query, tuple(batch)) and success
+    
+    return success
 
 
 def write_log_usage(email: str, ip_address: str, questions_generated: int, 
@@ -1,13 +1,22 @@
 """
 LEPT AI Reviewer - Snowflake Database Connection
-OPTIMIZED: Single cached connection, reused across all queries
+OPTIMIZED: Bounded connection pool shared across all sessions
 """
 
 import streamlit as st
 import snowflake.connector
-from typing import Optional, List, Any, Tuple
+from contextlib import contextmanager
+from typing import Optional, List, Any, Tuple, Dict
 import time
 
+from database.pool import ConnectionPool, PoolTimeoutError
+from database.metrics import get_query_metrics
+from utils.tracing import child_span
+from config.settings import (
+    DB_POOL_MIN_SIZE, DB_POOL_MAX_SIZE, DB_POOL_CHECKOUT_TIMEOUT_SECONDS,
+    DB_POOL_IDLE_TIMEOUT_SECONDS, DB_POOL_HEALTH_CHECK_INTERVAL_SECONDS
+)
+
 
 def _increment_query_count():
     """Safely increment the query counter."""
@@ -20,14 +29,10 @@ def _increment_query_count():
         pass
 
 
-@st.cache_resource
-def get_snowflake_connection():
-    """
-    Create and cache a single Snowflake connection.
-    This connection is reused across ALL reruns and users.
-    """
+def _create_connection():
+    """Open a new Snowflake connection for the pool."""
     try:
-        conn = snowflake.connector.connect(
+        return snowflake.connector.connect(
             account=st.secrets["snowflake"]["account"],
             user=st.secrets["snowflake"]["user"],
             password=st.secrets["snowflake"]["password"],
@@ -38,38 +43,121 @@ def get_snowflake_connection():
             client_session_keep_alive=True,  # Keep connection alive
             network_timeout=30,
         )
-        return conn
     except Exception as e:
         st.error(f"Failed to connect to Snowflake: {str(e)}")
-        return None
+        raise
 
 
-def get_cursor():
-    """Get a cursor from the cached connection."""
-    conn = get_snowflake_connection()
-    if conn:
+def _ping_connection(conn) -> bool:
+    """Cheap round trip used by the pool's health check."""
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT 1")
+        return True
+    finally:
+        cursor.close()
+
+
+@st.cache_resource
+def get_connection_pool() -> ConnectionPool:
+    """
+    Create and cache the Snowflake connection pool.
+    One pool per server process, shared by ALL sessions; each query borrows
+    its own connection so one slow statement no longer blocks other users.
+    """
+    return ConnectionPool(
+        connect=_create_connection,
+        is_closed=lambda conn: conn.is_closed(),
+        ping=_ping_connection,
+        min_size=DB_POOL_MIN_SIZE,
+        max_size=DB_POOL_MAX_SIZE,
+        checkout_timeout=DB_POOL_CHECKOUT_TIMEOUT_SECONDS,
+        idle_timeout=DB_POOL_IDLE_TIMEOUT_SECONDS,
+        health_check_interval=DB_POOL_HEALTH_CHECK_INTERVAL_SECONDS,
+    )
+
+
+@contextmanager
+def pooled_connection():
+    """Borrow a pooled connection for multi-statement work (e.g. transactions)."""
+    with get_connection_pool().connection() as conn:
+        yield conn
+
+
+def _is_session_expired(error: Exception) -> bool:
+    """Check if a Snowflake error means the connection's session is gone."""
+    return "Authentication token has expired" in str(error) or "session" in str(error).lower()
+
+
+def _run_statement(conn, query: str, params: tuple, fetch: bool, num_statements: int = None,
+                   outcome: dict = None):
+    """
+    Run one statement (or one multi-statement request) on a borrowed connection.
+    Rows returned (or affected, for writes) are reported in outcome["rows"].
+    """
+    outcome = outcome if outcome is not None else {}
+    cursor = conn.cursor()
+    try:
+        if num_statements:
+            cursor.execute(query, params or None, num_statements=num_statements)
+            # One result set per statement, in order
+            results = [cursor.fetchall()]
+            while cursor.nextset():
+                results.append(cursor.fetchall())
+            outcome["rows"] = sum(len(rows) for rows in results)
+            return results
+        
+        if params:
+            cursor.execute(query, params)
+        else:
+            cursor.execute(query)
+        
+        if fetch:
+            rows = cursor.fetchall()
+            outcome["rows"] = len(rows)
+            return rows
+        
+        # Commit for write operations
+        outcome["rows"] = max(cursor.rowcount or 0, 0)
+        conn.commit()
+        return True
+    except Exception:
+        if num_statements:
+            # Don't return a connection with a half-finished transaction to the pool
+            try:
+                conn.rollback()
+            except Exception:
+                pass
+        raise
+    finally:
         try:
-            # Test if connection is still valid
-            if not conn.is_closed():
-                return conn.cursor()
-            else:
-                # Connection closed, clear cache and reconnect
-                st.cache_resource.clear()
-                conn = get_snowflake_connection()
-                if conn:
-                    return conn.cursor()
+            cursor.close()
         except Exception:
-            # Connection error, clear cache and reconnect
-            st.cache_resource.clear()
-            conn = get_snowflake_connection()
-            if conn:
-                return conn.cursor()
-    return None
+            pass
+
+
+def _execute_pooled(query: str, params: tuple, fetch: bool, num_statements: int = None,
+                    outcome: dict = None):
+    """Check out a connection, run the statement and return the connection."""
+    pool = get_connection_pool()
+    conn = pool.checkout()
+    discard = False
+    try:
+        return _run_statement(conn, query, params, fetch, num_statements, outcome)
+    except (snowflake.connector.errors.OperationalError, snowflake.connector.errors.InterfaceError):
+        # Network/driver level failure - don't hand this connection out again
+        discard = True
+        raise
+    except snowflake.connector.errors.ProgrammingError as e:
+        discard = _is_session_expired(e)
+        raise
+    finally:
+        pool.checkin(conn, discard=discard)
 
 
 def execute_query(query: str, params: tuple = None, fetch: bool = True) -> Optional[List]:
     """
-    Execute a query using the cached connection.
+    Execute a query on a connection borrowed from the pool.
     
     Args:
         query: SQL query string
@@ -79,65 +167,74 @@ def execute_query(query: str, params: tuple = None, fetch: bool = True) -> Optio
     Returns:
         List of results if fetch=True, True if successful write, None on error
     """
+    return _execute(query, params, fetch)
+
+
+def execute_multi_statement(statements: List[Tuple[str, tuple]]) -> Optional[List[List]]:
+    """
+    Execute several statements in a SINGLE Snowflake request.
+    
+    Wrap the statements in BEGIN/COMMIT to make them atomic. Parameters are
+    bound client-side, so each statement keeps its own %s placeholders.
+    
+    Args:
+        statements: List of (sql, params) tuples, executed in order
+    
+    Returns:
+        One list of result rows per statement, or None on error
+    """
+    query = ";\n".join(sql.strip().rstrip(";") for sql, _ in statements)
+    params = tuple(value for _, stmt_params in statements for value in (stmt_params or ()))
+    return _execute(query, params, True, num_statements=len(statements))
+
+
+def _execute(query: str, params: tuple, fetch: bool, num_statements: int = None):
+    """
+    Shared execution path: error handling, one retry on expired sessions,
+    latency/rows/errors recorded in the query metrics registry, and a
+    db.query tracing span.
+    """
     # Safely increment debug counter
     _increment_query_count()
     
-    cursor = None
+    outcome = {"rows": 0}
+    retries = 0
+    error = None
+    trace_span = child_span("db.query")
+    start_time = time.perf_counter()
     try:
-        cursor = get_cursor()
-        if cursor is None:
-            return None
-        
-        start_time = time.time()
-        
-        if params:
-            cursor.execute(query, params)
-        else:
-            cursor.execute(query)
-        
-        if fetch:
-            result = cursor.fetchall()
-        else:
-            # Commit for write operations
-            get_snowflake_connection().commit()
-            result = True
-        
-        # Debug timing (remove in production)
-        elapsed = (time.time() - start_time) * 1000
-        if elapsed > 500:  # Log slow queries
-            print(f"SLOW QUERY ({elapsed:.0f}ms): {query[:100]}...")
-        
-        return result
+        return _execute_pooled(query, params, fetch, num_statements, outcome)
         
+    except PoolTimeoutError as e:
+        # Only the exception type is recorded - driver messages can echo bound values
+        error = type(e).__name__
+        print(f"Query error: {str(e)}")
+        return None
     except snowflake.connector.errors.ProgrammingError as e:
-        if "Authentication token has expired" in str(e) or "session" in str(e).lower():
-            # Session expired, clear cache and retry once
-            st.cache_resource.clear()
+        error = type(e).__name__
+        if _is_session_expired(e):
+            # Session expired, the stale connection was discarded - retry once
+            retries = 1
             try:
-                cursor = get_cursor()
-                if cursor:
-                    if params:
-                        cursor.execute(query, params)
-                    else:
-                        cursor.execute(query)
-                    if fetch:
-                        return cursor.fetchall()
-                    else:
-                        get_snowflake_connection().commit()
-                        return True
-            except Exception:
-                pass
+                result = _execute_pooled(query, params, fetch, num_statements, outcome)
+                error = None
+                return result
+            except Exception as retry_error:
+                error = type(retry_error).__name__
         return None
     except Exception as e:
         # Don't show error in UI for every query failure
+        error = type(e).__name__
         print(f"Query error: {str(e)}")
         return None
     finally:
-        if cursor:
-            try:
-                cursor.close()
-            except Exception:
-                pass
+        elapsed = (time.perf_counter() - start_time) * 1000
+        metrics = get_query_metrics()
+        key = metrics.record(query, elapsed, rows=outcome["rows"], error=error, retries=retries, params=params)
+        trace_span.set(statement=key, rows=outcome["rows"], retries=retries, error=error)
+        trace_span.end()
+        if elapsed >= metrics.slow_query_ms:
+            print(f"SLOW QUERY ({elapsed:.0f}ms): {key[:100]}...")
 
 
 def execute_write(query: str, params: tuple = None) -> bool:
@@ -171,3 +268,21 @@ def reset_query_count():
         st.session_state.db_query_count = 0
     except Exception:
         pass
+
+
+def get_pool_stats() -> Dict[str, Any]:
+    """Get connection pool saturation metrics (for sizing and debugging)."""
+    try:
+        return get_connection_pool().get_stats()
+    except Exception:
+        return {}
+
+
+def get_query_metrics_snapshot(limit: int = 20) -> Dict[str, Any]:
+    """Totals, the `limit` most expensive statements and the slow-query log (for the admin panel)."""
+    metrics = get_query_metrics()
+    return {
+        "totals": metrics.get_totals(),
+        "statements": metrics.get_statements(limit=limit),
+        "slow_queries": metrics.get_slow_queries(),
+    }
@@ -0,0 +1,114 @@
+"""
+LEPT AI Reviewer - Keyed Query Cache
+LRU + TTL cache with per-key invalidation, shared across all sessions
+"""
+
+import copy
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+from typing import Any, Callable, Dict, Hashable
+
+
+_MISSING = object()
+
+
+class KeyedTTLCache:
+    """
+    Thread-safe LRU cache where every entry also expires after `ttl` seconds.
+
+    Unlike st.cache_data, a single key can be evicted with delete(), so a
+    write for one user no longer throws away every other user's cached row.
+    Values are deep-copied on the way in and out, matching st.cache_data's
+    behavior of handing each caller its own copy. Pass copy_values=False for
+    large values callers never mutate (like st.cache_resource).
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 60.0, name: str = "cache",
+                 copy_values: bool = True):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.name = name
+        self.copy_values = copy_values
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0, "expirations": 0, "invalidations": 0}
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Return the cached value for key, or default on miss/expiry."""
+        now = time.monotonic()
+        with self._lock:
+            item = self._data.get(key, _MISSING)
+            if item is _MISSING:
+                self._stats["misses"] += 1
+                return default
+            expires_at, value = item
+            if expires_at <= now:
+                del self._data[key]
+                self._stats["expirations"] += 1
+                self._stats["misses"] += 1
+                return default
+            self._data.move_to_end(key)
+            self._stats["hits"] += 1
+        return copy.deepcopy(value) if self.copy_values else value
+
+    def set(self, key: Hashable, value: Any):
+        """Store a value, evicting the least recently used entry if full."""
+        if self.copy_values:
+            value = copy.deepcopy(value)
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self._stats["evictions"] += 1
+
+    def delete(self, key: Hashable) -> bool:
+        """Evict a single key. Returns True if it was cached."""
+        with self._lock:
+            removed = self._data.pop(key, _MISSING) is not _MISSING
+            if removed:
+                self._stats["invalidations"] += 1
+        return removed
+
+    def clear(self):
+        """Evict every entry."""
+        with self._lock:
+            self._stats["invalidations"] += len(self._data)
+            self._data.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Hit/miss/eviction counters plus current size."""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["size"] = len(self._data)
+        lookups = stats["hits"] + stats["misses"]
+        stats["maxsize"] = self.maxsize
+        stats["ttl"] = self.ttl
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+        return stats
+
+
+def keyed_cache(cache: KeyedTTLCache) -> Callable:
+    """
+    Decorator that caches a single-argument function in a KeyedTTLCache.
+
+    The wrapped function gains `.clear()`, `.invalidate(key)` and `.cache`
+    so call sites can keep using the st.cache_data style `.clear()` API.
+    """
+    def decorator(func: Callable) -> Callable:
+        @wraps(func)
+        def wrapper(key: Hashable):
+            value = cache.get(key, _MISSING)
+            if value is not _MISSING:
+                return value
+            value = func(key)
+            cache.set(key, value)
+            return value
+
+        wrapper.cache = cache
+        wrapper.clear = cache.clear
+        wrapper.invalidate = cache.delete
+        return wrapper
+    return decorator
@@ -0,0 +1,276 @@
+"""
+LEPT AI Reviewer - Database Query Metrics
+Process-wide registry of per-statement latency histograms, row counts,
+errors and retries, keyed by a normalized statement fingerprint, plus a
+ring buffer of recent slow queries with parameters redacted. Exportable
+as JSON or Prometheus text format.
+"""
+
+import json
+import re
+import threading
+from collections import deque
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+
+# Histogram bucket upper bounds in milliseconds (plus an implicit +Inf)
+LATENCY_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000)
+
+OVERFLOW_FINGERPRINT = "<other>"
+
+_COMMENT_RE = re.compile(r"--[^\n]*|/\*.*?\*/", re.S)
+_STRING_RE = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_RE = re.compile(r"\b\d+(?:\.\d+)?\b")
+_PLACEHOLDER_RE = re.compile(r"%s|%\(\w+\)s")
+_LIST_RE = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_ROWS_RE = re.compile(r"\(\?\+\)(?:\s*,\s*\(\?\+\))+")
+_SPACE_RE = re.compile(r"\s+")
+
+
+def fingerprint(query: str, max_length: int = 300) -> str:
+    """
+    Normalize a statement so calls that differ only in values share a key:
+    comments dropped, literals and placeholders become ?, IN lists and
+    VALUES batches collapse to (?+), whitespace is squeezed.
+    """
+    text = _COMMENT_RE.sub(" ", query)
+    text = _STRING_RE.sub("?", text)
+    text = _PLACEHOLDER_RE.sub("?", text)
+    text = _NUMBER_RE.sub("?", text)
+    text = _LIST_RE.sub("(?+)", text)
+    text = _ROWS_RE.sub("(?+), ...", text)
+    text = _SPACE_RE.sub(" ", text).strip().rstrip(";")
+    return text[:max_length]
+
+
+def redact_params(params: Optional[tuple]) -> List[str]:
+    """Describe parameters by type and size only, e.g. <str:12>, <int>."""
+    redacted = []
+    for value in params or ():
+        if value is None:
+            redacted.append("<null>")
+        elif isinstance(value, (str, bytes)):
+            redacted.append(f"<{type(value).__name__}:{len(value)}>")
+        else:
+            redacted.append(f"<{type(value).__name__}>")
+    return redacted
+
+
+class LatencyHistogram:
+    """Per-bucket (non-cumulative) counts plus count/sum/max, in milliseconds."""
+
+    __slots__ = ("buckets", "count", "sum_ms", "max_ms")
+
+    def __init__(self):
+        self.buckets = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+        self.count = 0
+        self.sum_ms = 0.0
+        self.max_ms = 0.0
+
+    def observe(self, elapsed_ms: float):
+        index = len(LATENCY_BUCKETS_MS)
+        for i, bound in enumerate(LATENCY_BUCKETS_MS):
+            if elapsed_ms <= bound:
+                index = i
+                break
+        self.buckets[index] += 1
+        self.count += 1
+        self.sum_ms += elapsed_ms
+        self.max_ms = max(self.max_ms, elapsed_ms)
+
+    def percentile(self, q: float) -> float:
+        """Estimated q-quantile (0-1): upper bound of the bucket holding it, capped at max."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.buckets):
+            seen += n
+            if seen >= rank and n:
+                bound = LATENCY_BUCKETS_MS[i] if i < len(LATENCY_BUCKETS_MS) else self.max_ms
+                return min(bound, self.max_ms)
+        return self.max_ms
+
+
+class _StatementStats:
+    __slots__ = ("latency", "rows", "errors", "retries")
+
+    def __init__(self):
+        self.latency = LatencyHistogram()
+        self.rows = 0
+        self.errors = 0
+        self.retries = 0
+
+
+class QueryMetrics:
+    """
+    Thread-safe metrics registry for database statements.
+
+    At most `max_fingerprints` distinct statements are tracked; anything
+    beyond that is folded into OVERFLOW_FINGERPRINT so ad-hoc SQL can't grow
+    the registry without bound.
+    """
+
+    def __init__(self, slow_query_ms: float = 500, slow_log_size: int = 200, max_fingerprints: int = 500):
+        self.slow_query_ms = slow_query_ms
+        self.max_fingerprints = max_fingerprints
+        self._lock = threading.Lock()
+        self._statements: Dict[str, _StatementStats] = {}
+        self._slow_log: deque = deque(maxlen=slow_log_size)
+        self._started_at = datetime.now()
+
+    def record(self, query: str, elapsed_ms: float, rows: int = 0, error: Optional[str] = None,
+               retries: int = 0, params: Optional[tuple] = None) -> str:
+        """
+        Record one execution (including any retries).
+
+        Returns:
+            The statement fingerprint
+        """
+        key = fingerprint(query)
+        slow = elapsed_ms >= self.slow_query_ms
+        with self._lock:
+            stats = self._statements.get(key)
+            if stats is None:
+                if len(self._statements) >= self.max_fingerprints:
+                    key = OVERFLOW_FINGERPRINT
+                    stats = self._statements.get(key)
+                if stats is None:
+                    stats = self._statements[key] = _StatementStats()
+            stats.latency.observe(elapsed_ms)
+            stats.rows += rows
+            stats.retries += retries
+            if error:
+                stats.errors += 1
+            if slow:
+                self._slow_log.append({
+                    "at": datetime.now().isoformat(timespec="seconds"),
+                    "fingerprint": key,
+                    "elapsed_ms": round(elapsed_ms, 1),
+                    "rows": rows,
+                    "retries": retries,
+                    "error": error,
+                    "params": redact_params(params),
+                })
+        return key
+
+    def get_statements(self, sort_by: str = "total_ms", limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Per-fingerprint summaries, largest `sort_by` first."""
+        with self._lock:
+            items = [(key, stats) for key, stats in self._statements.items()]
+            summaries = [
+                {
+                    "fingerprint": key,
+                    "calls": stats.latency.count,
+                    "total_ms": round(stats.latency.sum_ms, 1),
+                    "avg_ms": round(stats.latency.sum_ms / stats.latency.count, 1) if stats.latency.count else 0.0,
+                    "p50_ms": stats.latency.percentile(0.50),
+                    "p95_ms": stats.latency.percentile(0.95),
+                    "p99_ms": stats.latency.percentile(0.99),
+                    "max_ms": round(stats.latency.max_ms, 1),
+                    "rows": stats.rows,
+                    "errors": stats.errors,
+                    "retries": stats.retries,
+                }
+                for key, stats in items
+            ]
+        summaries.sort(key=lambda item: -item[sort_by])
+        return summaries[:limit] if limit else summaries
+
+    def get_slow_queries(self) -> List[Dict[str, Any]]:
+        """Slow-query log, newest first."""
+        with self._lock:
+            return list(reversed(self._slow_log))
+
+    def get_totals(self) -> Dict[str, Any]:
+        with self._lock:
+            calls = sum(s.latency.count for s in self._statements.values())
+            return {
+                "since": self._started_at.isoformat(timespec="seconds"),
+                "statements": len(self._statements),
+                "calls": calls,
+                "total_ms": round(sum(s.latency.sum_ms for s in self._statements.values()), 1),
+                "errors": sum(s.errors for s in self._statements.values()),
+                "retries": sum(s.retries for s in self._statements.values()),
+                "slow_logged": len(self._slow_log),
+            }
+
+    def reset(self):
+        with self._lock:
+            self._statements.clear()
+            self._slow_log.clear()
+            self._started_at = datetime.now()
+
+    # ---- Export ----
+
+    def to_json(self, indent: Optional[int] = 2) -> str:
+        """Totals, per-statement summaries with histogram buckets, and the slow-query log."""
+        statements = self.get_statements()
+        with self._lock:
+            for summary in statements:
+                stats = self._statements.get(summary["fingerprint"])
+                summary["buckets"] = dict(zip(_bucket_labels(), stats.latency.buckets)) if stats else {}
+        return json.dumps({
+            "totals": self.get_totals(),
+            "statements": statements,
+            "slow_queries": self.get_slow_queries(),
+        }, indent=indent)
+
+    def to_prometheus(self, prefix: str = "lept_db") -> str:
+        """Prometheus text exposition format (histogram in seconds, counters per fingerprint)."""
+        with self._lock:
+            snapshot: List[Tuple[str, List[int], float, int, int, int]] = [
+                (key, list(s.latency.buckets), s.latency.sum_ms, s.rows, s.errors, s.retries)
+                for key, s in self._statements.items()
+            ]
+
+        lines = [
+            f"# HELP {prefix}_query_duration_seconds Statement latency by fingerprint.",
+            f"# TYPE {prefix}_query_duration_seconds histogram",
+        ]
+        for key, buckets, sum_ms, _, _, _ in snapshot:
+            label = _escape_label(key)
+            cumulative = 0
+            for bound, count in zip(_bucket_labels(seconds=True), buckets):
+                cumulative += count
+                lines.append(f'{prefix}_query_duration_seconds_bucket{{fingerprint="{label}",le="{bound}"}} {cumulative}')
+            lines.append(f'{prefix}_query_duration_seconds_sum{{fingerprint="{label}"}} {sum_ms / 1000:.6f}')
+            lines.append(f'{prefix}_query_duration_seconds_count{{fingerprint="{label}"}} {cumulative}')
+
+        for name, index, help_text in (
+            ("rows", 3, "Rows returned or affected by fingerprint."),
+            ("errors", 4, "Failed executions by fingerprint."),
+            ("retries", 5, "Retries after expired sessions by fingerprint."),
+        ):
+            lines.append(f"# HELP {prefix}_query_{name}_total {help_text}")
+            lines.append(f"# TYPE {prefix}_query_{name}_total counter")
+            for entry in snapshot:
+                lines.append(f'{prefix}_query_{name}_total{{fingerprint="{_escape_label(entry[0])}"}} {entry[index]}')
+        return "\n".join(lines) + "\n"
+
+
+def _bucket_labels(seconds: bool = False) -> List[str]:
+    bounds = [f"{b / 1000:g}" if seconds else str(b) for b in LATENCY_BUCKETS_MS]
+    return bounds + ["+Inf"]
+
+
+def _escape_label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+# ============== REGISTRY ==============
+
+_registry: Optional[QueryMetrics] = None
+_registry_lock = threading.Lock()
+
+
+def get_query_metrics() -> QueryMetrics:
+    """The process-wide registry (created on first use from settings)."""
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                from config.settings import DB_SLOW_QUERY_MS, DB_SLOW_QUERY_LOG_SIZE, DB_METRICS_MAX_FINGERPRINTS
+                _registry = QueryMetrics(DB_SLOW_QUERY_MS, DB_SLOW_QUERY_LOG_SIZE, DB_METRICS_MAX_FINGERPRINTS)
+    return _registry
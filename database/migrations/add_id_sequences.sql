@@ -0,0 +1,15 @@
+-- Migration: Add sequences for pre-allocating USER_DOCUMENTS, ADMIN_DOCUMENTS and PAYMENTS IDs
+-- Lets each INSERT return its new ID in the same request instead of a follow-up SELECT MAX(...)
+
+-- START must be above the current highest ID in each table. Check with:
+--   SELECT MAX(DOC_ID) FROM APP.USER_DOCUMENTS;
+--   SELECT MAX(ADMIN_DOC_ID) FROM APP.ADMIN_DOCUMENTS;
+--   SELECT MAX(PAYMENT_ID) FROM APP.PAYMENTS;
+CREATE SEQUENCE IF NOT EXISTS APP.USER_DOCUMENTS_ID_SEQ START = 1000000 INCREMENT = 1;
+
+CREATE SEQUENCE IF NOT EXISTS APP.ADMIN_DOCUMENTS_ID_SEQ START = 1000000 INCREMENT = 1;
+
+CREATE SEQUENCE IF NOT EXISTS APP.PAYMENTS_ID_SEQ START = 1000000 INCREMENT = 1;
+
+-- Verify the changes
+SHOW SEQUENCES IN SCHEMA APP;
@@ -0,0 +1,20 @@
+-- Migration: Add INGESTION_JOBS table for background document ingestion
+-- Tracks each upload's extraction/storage job so upload pages can poll its status
+
+CREATE TABLE IF NOT EXISTS APP.INGESTION_JOBS (
+    JOB_ID VARCHAR(32) PRIMARY KEY,
+    OWNER_EMAIL VARCHAR(255),
+    DOC_KIND VARCHAR(20),                   -- 'user' or 'admin'
+    FILE_NAME VARCHAR(500),
+    STORAGE_PATH VARCHAR(100),              -- sha256:<hex> key in the storage backend
+    STATUS VARCHAR(20) DEFAULT 'QUEUED',    -- QUEUED, EXTRACTING, STORED, FAILED
+    PAGES_DONE INTEGER DEFAULT 0,
+    PAGE_COUNT INTEGER DEFAULT 0,
+    DOC_ID INTEGER,                         -- USER_DOCUMENTS.DOC_ID or ADMIN_DOCUMENTS.ADMIN_DOC_ID once stored
+    ERROR_MESSAGE VARCHAR(1000),
+    CREATED_AT TIMESTAMP_NTZ DEFAULT CURRENT_TIMESTAMP(),
+    UPDATED_AT TIMESTAMP_NTZ DEFAULT CURRENT_TIMESTAMP()
+);
+
+-- Verify the changes
+DESCRIBE TABLE APP.INGESTION_JOBS;
@@ -0,0 +1,9 @@
+-- Migration: Add PRESET_SEEN column to USERS
+-- Bitset of the preset question IDs each user has been shown, so preset
+-- selection can rotate through unseen questions before repeating any
+
+-- Stored as "<index version>:<base64 bitset>"; a stale version is treated as empty
+ALTER TABLE APP.USERS ADD COLUMN IF NOT EXISTS PRESET_SEEN VARCHAR(2000);
+
+-- Verify the changes
+DESCRIBE TABLE APP.USERS;
@@ -0,0 +1,26 @@
+-- Migration: Add QUESTION_BANK and QUESTION_BANK_SERVED tables
+-- Pre-generated AI questions per (education level, component, specialization, difficulty),
+-- refilled in the background, plus which bank questions each user has already been served
+
+CREATE TABLE IF NOT EXISTS APP.QUESTION_BANK (
+    QUESTION_ID VARCHAR(64),                -- SHA-256 of the question text, so duplicates merge
+    EDUCATION_LEVEL VARCHAR(20),            -- 'elementary' or 'secondary'
+    EXAM_COMPONENT VARCHAR(50),             -- EXAM_COMPONENTS key
+    SPECIALIZATION VARCHAR(100),            -- '' for general/professional education
+    DIFFICULTY VARCHAR(20),                 -- Easy, Medium, Hard
+    QUESTION_JSON VARCHAR(16000),           -- {"question", "options", "correct_answer", "explanation"}
+    CREATED_AT TIMESTAMP_NTZ DEFAULT CURRENT_TIMESTAMP(),
+    -- The same question may sit in several banks
+    PRIMARY KEY (EDUCATION_LEVEL, EXAM_COMPONENT, SPECIALIZATION, DIFFICULTY, QUESTION_ID)
+);
+
+CREATE TABLE IF NOT EXISTS APP.QUESTION_BANK_SERVED (
+    EMAIL VARCHAR(255),
+    BANK_KEY VARCHAR(200),                  -- level|component|specialization|difficulty
+    QUESTION_ID VARCHAR(64),
+    SERVED_AT TIMESTAMP_NTZ DEFAULT CURRENT_TIMESTAMP()
+);
+
+-- Verify the changes
+DESCRIBE TABLE APP.QUESTION_BANK;
+DESCRIBE TABLE APP.QUESTION_BANK_SERVED;
@@ -0,0 +1,268 @@
+"""
+LEPT AI Reviewer - Database Connection Pool
+Bounded, thread-safe pool shared by every Streamlit session on the server
+"""
+
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Optional
+
+
+class PoolTimeoutError(Exception):
+    """Raised when no connection becomes available within the checkout timeout."""
+
+
+class _PoolEntry:
+    """A pooled connection plus the timestamps the pool needs for housekeeping."""
+
+    __slots__ = ("conn", "created_at", "last_used")
+
+    def __init__(self, conn: Any):
+        now = time.monotonic()
+        self.conn = conn
+        self.created_at = now
+        self.last_used = now
+
+
+class ConnectionPool:
+    """
+    A bounded connection pool with checkout/checkin semantics.
+
+    - At most `max_size` connections are open at once; extra callers wait
+      up to `checkout_timeout` seconds and then get a PoolTimeoutError.
+    - Idle connections older than `idle_timeout` are closed, keeping at
+      least `min_size` around for the next burst.
+    - A connection that sat idle longer than `health_check_interval` is
+      pinged before being handed out; broken ones are replaced.
+
+    Args:
+        connect: Factory that opens a new driver connection
+        is_closed: Returns True if a connection is known to be closed
+        ping: Runs a cheap round trip; raises or returns False if unhealthy
+        close: Closes a connection (errors are swallowed)
+    """
+
+    def __init__(
+        self,
+        connect: Callable[[], Any],
+        is_closed: Callable[[Any], bool] = lambda conn: False,
+        ping: Callable[[Any], bool] = lambda conn: True,
+        close: Callable[[Any], None] = lambda conn: conn.close(),
+        min_size: int = 1,
+        max_size: int = 8,
+        checkout_timeout: float = 10.0,
+        idle_timeout: float = 300.0,
+        health_check_interval: float = 60.0,
+    ):
+        self._connect = connect
+        self._is_closed = is_closed
+        self._ping = ping
+        self._close = close
+        self.min_size = max(0, min_size)
+        self.max_size = max(1, max_size)
+        self.checkout_timeout = checkout_timeout
+        self.idle_timeout = idle_timeout
+        self.health_check_interval = health_check_interval
+
+        self._lock = threading.Lock()
+        self._available = threading.Condition(self._lock)
+        self._idle = deque()  # Oldest on the left, most recently used on the right
+        self._in_use: Dict[int, _PoolEntry] = {}
+        self._size = 0  # Open connections, idle + checked out (+ being created)
+        self._waiting = 0
+
+        self._stats = {
+            "checkouts": 0,
+            "timeouts": 0,
+            "created": 0,
+            "discarded": 0,
+            "evicted_idle": 0,
+            "failed_health_checks": 0,
+            "peak_in_use": 0,
+            "peak_waiting": 0,
+            "total_wait_ms": 0.0,
+            "max_wait_ms": 0.0,
+        }
+
+    # ============== CHECKOUT / CHECKIN ==============
+
+    def checkout(self, timeout: Optional[float] = None) -> Any:
+        """
+        Borrow a connection from the pool.
+
+        Args:
+            timeout: Seconds to wait for a free slot (defaults to checkout_timeout)
+
+        Returns:
+            An open driver connection; must be returned with checkin()
+        """
+        timeout = self.checkout_timeout if timeout is None else timeout
+        start = time.monotonic()
+        deadline = start + timeout
+
+        while True:
+            entry = None
+            expired = []
+            try:
+                with self._available:
+                    self._waiting += 1
+                    self._stats["peak_waiting"] = max(self._stats["peak_waiting"], self._waiting)
+                    try:
+                        while True:
+                            expired.extend(self._pop_expired_idle_locked())
+                            if self._idle:
+                                entry = self._idle.pop()
+                                break
+                            if self._size < self.max_size:
+                                # Reserve a slot; the connection is opened outside the lock
+                                self._size += 1
+                                break
+                            remaining = deadline - time.monotonic()
+                            if remaining <= 0:
+                                self._stats["timeouts"] += 1
+                                raise PoolTimeoutError(
+                                    f"No database connection available after {timeout:.1f}s "
+                                    f"({self.max_size} in use)"
+                                )
+                            self._available.wait(remaining)
+                    finally:
+                        self._waiting -= 1
+            finally:
+                self._close_all(expired)
+
+            if entry is None:
+                try:
+                    entry = _PoolEntry(self._connect())
+                except Exception:
+                    with self._available:
+                        self._size -= 1
+                        self._available.notify()
+                    raise
+                with self._lock:
+                    self._stats["created"] += 1
+            elif not self._is_healthy(entry):
+                with self._available:
+                    self._size -= 1
+                    self._stats["failed_health_checks"] += 1
+                    self._stats["discarded"] += 1
+                    self._available.notify()
+                self._safe_close(entry.conn)
+                continue
+
+            waited_ms = (time.monotonic() - start) * 1000
+            with self._lock:
+                self._in_use[id(entry.conn)] = entry
+                self._stats["checkouts"] += 1
+                self._stats["total_wait_ms"] += waited_ms
+                self._stats["max_wait_ms"] = max(self._stats["max_wait_ms"], waited_ms)
+                self._stats["peak_in_use"] = max(self._stats["peak_in_use"], len(self._in_use))
+            return entry.conn
+
+    def checkin(self, conn: Any, discard: bool = False):
+        """
+        Return a borrowed connection to the pool.
+
+        Args:
+            conn: Connection previously returned by checkout()
+            discard: Close the connection instead of reusing it (e.g. after a
+                     session-expired or network error)
+        """
+        with self._available:
+            entry = self._in_use.pop(id(conn), None)
+            if entry is None:
+                return
+            if discard or self._safe_is_closed(conn):
+                self._size -= 1
+                self._stats["discarded"] += 1
+                close_now = True
+            else:
+                entry.last_used = time.monotonic()
+                self._idle.append(entry)
+                close_now = False
+            expired = self._pop_expired_idle_locked()
+            self._available.notify()
+
+        if close_now:
+            self._safe_close(conn)
+        self._close_all(expired)
+
+    @contextmanager
+    def connection(self, timeout: Optional[float] = None):
+        """Context manager that checks a connection out and always checks it back in."""
+        conn = self.checkout(timeout)
+        discard = False
+        try:
+            yield conn
+        except BaseException:
+            discard = self._safe_is_closed(conn)
+            raise
+        finally:
+            self.checkin(conn, discard=discard)
+
+    def close_all(self):
+        """Close every idle connection (checked-out ones close on checkin)."""
+        with self._available:
+            entries = list(self._idle)
+            self._idle.clear()
+            self._size -= len(entries)
+            self._available.notify_all()
+        self._close_all(entries)
+
+    # ============== METRICS ==============
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Snapshot of pool size, saturation and wait metrics."""
+        with self._lock:
+            in_use = len(self._in_use)
+            stats = dict(self._stats)
+            stats.update({
+                "max_size": self.max_size,
+                "min_size": self.min_size,
+                "open": self._size,
+                "in_use": in_use,
+                "idle": len(self._idle),
+                "waiting": self._waiting,
+                "saturation": in_use / self.max_size,
+                "avg_wait_ms": (stats["total_wait_ms"] / stats["checkouts"]) if stats["checkouts"] else 0.0,
+            })
+        return stats
+
+    # ============== INTERNALS ==============
+
+    def _pop_expired_idle_locked(self) -> list:
+        """Detach idle connections past idle_timeout; caller closes them outside the lock."""
+        expired = []
+        cutoff = time.monotonic() - self.idle_timeout
+        while self._idle and self._size > self.min_size and self._idle[0].last_used < cutoff:
+            expired.append(self._idle.popleft())
+            self._size -= 1
+            self._stats["evicted_idle"] += 1
+        return expired
+
+    def _is_healthy(self, entry: _PoolEntry) -> bool:
+        if self._safe_is_closed(entry.conn):
+            return False
+        if time.monotonic() - entry.last_used < self.health_check_interval:
+            return True
+        try:
+            return bool(self._ping(entry.conn))
+        except Exception:
+            return False
+
+    def _safe_is_closed(self, conn: Any) -> bool:
+        try:
+            return bool(self._is_closed(conn))
+        except Exception:
+            return True
+
+    def _safe_close(self, conn: Any):
+        try:
+            self._close(conn)
+        except Exception:
+            pass
+
+    def _close_all(self, entries: list):
+        for entry in entries:
+            self._safe_close(entry.conn)
@@ -3,19 +3,26 @@ LEPT AI Reviewer - Database Query Functions
 OPTIMIZED: Uses cached queries for reads, invalidates cache on writes
 """
 
+import json
 from datetime import datetime, timedelta
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Iterable, Tuple
 
-from database.connection import execute_query, execute_write
+from database.connection import execute_query, execute_write, execute_multi_statement
+from database.write_behind import enqueue_write, insert_many
 from database.cached_queries import (
-    cached_get_user_by_email, cached_get_admin_documents, cached_get_user_documents,
+    cached_get_user_by_email, select_user_by_email, cached_get_admin_documents, cached_get_user_documents,
     cached_is_ip_blocked, invalidate_user_cache, invalidate_admin_docs_cache, 
-    invalidate_user_docs_cache
+    invalidate_user_docs_cache, invalidate_document_text_cache,
+    cached_get_admin_document_text, cached_get_user_document_text,
+    write_log_ip_history_batch, write_log_ip_usage_batch
 )
+from services.file_storage import is_storage_key
 from config.settings import (
     PLAN_FREE, PLAN_PRO, PLAN_PREMIUM,
     FREE_QUESTION_LIMIT, PRO_QUESTION_BONUS, PREMIUM_DURATION_DAYS,
-    PAYMENT_PENDING, PAYMENT_APPROVED, PAYMENT_REJECTED
+    PAYMENT_PENDING, PAYMENT_APPROVED, PAYMENT_REJECTED,
+    INGESTION_QUEUED, INGESTION_EXTRACTING, INGESTION_FAILED,
+    WRITE_BEHIND_BATCH_SIZE
 )
 
 
@@ -28,28 +35,7 @@ def get_user_by_email(email: str) -> Optional[Dict]:
 
 def get_fresh_user_by_email(email: str) -> Optional[Dict]:
     """Get fresh (non-cached) user data - use sparingly."""
-    query = """
-    SELECT EMAIL, IP_ADDRESS, PLAN_STATUS, QUESTIONS_USED_TOTAL, QUESTIONS_REMAINING, 
-           PREMIUM_EXPIRY, IS_BLOCKED, CREATED_AT, UPDATED_AT
-    FROM USERS 
-    WHERE EMAIL = %s
-    LIMIT 1
-    """
-    result = execute_query(query, (email,))
-    if result and len(result) > 0:
-        row = result[0]
-        return {
-            "email": row[0],
-            "ip_address": row[1],
-            "plan_type": row[2],
-            "questions_used_total": row[3],
-            "questions_remaining": row[4],
-            "premium_expiry": row[5],
-            "is_blocked": row[6],
-            "created_at": row[7],
-            "updated_at": row[8]
-        }
-    return None
+    return select_user_by_email(email)
 
 
 def create_user(email: str, ip_address: str) -> Optional[str]:
@@ -112,6 +98,85 @@ def decrement_user_questions(email: str, count: int = 1) -> bool:
     return result
 
 
+def charge_questions(email: str, ip_address: str, count: int, unlimited: bool = False,
+                     source_type: str = None, category: str = None, difficulty: str = None,
+                     notes: str = None) -> Optional[int]:
+    """
+    Charge a generation in ONE atomic request: quota check + decrement
+    and usage-log insert. The IP_USAGE counter is bumped by the abuse
+    guard's background reconciliation instead (see add_ip_usage_counts).
+    
+    Args:
+        unlimited: Active PREMIUM - log and count the usage without touching the quota
+    
+    Returns:
+        The user's new QUESTIONS_REMAINING, or None if quota was insufficient or on error
+    """
+    charge = 0 if unlimited else count
+    results = execute_multi_statement([
+        ("BEGIN", None),
+        ("""
+        INSERT INTO USAGE_LOGS (EMAIL, IP_ADDRESS, QUESTIONS_GENERATED, SOURCE_TYPE, CATEGORY, DIFFICULTY, NOTES)
+        SELECT %s, %s, %s, %s, %s, %s, %s
+        FROM USERS
+        WHERE EMAIL = %s AND QUESTIONS_REMAINING >= %s
+        LIMIT 1
+        """, (email, ip_address, count, source_type, category, difficulty, notes, email, charge)),
+        ("""
+        UPDATE USERS 
+        SET QUESTIONS_REMAINING = QUESTIONS_REMAINING - %s,
+            QUESTIONS_USED_TOTAL = QUESTIONS_USED_TOTAL + %s,
+            UPDATED_AT = CURRENT_TIMESTAMP()
+        WHERE EMAIL = %s AND QUESTIONS_REMAINING >= %s
+        """, (charge, charge, email, charge)),
+        ("SELECT QUESTIONS_REMAINING FROM USERS WHERE EMAIL = %s LIMIT 1", (email,)),
+        ("COMMIT", None),
+    ])
+    
+    if not results or len(results) < 4:
+        return None
+    
+    invalidate_user_cache(email)
+    
+    users_updated = results[2][0][0] if results[2] else 0
+    if not users_updated or not results[3]:
+        return None
+    return results[3][0][0]
+
+
+def refund_questions(email: str, ip_address: str, count: int, source_type: str = None,
+                     notes: str = None) -> Optional[int]:
+    """
+    Give back questions charged for items that were never delivered, logged
+    as a negative USAGE_LOGS row so usage totals stay correct.
+    
+    Returns:
+        The user's new QUESTIONS_REMAINING, or None on error
+    """
+    results = execute_multi_statement([
+        ("BEGIN", None),
+        ("""
+        INSERT INTO USAGE_LOGS (EMAIL, IP_ADDRESS, QUESTIONS_GENERATED, SOURCE_TYPE, NOTES)
+        VALUES (%s, %s, %s, %s, %s)
+        """, (email, ip_address, -count, source_type, notes)),
+        ("""
+        UPDATE USERS 
+        SET QUESTIONS_REMAINING = QUESTIONS_REMAINING + %s,
+            QUESTIONS_USED_TOTAL = QUESTIONS_USED_TOTAL - %s,
+            UPDATED_AT = CURRENT_TIMESTAMP()
+        WHERE EMAIL = %s
+        """, (count, count, email)),
+        ("SELECT QUESTIONS_REMAINING FROM USERS WHERE EMAIL = %s LIMIT 1", (email,)),
+        ("COMMIT", None),
+    ])
+    
+    if not results or len(results) < 4:
+        return None
+    
+    invalidate_user_cache(email)
+    return results[3][0][0] if results[3] else None
+
+
 def block_user(email: str, blocked: bool = True):
     """Block or unblock a user."""
     query = """
@@ -125,6 +190,31 @@ def block_user(email: str, blocked: bool = True):
     return result
 
 
+def _write_preset_seen(rows: List[Tuple[str, str]]) -> bool:
+    """Write-behind flusher: store the latest PRESET_SEEN per user with one MERGE per batch."""
+    latest = list({row[0]: row for row in rows}.values())
+    success = True
+    for start in range(0, len(latest), WRITE_BEHIND_BATCH_SIZE):
+        batch = latest[start:start + WRITE_BEHIND_BATCH_SIZE]
+        query = f"""
+        MERGE INTO USERS t
+        USING (SELECT column1 AS EMAIL, column2 AS PRESET_SEEN FROM VALUES {", ".join(["(%s, %s)"] * len(batch))}) s
+        ON t.EMAIL = s.EMAIL
+        WHEN MATCHED THEN UPDATE SET PRESET_SEEN = s.PRESET_SEEN
+        """
+        if execute_write(query, tuple(value for row in batch for value in row)):
+            for email, _ in batch:
+                invalidate_user_cache(email)
+        else:
+            success = False
+    return success
+
+
+def save_preset_seen(email: str, preset_seen: str):
+    """Persist a user's seen-preset bitset - queued and written in the background."""
+    return enqueue_write(_write_preset_seen, (email, preset_seen))
+
+
 def get_all_users(limit: int = 100) -> List[Dict]:
     """Get all users for admin panel - with limit, deduplicated by email."""
     # Use ROW_NUMBER to get only the latest record per email (handles duplicates)
@@ -226,33 +316,34 @@ def check_premium_expiry(email: str) -> bool:
 
 # ============== IP TRACKING QUERIES ==============
 
+def _write_ip_history_rows(rows: List[Tuple[str, str]]) -> bool:
+    """Write-behind flusher: one MERGE for a batch of (email, ip) rows."""
+    return write_log_ip_history_batch(rows)
+
+
+def _write_ip_usage_rows(rows: List[Tuple[str]]) -> bool:
+    """Write-behind flusher: one MERGE for a batch of (ip,) rows."""
+    return write_log_ip_usage_batch(row[0] for row in rows)
+
+
 def log_ip_history(email: str, ip_address: str):
-    """Log IP address in user history."""
-    check_query = "SELECT ID FROM USER_IP_HISTORY WHERE EMAIL = %s AND IP_ADDRESS = %s LIMIT 1"
-    existing = execute_query(check_query, (email, ip_address))
-    
-    if existing and len(existing) > 0:
-        update_query = """
-        UPDATE USER_IP_HISTORY SET LAST_SEEN = CURRENT_TIMESTAMP() 
-        WHERE EMAIL = %s AND IP_ADDRESS = %s
-        """
-        execute_write(update_query, (email, ip_address))
-    else:
-        insert_query = "INSERT INTO USER_IP_HISTORY (EMAIL, IP_ADDRESS) VALUES (%s, %s)"
-        execute_write(insert_query, (email, ip_address))
+    """Log IP address in user history - queued, written by a batched MERGE upsert."""
+    return enqueue_write(_write_ip_history_rows, (email, ip_address))
+
+
+def log_ip_history_batch(pairs: Iterable[Tuple[str, str]]) -> bool:
+    """Log many (email, ip) pairs at once - e.g. a burst of logins."""
+    return write_log_ip_history_batch(pairs)
 
 
 def log_ip_usage(ip_address: str):
-    """Log or update IP usage."""
-    check_query = "SELECT IP_ADDRESS FROM IP_USAGE WHERE IP_ADDRESS = %s LIMIT 1"
-    existing = execute_query(check_query, (ip_address,))
-    
-    if existing and len(existing) > 0:
-        update_query = "UPDATE IP_USAGE SET LAST_SEEN = CURRENT_TIMESTAMP() WHERE IP_ADDRESS = %s"
-        execute_write(update_query, (ip_address,))
-    else:
-        insert_query = "INSERT INTO IP_USAGE (IP_ADDRESS) VALUES (%s)"
-        execute_write(insert_query, (ip_address,))
+    """Log or update IP usage - queued, written by a batched MERGE upsert."""
+    return enqueue_write(_write_ip_usage_rows, (ip_address,))
+
+
+def log_ip_usage_batch(ip_addresses: Iterable[str]) -> bool:
+    """Log or update many IPs at once."""
+    return write_log_ip_usage_batch(ip_addresses)
 
 
 def increment_ip_usage(ip_address: str, count: int = 1):
@@ -270,16 +361,67 @@ def is_ip_blocked(ip_address: str) -> bool:
     return cached_is_ip_blocked(ip_address)
 
 
+def get_blocked_ips() -> Optional[List[str]]:
+    """Every blocked IP (a short list), or None if the query failed."""
+    result = execute_query("SELECT IP_ADDRESS FROM IP_USAGE WHERE IS_BLOCKED = TRUE")
+    if result is None:
+        return None
+    return [row[0] for row in result]
+
+
+def get_ip_history_since(since: datetime, limit: int = 10000) -> Optional[List[Tuple[str, str, datetime]]]:
+    """
+    (email, ip, last_seen) rows of USER_IP_HISTORY seen at or after `since`,
+    oldest first - for incremental syncing. None if the query failed.
+    """
+    query = """
+    SELECT EMAIL, IP_ADDRESS, LAST_SEEN
+    FROM USER_IP_HISTORY
+    WHERE LAST_SEEN >= %s
+    ORDER BY LAST_SEEN
+    LIMIT %s
+    """
+    result = execute_query(query, (since, limit))
+    if result is None:
+        return None
+    return [(row[0], row[1], row[2]) for row in result]
+
+
+def add_ip_usage_counts(counts: Dict[str, int]) -> bool:
+    """Add per-IP question counts to IP_USAGE.QUESTIONS_USED_TOTAL, one MERGE per batch."""
+    rows = [(ip, count) for ip, count in counts.items() if ip and count]
+    success = True
+    for start in range(0, len(rows), WRITE_BEHIND_BATCH_SIZE):
+        batch = rows[start:start + WRITE_BEHIND_BATCH_SIZE]
+        query = f"""
+        MERGE INTO IP_USAGE t
+        USING (SELECT column1 AS IP_ADDRESS, column2 AS QUESTIONS FROM VALUES {", ".join(["(%s, %s)"] * len(batch))}) s
+        ON t.IP_ADDRESS = s.IP_ADDRESS
+        WHEN MATCHED THEN UPDATE SET QUESTIONS_USED_TOTAL = t.QUESTIONS_USED_TOTAL + s.QUESTIONS,
+                                     LAST_SEEN = CURRENT_TIMESTAMP()
+        WHEN NOT MATCHED THEN INSERT (IP_ADDRESS, QUESTIONS_USED_TOTAL) VALUES (s.IP_ADDRESS, s.QUESTIONS)
+        """
+        success = execute_write(query, tuple(value for row in batch for value in row)) and success
+    return success
+
+
 # ============== USAGE LOG QUERIES ==============
 
+USAGE_LOG_COLUMNS = ("EMAIL", "IP_ADDRESS", "QUESTIONS_GENERATED", "SOURCE_TYPE", "CATEGORY", "DIFFICULTY", "NOTES")
+
+
+def _write_usage_logs(rows: List[tuple]) -> bool:
+    """Write-behind flusher: multi-row INSERT into USAGE_LOGS."""
+    return insert_many("USAGE_LOGS", USAGE_LOG_COLUMNS, rows)
+
+
 def log_usage(email: str, ip_address: str, questions_generated: int, 
               source_type: str = None, category: str = None, difficulty: str = None, notes: str = None):
-    """Log a usage event."""
-    query = """
-    INSERT INTO USAGE_LOGS (EMAIL, IP_ADDRESS, QUESTIONS_GENERATED, SOURCE_TYPE, CATEGORY, DIFFICULTY, NOTES)
-    VALUES (%s, %s, %s, %s, %s, %s, %s)
-    """
-    return execute_write(query, (email, ip_address, questions_generated, source_type, category, difficulty, notes))
+    """Log a usage event - queued and written in the background."""
+    return enqueue_write(
+        _write_usage_logs,
+        (email, ip_address, questions_generated, source_type, category, difficulty, notes)
+    )
 
 
 def get_user_logs(email: str, limit: int = 20) -> List[Dict]:
@@ -335,43 +477,131 @@ def get_all_logs(limit: int = 50) -> List[Dict]:
     return logs
 
 
+# ============== ID ALLOCATION ==============
+
+_missing_sequences = set()
+
+
+def _sequence_exists(sequence: str) -> bool:
+    """True unless SHOW SEQUENCES positively says the sequence isn't there."""
+    result = execute_query("SHOW SEQUENCES LIKE %s", (sequence,))
+    return result is None or bool(result)
+
+
+def _insert_returning_id(sequence: str, insert_query: str, params: tuple,
+                         id_lookup: Tuple[str, tuple]) -> Optional[int]:
+    """
+    Insert a row and get its new ID in the SAME request.
+    
+    Snowflake has no INSERT ... RETURNING, so the ID is pre-allocated from a
+    sequence into a session variable; insert_query must use $NEW_ID as the
+    value of its ID column. Unlike SELECT MAX(...), this can never return
+    another session's row.
+    
+    If the sequence hasn't been created yet (migrations/add_id_sequences.sql
+    not run), falls back to inserting with the column's DEFAULT and looking
+    the ID up with id_lookup (query, params) - the old, racy path - and
+    logs a warning.
+    """
+    if sequence not in _missing_sequences:
+        results = execute_multi_statement([
+            (f"SET NEW_ID = (SELECT {sequence}.NEXTVAL)", None),
+            (insert_query, params),
+            ("SELECT $NEW_ID", None),
+        ])
+        if results and len(results) == 3 and results[2]:
+            return results[2][0][0]
+        if _sequence_exists(sequence):
+            return None
+        print(f"WARNING: sequence {sequence} is missing - run database/migrations/add_id_sequences.sql. "
+              f"Falling back to INSERT + SELECT MAX(...), which can return another session's row.")
+        _missing_sequences.add(sequence)
+
+    if not execute_write(insert_query.replace("$NEW_ID", "DEFAULT"), params):
+        return None
+    lookup_query, lookup_params = id_lookup
+    result = execute_query(lookup_query, lookup_params)
+    if result and result[0]:
+        return result[0][0]
+    return None
+
+
 # ============== USER DOCUMENT QUERIES ==============
 
 def save_user_document(email: str, filename: str, file_type: str, storage_path: str, 
                        text_hash: str = None, extracted_text: str = None) -> Optional[int]:
     """Save a user-uploaded document with extracted text for AI use."""
-    result = False
+    doc_id = None
     
     # Try with EXTRACTED_TEXT column first (if column exists in table)
     if extracted_text:
         query_with_text = """
-        INSERT INTO USER_DOCUMENTS (EMAIL, FILE_NAME, FILE_TYPE, STORAGE_PATH, TEXT_HASH, EXTRACTED_TEXT)
-        VALUES (%s, %s, %s, %s, %s, %s)
+        INSERT INTO USER_DOCUMENTS (DOC_ID, EMAIL, FILE_NAME, FILE_TYPE, STORAGE_PATH, TEXT_HASH, EXTRACTED_TEXT)
+        VALUES ($NEW_ID, %s, %s, %s, %s, %s, %s)
         """
-        result = execute_write(query_with_text, (email, filename, file_type, storage_path, text_hash, extracted_text))
+        doc_id = _insert_returning_id(
+            "USER_DOCUMENTS_ID_SEQ", query_with_text,
+            (email, filename, file_type, storage_path, text_hash, extracted_text),
+            ("SELECT MAX(DOC_ID) FROM USER_DOCUMENTS WHERE EMAIL = %s AND FILE_NAME = %s", (email, filename))
+        )
     
     # Fallback: try without EXTRACTED_TEXT column
-    if not result:
+    if doc_id is None:
         query_basic = """
-        INSERT INTO USER_DOCUMENTS (EMAIL, FILE_NAME, FILE_TYPE, STORAGE_PATH, TEXT_HASH)
-        VALUES (%s, %s, %s, %s, %s)
+        INSERT INTO USER_DOCUMENTS (DOC_ID, EMAIL, FILE_NAME, FILE_TYPE, STORAGE_PATH, TEXT_HASH)
+        VALUES ($NEW_ID, %s, %s, %s, %s, %s)
         """
-        result = execute_write(query_basic, (email, filename, file_type, storage_path, text_hash))
+        doc_id = _insert_returning_id(
+            "USER_DOCUMENTS_ID_SEQ", query_basic,
+            (email, filename, file_type, storage_path, text_hash),
+            ("SELECT MAX(DOC_ID) FROM USER_DOCUMENTS WHERE EMAIL = %s AND FILE_NAME = %s", (email, filename))
+        )
     
-    if result:
+    if doc_id is not None:
         invalidate_user_docs_cache(email)
-        id_query = "SELECT MAX(DOC_ID) FROM USER_DOCUMENTS WHERE EMAIL = %s AND FILE_NAME = %s LIMIT 1"
-        id_result = execute_query(id_query, (email, filename))
-        if id_result and id_result[0]:
-            return id_result[0][0]
+    return doc_id
+
+
+def get_extracted_text_by_hash(text_hash: str) -> Optional[str]:
+    """
+    Find text already extracted from a file with the same SHA-256.
+    
+    Checks both document tables, so a reviewer uploaded by an admin or any
+    user is only parsed once. Placeholder texts stored by older versions are
+    skipped so the file gets extracted again.
+    """
+    from services.document_processor import PLACEHOLDER_SQL_PATTERN
+
+    query = """
+    SELECT EXTRACTED_TEXT FROM (
+        SELECT EXTRACTED_TEXT, UPLOADED_AT FROM ADMIN_DOCUMENTS
+        WHERE TEXT_HASH = %s AND EXTRACTED_TEXT IS NOT NULL AND EXTRACTED_TEXT NOT LIKE %s
+        UNION ALL
+        SELECT EXTRACTED_TEXT, UPLOADED_AT FROM USER_DOCUMENTS
+        WHERE TEXT_HASH = %s AND EXTRACTED_TEXT IS NOT NULL AND EXTRACTED_TEXT NOT LIKE %s
+    )
+    ORDER BY UPLOADED_AT DESC
+    LIMIT 1
+    """
+    result = execute_query(query, (text_hash, PLACEHOLDER_SQL_PATTERN, text_hash, PLACEHOLDER_SQL_PATTERN))
+    if result and result[0]:
+        return result[0][0]
     return None
 
 
 def get_user_documents(email: str) -> List[Dict]:
-    """Get all documents uploaded by a user - CACHED."""
+    """Get all documents uploaded by a user (metadata only) - CACHED."""
     return cached_get_user_documents(email)
 
 
+def get_user_document_text(doc_id: int, email: str) -> Optional[Dict]:
+    """Get the extracted text from one of a user's documents - CACHED by doc ID."""
+    doc = cached_get_user_document_text(doc_id)
+    if doc and doc.get("email") == email:
+        return doc
+    return None
+
+
 def delete_user_document(doc_id: int, email: str) -> bool:
     """Soft delete a user's document."""
     query = """
@@ -381,6 +611,7 @@ def delete_user_document(doc_id: int, email: str) -> bool:
     result = execute_write(query, (doc_id, email))
     if result:
         invalidate_user_docs_cache(email)
+        invalidate_document_text_cache(doc_id, source="user")
     return result
 
 
@@ -388,27 +619,28 @@ def delete_user_document(doc_id: int, email: str) -> bool:
 
 def save_admin_document(filename: str, file_type: str, storage_path: str, 
                         is_downloadable: bool = False, uploaded_by: str = "admin", 
-                        text_hash: str = None, file_content: bytes = None, 
-                        extracted_text: str = None, category: str = "General") -> Optional[int]:
-    """Save an admin-uploaded reviewer document with file content."""
-    import base64
-    
-    file_content_b64 = base64.b64encode(file_content).decode('utf-8') if file_content else None
+                        text_hash: str = None, extracted_text: str = None,
+                        category: str = "General") -> Optional[int]:
+    """
+    Save an admin-uploaded reviewer document.
     
+    The file itself lives in the storage backend; storage_path is its
+    content-hash key from services.file_storage.
+    """
     query = """
-    INSERT INTO ADMIN_DOCUMENTS (FILE_NAME, FILE_TYPE, STORAGE_PATH, IS_DOWNLOADABLE, 
-                                 UPLOADED_BY, TEXT_HASH, FILE_CONTENT, EXTRACTED_TEXT, CATEGORY)
-    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+    INSERT INTO ADMIN_DOCUMENTS (ADMIN_DOC_ID, FILE_NAME, FILE_TYPE, STORAGE_PATH, IS_DOWNLOADABLE, 
+                                 UPLOADED_BY, TEXT_HASH, EXTRACTED_TEXT, CATEGORY)
+    VALUES ($NEW_ID, %s, %s, %s, %s, %s, %s, %s, %s)
     """
-    result = execute_write(query, (filename, file_type, storage_path, is_downloadable, 
-                                   uploaded_by, text_hash, file_content_b64, extracted_text, category))
-    if result:
+    doc_id = _insert_returning_id(
+        "ADMIN_DOCUMENTS_ID_SEQ", query,
+        (filename, file_type, storage_path, is_downloadable, 
+         uploaded_by, text_hash, extracted_text, category),
+        ("SELECT MAX(ADMIN_DOC_ID) FROM ADMIN_DOCUMENTS WHERE FILE_NAME = %s", (filename,))
+    )
+    if doc_id is not None:
         invalidate_admin_docs_cache()
-        id_query = "SELECT MAX(ADMIN_DOC_ID) FROM ADMIN_DOCUMENTS WHERE FILE_NAME = %s LIMIT 1"
-        id_result = execute_query(id_query, (filename,))
-        if id_result and id_result[0]:
-            return id_result[0][0]
-    return None
+    return doc_id
 
 
 def get_admin_documents() -> List[Dict]:
@@ -416,41 +648,47 @@ def get_admin_documents() -> List[Dict]:
     return cached_get_admin_documents()
 
 
-def get_admin_document_content(doc_id: int) -> Optional[bytes]:
-    """Get the file content of an admin document for download."""
-    import base64
+def get_admin_document_content(doc_id: int) -> Optional[Dict]:
+    """
+    Locate the file content of an admin document for download.
     
+    Returns:
+        {"storage_key", "filename", "file_type"} for files in the storage
+        backend (open them with get_storage_backend().open), or
+        {"content", "filename", "file_type"} for legacy base64 rows
+    """
     query = """
-    SELECT FILE_CONTENT, FILE_NAME, FILE_TYPE
+    SELECT STORAGE_PATH, FILE_NAME, FILE_TYPE
     FROM ADMIN_DOCUMENTS 
     WHERE ADMIN_DOC_ID = %s AND IS_DELETED = FALSE
     LIMIT 1
     """
     result = execute_query(query, (doc_id,))
+    if not result or not result[0]:
+        return None
+    storage_path, filename, file_type = result[0]
+    
+    if is_storage_key(storage_path):
+        return {"storage_key": storage_path, "filename": filename, "file_type": file_type}
+    
+    # Legacy rows uploaded before binary storage keep base64 in FILE_CONTENT
+    import base64
+    
+    result = execute_query(
+        "SELECT FILE_CONTENT FROM ADMIN_DOCUMENTS WHERE ADMIN_DOC_ID = %s LIMIT 1", (doc_id,)
+    )
     if result and result[0] and result[0][0]:
-        file_content_b64 = result[0][0]
-        filename = result[0][1]
-        file_type = result[0][2]
         try:
-            file_bytes = base64.b64decode(file_content_b64)
+            file_bytes = base64.b64decode(result[0][0])
             return {"content": file_bytes, "filename": filename, "file_type": file_type}
         except Exception:
             return None
     return None
 
 
-def get_admin_document_text(doc_id: int) -> Optional[str]:
-    """Get the extracted text from an admin document."""
-    query = """
-    SELECT EXTRACTED_TEXT, FILE_NAME
-    FROM ADMIN_DOCUMENTS 
-    WHERE ADMIN_DOC_ID = %s AND IS_DELETED = FALSE
-    LIMIT 1
-    """
-    result = execute_query(query, (doc_id,))
-    if result and result[0]:
-        return {"text": result[0][0], "filename": result[0][1]}
-    return None
+def get_admin_document_text(doc_id: int) -> Optional[Dict]:
+    """Get the extracted text from an admin document - CACHED by doc ID."""
+    return cached_get_admin_document_text(doc_id)
 
 
 def update_admin_document_downloadable(doc_id: int, is_downloadable: bool):
@@ -475,26 +713,178 @@ def delete_admin_document(doc_id: int) -> bool:
     result = execute_write(query, (doc_id,))
     if result:
         invalidate_admin_docs_cache()
+        invalidate_document_text_cache(doc_id, source="admin")
     return result
 
 
+# ============== INGESTION JOB QUERIES ==============
+
+INGESTION_JOB_COLUMNS = ("JOB_ID", "OWNER_EMAIL", "DOC_KIND", "FILE_NAME", "STORAGE_PATH",
+                         "STATUS", "PAGES_DONE", "PAGE_COUNT", "DOC_ID", "ERROR_MESSAGE")
+
+
+def _write_ingestion_jobs(rows: List[tuple]) -> bool:
+    """Write-behind flusher: upsert the latest state of each job with one MERGE per batch."""
+    # Keep only the newest row per job - MERGE rejects duplicate source keys
+    latest = list({row[0]: row for row in rows}.values())
+    columns = ", ".join(f"column{i + 1} AS {name}" for i, name in enumerate(INGESTION_JOB_COLUMNS))
+    updates = ", ".join(f"{name} = s.{name}" for name in INGESTION_JOB_COLUMNS[1:])
+    inserts = ", ".join(f"s.{name}" for name in INGESTION_JOB_COLUMNS)
+    placeholders = "(" + ", ".join(["%s"] * len(INGESTION_JOB_COLUMNS)) + ")"
+    success = True
+    
+    for start in range(0, len(latest), WRITE_BEHIND_BATCH_SIZE):
+        batch = latest[start:start + WRITE_BEHIND_BATCH_SIZE]
+        query = f"""
+        MERGE INTO INGESTION_JOBS t
+        USING (SELECT {columns} FROM VALUES {", ".join([placeholders] * len(batch))}) s
+        ON t.JOB_ID = s.JOB_ID
+        WHEN MATCHED THEN UPDATE SET {updates}, UPDATED_AT = CURRENT_TIMESTAMP()
+        WHEN NOT MATCHED THEN INSERT ({", ".join(INGESTION_JOB_COLUMNS)}) VALUES ({inserts})
+        """
+        params = tuple(value for row in batch for value in row)
+        success = execute_write(query, params) and success
+    return success
+
+
+def save_ingestion_job(job: Dict) -> bool:
+    """Persist an ingestion job's current state - queued and written in the background."""
+    return enqueue_write(
+        _write_ingestion_jobs,
+        (job["job_id"], job["owner_email"], job["kind"], job["filename"], job["storage_key"],
+         job["status"], job["pages_done"], job["page_count"], job["doc_id"], job["error"])
+    )
+
+
+def get_ingestion_job_row(job_id: str) -> Optional[Dict]:
+    """Load a persisted ingestion job (e.g. after a server restart)."""
+    query = """
+    SELECT JOB_ID, OWNER_EMAIL, DOC_KIND, FILE_NAME, STORAGE_PATH, STATUS,
+           PAGES_DONE, PAGE_COUNT, DOC_ID, ERROR_MESSAGE
+    FROM INGESTION_JOBS
+    WHERE JOB_ID = %s
+    LIMIT 1
+    """
+    result = execute_query(query, (job_id,))
+    if result and result[0]:
+        row = result[0]
+        return {
+            "job_id": row[0],
+            "owner_email": row[1],
+            "kind": row[2],
+            "filename": row[3],
+            "storage_key": row[4],
+            "status": row[5],
+            "pages_done": row[6] or 0,
+            "page_count": row[7] or 0,
+            "doc_id": row[8],
+            "error": row[9]
+        }
+    return None
+
+
+def fail_interrupted_ingestion_jobs(started_before: datetime, error: str) -> bool:
+    """Mark QUEUED/EXTRACTING jobs not updated since `started_before` as FAILED (their server restarted)."""
+    query = """
+    UPDATE INGESTION_JOBS
+    SET STATUS = %s, ERROR_MESSAGE = %s, UPDATED_AT = CURRENT_TIMESTAMP()
+    WHERE STATUS IN (%s, %s) AND UPDATED_AT < %s
+    """
+    return execute_write(query, (INGESTION_FAILED, error, INGESTION_QUEUED, INGESTION_EXTRACTING, started_before))
+
+
+# ============== QUESTION BANK QUERIES ==============
+
+QUESTION_BANK_COLUMNS = ("QUESTION_ID", "EDUCATION_LEVEL", "EXAM_COMPONENT", "SPECIALIZATION",
+                         "DIFFICULTY", "QUESTION_JSON")
+QUESTION_BANK_SERVED_COLUMNS = ("EMAIL", "BANK_KEY", "QUESTION_ID")
+
+
+def get_bank_questions(education_level: str, exam_component: str, specialization: str,
+                       difficulty: str, limit: int = 1000) -> List[Dict]:
+    """Load a bank's questions, oldest first. Each has a question_id plus the usual question fields."""
+    query = """
+    SELECT QUESTION_ID, QUESTION_JSON
+    FROM QUESTION_BANK
+    WHERE EDUCATION_LEVEL = %s AND EXAM_COMPONENT = %s AND SPECIALIZATION = %s AND DIFFICULTY = %s
+    ORDER BY CREATED_AT, QUESTION_ID
+    LIMIT %s
+    """
+    result = execute_query(query, (education_level, exam_component, specialization, difficulty, limit))
+    questions = []
+    for row in result or []:
+        try:
+            question = json.loads(row[1])
+        except (TypeError, ValueError):
+            continue
+        question["question_id"] = row[0]
+        questions.append(question)
+    return questions
+
+
+def save_bank_questions(education_level: str, exam_component: str, specialization: str,
+                        difficulty: str, questions: List[Dict]) -> bool:
+    """Add questions (each with a question_id) to a bank with one MERGE per batch; IDs already in it are skipped."""
+    rows = list({
+        q["question_id"]: (q["question_id"], education_level, exam_component, specialization, difficulty,
+                           json.dumps({k: v for k, v in q.items() if k != "question_id"}))
+        for q in questions
+    }.values())
+    columns = ", ".join(f"column{i + 1} AS {name}" for i, name in enumerate(QUESTION_BANK_COLUMNS))
+    inserts = ", ".join(f"s.{name}" for name in QUESTION_BANK_COLUMNS)
+    placeholders = "(" + ", ".join(["%s"] * len(QUESTION_BANK_COLUMNS)) + ")"
+    success = True
+    
+    for start in range(0, len(rows), WRITE_BEHIND_BATCH_SIZE):
+        batch = rows[start:start + WRITE_BEHIND_BATCH_SIZE]
+        query = f"""
+        MERGE INTO QUESTION_BANK t
+        USING (SELECT {columns} FROM VALUES {", ".join([placeholders] * len(batch))}) s
+        ON t.EDUCATION_LEVEL = s.EDUCATION_LEVEL AND t.EXAM_COMPONENT = s.EXAM_COMPONENT
+           AND t.SPECIALIZATION = s.SPECIALIZATION AND t.DIFFICULTY = s.DIFFICULTY
+           AND t.QUESTION_ID = s.QUESTION_ID
+        WHEN NOT MATCHED THEN INSERT ({", ".join(QUESTION_BANK_COLUMNS)}) VALUES ({inserts})
+        """
+        params = tuple(value for row in batch for value in row)
+        success = execute_write(query, params) and success
+    return success
+
+
+def get_served_question_ids(email: str, bank_key: str) -> List[str]:
+    """IDs of the bank questions a user has already been served."""
+    query = """
+    SELECT DISTINCT QUESTION_ID FROM QUESTION_BANK_SERVED
+    WHERE EMAIL = %s AND BANK_KEY = %s
+    """
+    result = execute_query(query, (email, bank_key))
+    return [row[0] for row in result or []]
+
+
+def _write_served_questions(rows: List[tuple]) -> bool:
+    """Write-behind flusher: multi-row INSERT into QUESTION_BANK_SERVED."""
+    return insert_many("QUESTION_BANK_SERVED", QUESTION_BANK_SERVED_COLUMNS, rows)
+
+
+def log_served_questions(email: str, bank_key: str, question_ids: Iterable[str]):
+    """Record bank questions served to a user - queued and written in the background."""
+    for question_id in question_ids:
+        enqueue_write(_write_served_questions, (email, bank_key, question_id))
+
+
 # ============== PAYMENT QUERIES ==============
 
 def create_payment(email: str, full_name: str, plan_requested: str, 
                    gcash_ref: str = None, receipt_storage_path: str = None) -> Optional[int]:
     """Create a new payment request."""
     query = """
-    INSERT INTO PAYMENTS (FULL_NAME, EMAIL, GCASH_REF, PLAN_REQUESTED, RECEIPT_STORAGE_PATH, STATUS)
-    VALUES (%s, %s, %s, %s, %s, %s)
+    INSERT INTO PAYMENTS (PAYMENT_ID, FULL_NAME, EMAIL, GCASH_REF, PLAN_REQUESTED, RECEIPT_STORAGE_PATH, STATUS)
+    VALUES ($NEW_ID, %s, %s, %s, %s, %s, %s)
     """
-    result = execute_write(query, (full_name, email, gcash_ref, plan_requested, 
-                                   receipt_storage_path or '', PAYMENT_PENDING))
-    if result:
-        id_query = "SELECT MAX(PAYMENT_ID) FROM PAYMENTS WHERE EMAIL = %s LIMIT 1"
-        id_result = execute_query(id_query, (email,))
-        if id_result and id_result[0]:
-            return id_result[0][0]
-    return None
+    return _insert_returning_id(
+        "PAYMENTS_ID_SEQ", query,
+        (full_name, email, gcash_ref, plan_requested, receipt_storage_path or '', PAYMENT_PENDING),
+        ("SELECT MAX(PAYMENT_ID) FROM PAYMENTS WHERE EMAIL = %s", (email,))
+    )
 
 
 def get_pending_payments() -> List[Dict]:
@@ -604,13 +994,17 @@ def reject_payment(payment_id: int, admin_notes: str = None, approved_by: str =
 
 # ============== ADMIN ACTION QUERIES ==============
 
+ADMIN_ACTION_COLUMNS = ("ADMIN_USER", "ACTION_TYPE", "DETAILS")
+
+
+def _write_admin_actions(rows: List[tuple]) -> bool:
+    """Write-behind flusher: multi-row INSERT into ADMIN_ACTIONS."""
+    return insert_many("ADMIN_ACTIONS", ADMIN_ACTION_COLUMNS, rows)
+
+
 def log_admin_action(admin_user: str, action_type: str, details: str = None):
-    """Log an admin action."""
-    query = """
-    INSERT INTO ADMIN_ACTIONS (ADMIN_USER, ACTION_TYPE, DETAILS)
-    VALUES (%s, %s, %s)
-    """
-    return execute_write(query, (admin_user, action_type, details))
+    """Log an admin action - queued and written in the background."""
+    return enqueue_write(_write_admin_actions, (admin_user, action_type, details))
 
 
 def get_admin_actions(limit: int = 50) -> List[Dict]:
@@ -0,0 +1,182 @@
+"""
+LEPT AI Reviewer - Write-Behind Queue
+Audit/usage log writes are queued and flushed in micro-batches by a
+background thread, so page renders don't wait on Snowflake commits.
+"""
+
+import atexit
+import queue
+import threading
+import time
+from typing import Any, Callable, Dict, List, Sequence
+
+import streamlit as st
+
+from database.connection import execute_write
+from config.settings import (
+    WRITE_BEHIND_MAX_QUEUE, WRITE_BEHIND_BATCH_SIZE,
+    WRITE_BEHIND_FLUSH_INTERVAL_SECONDS, WRITE_BEHIND_OVERFLOW_POLICY,
+    WRITE_BEHIND_PUT_TIMEOUT_SECONDS
+)
+
+
+OVERFLOW_BLOCK = "block"  # Wait up to put_timeout for room, then drop
+OVERFLOW_DROP = "drop"    # Drop immediately when the queue is full
+
+
+class WriteBehindQueue:
+    """
+    Bounded queue of pending writes drained by one background thread.
+
+    Each item is (flush_fn, row). The worker drains up to `batch_size` items,
+    groups them by flush_fn and calls flush_fn(rows) once per group, so N
+    queued log rows become a single multi-row INSERT.
+
+    Args:
+        max_size: Max rows waiting to be written
+        batch_size: Max rows written per flush
+        flush_interval: Max seconds a row waits before being flushed
+        overflow_policy: OVERFLOW_BLOCK or OVERFLOW_DROP when the queue is full
+        put_timeout: Seconds to wait for room under OVERFLOW_BLOCK
+    """
+
+    def __init__(self, max_size: int = 10000, batch_size: int = 200, flush_interval: float = 1.0,
+                 overflow_policy: str = OVERFLOW_BLOCK, put_timeout: float = 2.0):
+        self._queue = queue.Queue(maxsize=max_size)
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self.overflow_policy = overflow_policy
+        self.put_timeout = put_timeout
+
+        self._lock = threading.Lock()
+        self._stats = {"enqueued": 0, "written": 0, "dropped": 0, "failed": 0, "batches": 0, "peak_depth": 0}
+        self._stopping = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="write-behind", daemon=True)
+        self._thread.start()
+        atexit.register(self.shutdown)
+
+    def submit(self, flush_fn: Callable[[List[Sequence]], bool], row: Sequence) -> bool:
+        """
+        Queue a row to be written by flush_fn.
+
+        Returns:
+            True if queued, False if dropped because the queue is full or shut down
+        """
+        if self._stopping.is_set():
+            # Late writes after shutdown go straight through
+            return bool(flush_fn([row]))
+
+        try:
+            if self.overflow_policy == OVERFLOW_DROP:
+                self._queue.put_nowait((flush_fn, row))
+            else:
+                self._queue.put((flush_fn, row), timeout=self.put_timeout)
+        except queue.Full:
+            with self._lock:
+                self._stats["dropped"] += 1
+            print(f"Write-behind queue full - dropped write to {getattr(flush_fn, '__name__', flush_fn)}")
+            return False
+
+        with self._lock:
+            self._stats["enqueued"] += 1
+            self._stats["peak_depth"] = max(self._stats["peak_depth"], self._queue.qsize())
+        return True
+
+    def flush(self, timeout: float = 10.0) -> bool:
+        """Block until every queued row has been written (or timeout). Returns True if drained."""
+        deadline = time.monotonic() + timeout
+        while self._queue.unfinished_tasks:
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(0.01)
+        return True
+
+    def shutdown(self, timeout: float = 10.0):
+        """Stop accepting queued writes and flush what's left."""
+        if self._stopping.is_set():
+            return
+        self._stopping.set()
+        self._thread.join(timeout)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Queue depth, throughput and drop counters."""
+        with self._lock:
+            stats = dict(self._stats)
+        stats.update({
+            "pending": self._queue.qsize(),
+            "max_size": self._queue.maxsize,
+            "overflow_policy": self.overflow_policy,
+        })
+        return stats
+
+    def _run(self):
+        while not (self._stopping.is_set() and self._queue.empty()):
+            try:
+                batch = [self._queue.get(timeout=self.flush_interval)]
+            except queue.Empty:
+                continue
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                self._write_batch(batch)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def _write_batch(self, batch: list):
+        # Group rows by writer, keeping first-seen order
+        groups: Dict[Callable, List[Sequence]] = {}
+        for flush_fn, row in batch:
+            groups.setdefault(flush_fn, []).append(row)
+
+        for flush_fn, rows in groups.items():
+            try:
+                ok = bool(flush_fn(rows))
+            except Exception as e:
+                print(f"Write-behind flush error: {e}")
+                ok = False
+            with self._lock:
+                self._stats["batches"] += 1
+                self._stats["written" if ok else "failed"] += len(rows)
+
+
+def insert_many(table: str, columns: Sequence[str], rows: List[Sequence]) -> bool:
+    """Write rows with one multi-row INSERT per batch."""
+    if not rows:
+        return True
+    placeholders = "(" + ", ".join(["%s"] * len(columns)) + ")"
+    success = True
+    for start in range(0, len(rows), WRITE_BEHIND_BATCH_SIZE):
+        chunk = rows[start:start + WRITE_BEHIND_BATCH_SIZE]
+        query = f"INSERT INTO {table} ({', '.join(columns)}) VALUES {', '.join([placeholders] * len(chunk))}"
+        params = tuple(value for row in chunk for value in row)
+        success = execute_write(query, params) and success
+    return success
+
+
+@st.cache_resource
+def get_write_behind_queue() -> WriteBehindQueue:
+    """Create and cache the process-wide write-behind queue."""
+    return WriteBehindQueue(
+        max_size=WRITE_BEHIND_MAX_QUEUE,
+        batch_size=WRITE_BEHIND_BATCH_SIZE,
+        flush_interval=WRITE_BEHIND_FLUSH_INTERVAL_SECONDS,
+        overflow_policy=WRITE_BEHIND_OVERFLOW_POLICY,
+        put_timeout=WRITE_BEHIND_PUT_TIMEOUT_SECONDS,
+    )
+
+
+def enqueue_write(flush_fn: Callable[[List[Sequence]], bool], row: Sequence) -> bool:
+    """Queue a row for background writing via flush_fn."""
+    return get_write_behind_queue().submit(flush_fn, row)
+
+
+def get_write_behind_stats() -> Dict[str, Any]:
+    """Get write-behind queue metrics (for the admin panel)."""
+    try:
+        return get_write_behind_queue().get_stats()
+    except Exception:
+        return {}
@@ -10,7 +10,7 @@ from config.settings import (
     COLORS, PLAN_FREE, PLAN_PRO, PLAN_PREMIUM,
     PAYMENT_PENDING, PAYMENT_APPROVED, PAYMENT_REJECTED,
     ACTION_USER_BLOCKED, ACTION_USER_UNBLOCKED, ACTION_QUOTA_ADJUSTED, 
-    ACTION_UPLOAD_ADMIN_DOC, ACTION_USER_DELETED, ACTION_PLAN_CHANGED, ACTION_DELETE_ADMIN_DOC
+    ACTION_USER_DELETED, ACTION_PLAN_CHANGED, ACTION_DELETE_ADMIN_DOC
 )
 
 
@@ -345,40 +345,24 @@ def render_admin_docs_tab():
             upload_submit = st.form_submit_button("📤 Upload Admin Reviewer", use_container_width=True, type="primary")
             
             if upload_submit:
-                with st.spinner("Processing..."):
-                    from services.document_processor import extract_text_from_file
-                    from database.queries import save_admin_document, log_admin_action
-                    from database.cached_queries import invalidate_admin_docs_cache
-                    
-                    file_content = uploaded_file.getvalue()
-                    success, extracted_text = extract_text_from_file(uploaded_file)
-                    
-                    storage_path = f"@STAGE_ADMIN_DOCS/{uploaded_file.name}"
-                    file_type = uploaded_file.name.split('.')[-1].lower()
-                    
-                    doc_id = save_admin_document(
-                        filename=uploaded_file.name,
-                        file_type=file_type,
-                        storage_path=storage_path,
-                        is_downloadable=is_downloadable,
-                        uploaded_by="admin",
-                        file_content=file_content,
-                        extracted_text=extracted_text if success else None,
-                        category=category
+                # Store the file and queue extraction - the panel polls the job instead of blocking
+                from services.ingestion import submit_upload, DOC_KIND_ADMIN
+                
+                with st.spinner("Uploading..."):
+                    job_id = submit_upload(
+                        uploaded_file, DOC_KIND_ADMIN, "admin",
+                        options={"category": category, "is_downloadable": is_downloadable}
                     )
-                    
-                    if doc_id:
-                        invalidate_admin_docs_cache()
-                        log_admin_action("admin", ACTION_UPLOAD_ADMIN_DOC, f"Uploaded {uploaded_file.name} (Category: {category})")
-                        st.session_state.admin_docs_loaded = None  # Force reload
-                        text_len = len(extracted_text) if extracted_text else 0
-                        if text_len > 100:
-                            st.success(f"✅ Uploaded! Extracted {text_len:,} characters for AI use.")
-                        else:
-                            st.success("✅ Uploaded! (Limited text extraction - file can still be downloaded)")
-                        st.rerun()
-                    else:
-                        st.error("Failed to save document.")
+                
+                if job_id:
+                    st.session_state.setdefault("admin_upload_jobs", []).append(job_id)
+                    st.rerun()
+                else:
+                    st.error("Failed to save document.")
+    
+    from components.alerts import show_ingestion_progress
+    if show_ingestion_progress("admin_upload_jobs"):
+        st.session_state.admin_docs_loaded = None  # Force reload
     
     st.markdown("<br>", unsafe_allow_html=True)
     st.markdown(f"<h3 style='color: {COLORS['text']}; margin-bottom: 1rem;'>Existing Admin Reviewers</h3>", unsafe_allow_html=True)
@@ -415,7 +399,7 @@ def render_admin_doc_item(doc):
     filename = doc.get("filename", "Unknown")
     is_downloadable = doc.get("is_downloadable", False)
     category = doc.get("category", "General")
-    has_text = doc.get("extracted_text") is not None
+    has_text = doc.get("has_text", False)
     
     st.markdown(f"""
     <div style="background: rgba(30, 41, 59, 0.8); padding: 1rem; border-radius: 12px; 
@@ -544,16 +528,139 @@ def render_settings_tab():
     # Debug info
     st.markdown("<br>", unsafe_allow_html=True)
     
-    from database.connection import get_query_count
+    from database.connection import get_query_count, get_pool_stats, get_query_metrics_snapshot
+    pool = get_pool_stats()
+    query_metrics = get_query_metrics_snapshot()
+    totals = query_metrics["totals"]
     st.markdown(f"""
     <div style="background: rgba(30, 41, 59, 0.8); padding: 1.5rem; border-radius: 16px;
                 border: 1px solid {COLORS['border']};">
         <h4 style="color: {COLORS['text']}; margin: 0 0 1rem 0;">🔍 Debug Info</h4>
         <p style="color: {COLORS['text_muted']}; margin: 0; font-size: 0.9rem;">
             DB Queries this session: <strong style="color: {COLORS['secondary']};">{get_query_count()}</strong>
+            &nbsp;|&nbsp; Server-wide since {totals['since']}:
+            <strong style="color: {COLORS['secondary']};">{totals['calls']}</strong> queries,
+            {totals['errors']} errors, {totals['retries']} retries, {totals['slow_logged']} slow
         </p>
     </div>
     """, unsafe_allow_html=True)
+
+    if query_metrics["statements"]:
+        st.markdown("<br>", unsafe_allow_html=True)
+        st.markdown(f"<h4 style='color: {COLORS['text']};'>⏱️ Query Latency (top statements by total time)</h4>",
+                    unsafe_allow_html=True)
+        st.dataframe(query_metrics["statements"], use_container_width=True, hide_index=True)
+
+        if query_metrics["slow_queries"]:
+            with st.expander(f"🐢 Slow Query Log ({len(query_metrics['slow_queries'])})"):
+                st.dataframe(query_metrics["slow_queries"], use_container_width=True, hide_index=True)
+
+        from database.metrics import get_query_metrics
+        metrics = get_query_metrics()
+        col1, col2 = st.columns(2)
+        with col1:
+            st.download_button("⬇️ Export JSON", metrics.to_json(), file_name="query_metrics.json",
+                               mime="application/json", key="export_query_metrics_json", use_container_width=True)
+        with col2:
+            st.download_button("⬇️ Export Prometheus", metrics.to_prometheus(), file_name="query_metrics.prom",
+                               mime="text/plain", key="export_query_metrics_prom", use_container_width=True)
+
+    from utils.tracing import get_tracing_stats, set_tracing_enabled
+    tracing = get_tracing_stats()
+    st.markdown("<br>", unsafe_allow_html=True)
+    st.markdown(f"<h4 style='color: {COLORS['text']};'>🧵 Request Tracing</h4>", unsafe_allow_html=True)
+    col1, col2 = st.columns(2)
+    with col1:
+        enabled = st.toggle("Record traces (all sessions)", value=tracing["enabled"], key="tracing_enabled_toggle")
+        if enabled != tracing["enabled"]:
+            set_tracing_enabled(enabled)
+            st.rerun()
+        st.caption(
+            f"Traces: {tracing['traces']} | Spans: {tracing['spans']} | Failed writes: {tracing['dropped']} | "
+            f"File: `{tracing['file']}` ({tracing['file_bytes'] / 1024:.0f} KB) — open in ui.perfetto.dev"
+        )
+    with col2:
+        if tracing["file_bytes"]:
+            with open(tracing["file"], "rb") as f:
+                st.download_button("⬇️ Download Trace", f.read(), file_name="lept_trace.json",
+                                   mime="application/json", key="download_trace_btn", use_container_width=True)
+
+    if pool:
+        st.markdown("<br>", unsafe_allow_html=True)
+        st.markdown(f"<h4 style='color: {COLORS['text']};'>🏊 Connection Pool</h4>", unsafe_allow_html=True)
+        col1, col2, col3, col4 = st.columns(4)
+        with col1:
+            st.metric("In Use / Max", f"{pool['in_use']} / {pool['max_size']}")
+        with col2:
+            st.metric("Saturation", f"{pool['saturation']:.0%}", help=f"Peak in use: {pool['peak_in_use']}")
+        with col3:
+            st.metric("Waiting", pool["waiting"], help=f"Peak waiting: {pool['peak_waiting']}")
+        with col4:
+            st.metric("Checkout Timeouts", pool["timeouts"])
+        st.caption(
+            f"Open: {pool['open']} | Idle: {pool['idle']} | Checkouts: {pool['checkouts']} | "
+            f"Avg wait: {pool['avg_wait_ms']:.1f}ms | Max wait: {pool['max_wait_ms']:.0f}ms | "
+            f"Created: {pool['created']} | Discarded: {pool['discarded']} | Idle evictions: {pool['evicted_idle']}"
+        )
+
+    from database.write_behind import get_write_behind_stats
+    queue_stats = get_write_behind_stats()
+    if queue_stats:
+        st.caption(
+            f"**Write-behind logs** — Pending: {queue_stats['pending']}/{queue_stats['max_size']} | "
+            f"Written: {queue_stats['written']} | Batches: {queue_stats['batches']} | "
+            f"Failed: {queue_stats['failed']} | Dropped: {queue_stats['dropped']} | Peak depth: {queue_stats['peak_depth']}"
+        )
+
+    from database.cached_queries import get_cache_stats
+    st.markdown("<br>", unsafe_allow_html=True)
+    st.markdown(f"<h4 style='color: {COLORS['text']};'>🗃️ Query Caches</h4>", unsafe_allow_html=True)
+    for name, stats in get_cache_stats().items():
+        st.caption(
+            f"**{name}** — Hit rate: {stats['hit_rate']:.0%} | Hits: {stats['hits']} | Misses: {stats['misses']} | "
+            f"Evictions: {stats['evictions']} | Expired: {stats['expirations']} | "
+            f"Invalidated: {stats['invalidations']} | Size: {stats['size']}/{stats['maxsize']}"
+        )
+
+    from services.ingestion import get_ingestion_stats
+    ingestion_stats = get_ingestion_stats()
+    if ingestion_stats:
+        st.caption(
+            "**Ingestion jobs** — " + " | ".join(f"{status.title()}: {count}" for status, count in ingestion_stats.items())
+        )
+
+    from services.question_bank import get_question_bank_stats
+    bank_stats = get_question_bank_stats()
+    if bank_stats:
+        st.caption(
+            f"**AI question bank** — Served: {bank_stats['served']} | Misses (live generation): {bank_stats['misses']} | "
+            f"Refills: {bank_stats['refills']} (failed: {bank_stats['refill_failures']}, running: {bank_stats['refilling']}) | "
+            f"Questions added: {bank_stats['added']} | Banks loaded: {bank_stats['banks_loaded']}"
+        )
+
+    from services.abuse_guard import get_abuse_stats, get_flagged_ips
+    abuse_stats = get_abuse_stats()
+    if abuse_stats:
+        st.caption(
+            f"**Abuse guard** — Throttled: IP {abuse_stats['ip_limiter']['throttled']}, "
+            f"account {abuse_stats['email_limiter']['throttled']} | "
+            f"Blocked IPs: {abuse_stats['blocked_ips'] if abuse_stats['blocked_ips'] is not None else 'loading'} | "
+            f"IPs tracked: {abuse_stats['tracked_ips']} | Reconciles: {abuse_stats['reconciles']} "
+            f"(failed: {abuse_stats['reconcile_errors']}) | Usage flushed: {abuse_stats['usage_flushed']}"
+        )
+    flagged_ips = get_flagged_ips()
+    if flagged_ips:
+        with st.expander(f"🚩 Shared IPs ({len(flagged_ips)})"):
+            for item in flagged_ips[:50]:
+                st.markdown(f"`{item['ip_address']}` — {item['email_count']} accounts: {', '.join(item['emails'])}")
+
+    from services.document_processor import get_extraction_stats
+    extraction_stats = get_extraction_stats()
+    st.caption(
+        f"**Text extraction** — Parsed: {extraction_stats['extracted']} | "
+        f"Skipped (duplicate file): {extraction_stats['skipped']} "
+        f"(memory: {extraction_stats['skipped_cache']}, database: {extraction_stats['skipped_db']})"
+    )
     
     st.markdown("<br>", unsafe_allow_html=True)
     
@@ -0,0 +1,274 @@
+"""
+LEPT AI Reviewer - Mock Exam Section
+Full-length timed exam for PRO/PREMIUM. Every item is charged to a PRO
+user's quota like practice questions (charged up front, before anything is
+generated; undelivered items are refunded), so PRO exams are capped at the
+questions they have left. Only the current page of items is rendered,
+inside a form, so picking answers doesn't rerun the script.
+"""
+
+import math
+import time
+import uuid
+
+import streamlit as st
+
+from utils.ip_utils import get_client_ip
+from config.settings import (
+    COLORS, EXAM_COMPONENTS, EDUCATION_LEVELS,
+    MOCK_EXAM_ITEMS, MOCK_EXAM_MIN_ITEMS, MOCK_EXAM_PAGE_SIZE, MOCK_EXAM_SECONDS_PER_ITEM
+)
+
+ANSWER_KEYS = ["A", "B", "C", "D"]
+
+
+def format_duration(seconds):
+    """Seconds as H:MM:SS / M:SS."""
+    seconds = max(0, int(seconds))
+    hours, rest = divmod(seconds, 3600)
+    minutes, secs = divmod(rest, 60)
+    return f"{hours}:{minutes:02d}:{secs:02d}" if hours else f"{minutes}:{secs:02d}"
+
+
+def render_mock_exam_section(user, email, is_premium, education_level, specialization):
+    """Start screen, exam in progress, or results - whichever applies."""
+    exam = st.session_state.get("mock_exam")
+
+    if exam and not exam["submitted"]:
+        render_mock_exam(exam)
+    elif exam:
+        render_mock_results(exam)
+    else:
+        render_mock_exam_start(user, email, is_premium, education_level, specialization)
+
+
+def render_mock_exam_start(user, email, is_premium, education_level, specialization):
+    """Explain the mock exam and assemble one on request."""
+    from services.ai_generator import split_by_weight
+
+    remaining = user.get("questions_remaining", 0) or 0
+    exam_items = MOCK_EXAM_ITEMS if is_premium else min(MOCK_EXAM_ITEMS, remaining)
+    targets = split_by_weight(exam_items, {c: info["weight"] for c, info in EXAM_COMPONENTS.items()})
+    breakdown = " • ".join(f"{EXAM_COMPONENTS[c]['name']}: <strong>{n}</strong>" for c, n in targets.items())
+
+    st.markdown(f"""
+    <div style="background: rgba(30, 41, 59, 0.8); padding: 1.5rem; border-radius: 16px;
+                border: 1px solid {COLORS['border']}; margin-bottom: 1rem;">
+        <h4 style="color: {COLORS['text']}; margin: 0 0 0.5rem 0;">📝 Full-Length Mock Exam</h4>
+        <p style="color: {COLORS['text_muted']}; margin: 0 0 0.5rem 0;">
+            {exam_items} items • {format_duration(exam_items * MOCK_EXAM_SECONDS_PER_ITEM)} time limit •
+            {specialization} ({EDUCATION_LEVELS[education_level]})
+        </p>
+        <p style="color: {COLORS['text_muted']}; margin: 0; font-size: 0.9rem;">{breakdown}</p>
+    </div>
+    """, unsafe_allow_html=True)
+
+    if not is_premium:
+        if exam_items < MOCK_EXAM_MIN_ITEMS:
+            st.error(
+                f"🚫 A mock exam needs at least {MOCK_EXAM_MIN_ITEMS} questions from your quota "
+                f"({remaining} left). Upgrade to PREMIUM for unlimited full-length exams."
+            )
+            return
+        st.caption(
+            f"Each item is charged to your quota like practice questions: this exam uses "
+            f"{exam_items} of your {remaining} remaining questions."
+        )
+
+    if not st.button("🚀 Start Mock Exam", key="start_mock_exam_btn", use_container_width=True, type="primary"):
+        return
+
+    from services.abuse_guard import check_generation_allowed, refund_generation
+    ip_address = get_client_ip()
+    allowed, reason = check_generation_allowed(email, ip_address)
+    if not allowed:
+        st.warning(f"⏳ {reason}")
+        return
+
+    # Charge before assembling so a failed charge never costs an OpenAI batch
+    from services.usage_tracker import use_questions, return_questions
+    if use_questions(email, ip_address, exam_items, "MOCK_EXAM", "mock_exam", "Mixed") is None:
+        refund_generation(email, ip_address)
+        st.error(f"🚫 Not enough questions left for a {exam_items}-item exam.")
+        return
+
+    from services.mock_exam import assemble_mock_exam
+
+    progress = st.progress(0.0, text="Assembling your exam...")
+
+    def on_progress(done, total):
+        progress.progress(min(1.0, done / max(total, 1)), text=f"Generating extra items... {done}/{total}")
+
+    with st.spinner("📚 Assembling your mock exam..."):
+        try:
+            exam = assemble_mock_exam(
+                education_level, specialization,
+                total=exam_items, max_generated=exam_items,
+                on_progress=on_progress
+            )
+        except Exception as e:
+            print(f"Error assembling mock exam: {e}")
+            exam = {"questions": []}
+    progress.empty()
+
+    questions = exam["questions"]
+    undelivered = exam_items - len(questions)
+    if undelivered > 0 and not is_premium:
+        return_questions(email, ip_address, undelivered, "MOCK_EXAM")
+    if not questions:
+        refund_generation(email, ip_address)
+        st.error("Couldn't assemble a mock exam right now. Please try again.")
+        return
+
+    st.session_state.mock_exam = {
+        "exam_id": uuid.uuid4().hex[:8],
+        "questions": questions,
+        "answers": {},
+        "page": 0,
+        "deadline": time.time() + exam["duration_seconds"],
+        "submitted": False,
+        "timed_out": False,
+        "info": {
+            "education_level": EDUCATION_LEVELS[education_level],
+            "specialization": specialization,
+            "sources": exam["sources"],
+        },
+    }
+    st.rerun()
+
+
+def render_mock_exam(exam):
+    """Render the current page of an exam in progress."""
+    questions = exam["questions"]
+    answers = exam["answers"]
+    page_count = max(1, math.ceil(len(questions) / MOCK_EXAM_PAGE_SIZE))
+    time_left = exam["deadline"] - time.time()
+
+    if time_left <= 0:
+        exam["submitted"] = True
+        exam["timed_out"] = True
+        st.rerun()
+
+    page = min(exam["page"], page_count - 1)
+    start = page * MOCK_EXAM_PAGE_SIZE
+    end = min(start + MOCK_EXAM_PAGE_SIZE, len(questions))
+    time_color = COLORS["error"] if time_left < 600 else COLORS["secondary"]
+
+    st.markdown(f"""
+    <div style="padding: 1rem 1.5rem; background: rgba(30, 41, 59, 0.8); border-radius: 16px;
+                border: 1px solid {COLORS['border']}; margin-bottom: 1rem; display: flex;
+                justify-content: space-between; flex-wrap: wrap; gap: 0.5rem;">
+        <span style="color: {COLORS['text']};">📝 Items {start + 1}-{end} of {len(questions)} • Page {page + 1}/{page_count}</span>
+        <span style="color: {COLORS['text_muted']};">✅ Answered: {len(answers)}/{len(questions)}</span>
+        <span style="color: {time_color};">⏱️ Time left: <strong>{format_duration(time_left)}</strong>
+            (ends {time.strftime('%H:%M', time.localtime(exam['deadline']))})</span>
+    </div>
+    """, unsafe_allow_html=True)
+    st.progress(len(answers) / max(len(questions), 1))
+
+    choices = {}
+    with st.form(f"mock_exam_page_{exam['exam_id']}_{page}", clear_on_submit=False):
+        last_component = questions[start - 1].get("exam_component") if start else None
+        for i in range(start, end):
+            q = questions[i]
+            component = q.get("exam_component")
+            if component != last_component:
+                st.markdown(f"#### {EXAM_COMPONENTS.get(component, {}).get('name', 'Questions')}")
+                last_component = component
+
+            st.markdown(f"**{i + 1}.** {q['question']}")
+            saved = answers.get(i)
+            options = q.get("options", {})
+            choices[i] = st.radio(
+                f"Item {i + 1}",
+                options=ANSWER_KEYS,
+                index=ANSWER_KEYS.index(saved) if saved in ANSWER_KEYS else None,
+                format_func=lambda x, opts=options: f"{x}. {opts.get(x, '')}",
+                key=f"mock_{exam['exam_id']}_q_{i}",
+                label_visibility="collapsed"
+            )
+
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            prev_clicked = st.form_submit_button("◀ Previous", use_container_width=True, disabled=page == 0)
+        with col2:
+            next_clicked = st.form_submit_button("Save & Next ▶", use_container_width=True,
+                                                 disabled=page >= page_count - 1)
+        with col3:
+            submit_clicked = st.form_submit_button("📊 Submit Exam", use_container_width=True, type="primary")
+
+    if prev_clicked or next_clicked or submit_clicked:
+        if time.time() > exam["deadline"]:
+            # Time ran out while this page was open - its answers came in too late to count
+            exam["submitted"] = True
+            exam["timed_out"] = True
+            exam["late_page_dropped"] = True
+            st.rerun()
+        for i, choice in choices.items():
+            if choice:
+                answers[i] = choice
+        if submit_clicked:
+            exam["submitted"] = True
+        else:
+            exam["page"] = page - 1 if prev_clicked else page + 1
+        st.rerun()
+
+    if st.button("🗑️ Abandon Exam", key="abandon_mock_exam_btn"):
+        st.session_state.mock_exam = None
+        st.rerun()
+
+
+def render_mock_results(exam):
+    """Score summary per component plus a paginated answer review."""
+    from services.mock_exam import score_mock_exam
+
+    questions = exam["questions"]
+    result = score_mock_exam(questions, exam["answers"])
+    score_percent = result["correct"] / max(result["total"], 1) * 100
+    score_color = COLORS["success"] if score_percent >= 75 else (COLORS["warning"] if score_percent >= 60 else COLORS["error"])
+
+    if exam.get("late_page_dropped"):
+        st.warning(
+            "⏱️ Time ran out before your last page was saved, so its answers weren't counted. "
+            "Your exam was scored with the answers saved before the deadline."
+        )
+    elif exam.get("timed_out"):
+        st.warning("⏱️ Time's up! Your exam was submitted automatically.")
+
+    st.markdown(f"""
+    <div style="background: {score_color}22; padding: 1.5rem; border-radius: 16px;
+                text-align: center; margin-bottom: 1rem; border: 2px solid {score_color};">
+        <h3 style="color: {score_color}; margin: 0;">Score: {result['correct']}/{result['total']} ({score_percent:.0f}%)</h3>
+        <p style="color: {COLORS['text']}; margin: 0.5rem 0 0 0;">
+            Answered {result['answered']} of {result['total']} • The LEPT passing rate is 75%
+        </p>
+    </div>
+    """, unsafe_allow_html=True)
+
+    cols = st.columns(len(result["by_component"]) or 1)
+    for col, (component, stats) in zip(cols, result["by_component"].items()):
+        with col:
+            st.metric(
+                EXAM_COMPONENTS.get(component, {}).get("name", component),
+                f"{stats['correct']}/{stats['total']}",
+                f"{stats['correct'] / max(stats['total'], 1):.0%}",
+                delta_color="off"
+            )
+
+    with st.expander("🔍 Review Answers", expanded=False):
+        page_count = max(1, math.ceil(len(questions) / MOCK_EXAM_PAGE_SIZE))
+        page = st.number_input("Page", min_value=1, max_value=page_count, value=1, key="mock_review_page") - 1
+        for i in range(page * MOCK_EXAM_PAGE_SIZE, min((page + 1) * MOCK_EXAM_PAGE_SIZE, len(questions))):
+            q = questions[i]
+            selected = exam["answers"].get(i)
+            correct = q.get("correct_answer")
+            mark = "✅" if selected == correct else ("❌" if selected else "⚪")
+            st.markdown(f"**{mark} {i + 1}.** {q['question']}")
+            st.markdown(
+                f"Your answer: **{selected or '—'}** • Correct: **{correct}. {q.get('options', {}).get(correct, '')}**"
+            )
+            st.caption(q.get("explanation", ""))
+
+    if st.button("🔄 New Mock Exam", key="new_mock_exam_btn", use_container_width=True):
+        st.session_state.mock_exam = None
+        st.rerun()
@@ -3,15 +3,18 @@ LEPT AI Reviewer - Practice Exam Page
 OPTIMIZED: Session state caching, minimal DB queries
 """
 
+import html
+
 import streamlit as st
 
 from components.auth import get_current_user
 from services.usage_tracker import get_user_status, can_generate_questions, use_questions, get_cached_user_status
 from utils.ip_utils import get_client_ip
+from utils.tracing import span
 from config.settings import (
     COLORS, EXAM_COMPONENTS, DIFFICULTY_LEVELS, QUESTIONS_PER_BATCH,
     PLAN_FREE, PLAN_PRO, PLAN_PREMIUM,
-    EDUCATION_LEVELS, ELEMENTARY_SPECIALIZATIONS, SECONDARY_SPECIALIZATIONS
+    EDUCATION_LEVELS, ELEMENTARY_SPECIALIZATIONS, SECONDARY_SPECIALIZATIONS, MOCK_EXAM_ITEMS
 )
 
 
@@ -136,6 +139,18 @@ def render_practice_page():
         </div>
         """, unsafe_allow_html=True)
     
+    # Mode toggle - the full-length mock exam is a PRO/PREMIUM feature
+    mode = "practice"
+    if not is_free_user:
+        mode = st.radio(
+            "Mode",
+            options=["practice", "mock"],
+            format_func=lambda x: "🧠 Practice Set" if x == "practice" else f"📝 Full Mock Exam ({MOCK_EXAM_ITEMS} items)",
+            horizontal=True,
+            key="practice_mode_select",
+            label_visibility="collapsed"
+        )
+    
     # Exam configuration - all widgets, no DB queries
     st.markdown(f"""
     <div style="background: rgba(30, 41, 59, 0.8); padding: 1.5rem; border-radius: 16px;
@@ -161,6 +176,14 @@ def render_practice_page():
             key="specialization_select"
         )
     
+    is_premium = status["plan"] == PLAN_PREMIUM and status.get("expiry_display") != "Expired"
+    
+    if mode == "mock":
+        st.markdown("</div>", unsafe_allow_html=True)
+        from pages.mock_exam import render_mock_exam_section
+        render_mock_exam_section(user, email, is_premium, education_level, specialization)
+        return
+    
     col1, col2 = st.columns(2)
     
     with col1:
@@ -231,7 +254,7 @@ def render_practice_page():
                         for doc in admin_docs:
                             doc["source"] = "admin"
                             category = doc.get("category", "General")
-                            has_text = doc.get("extracted_text") is not None
+                            has_text = doc.get("has_text", False)
                             label = f"📚 {doc['filename']} [{category}] {'✅' if has_text else '⚠️'}"
                             if st.checkbox(label, key=f"doc_admin_{doc['doc_id']}"):
                                 selected_docs.append(doc)
@@ -242,7 +265,6 @@ def render_practice_page():
                     st.info("No documents available. Upload reviewers or wait for admin to add materials.")
     
     # Generate button section
-    is_premium = status["plan"] == PLAN_PREMIUM and status.get("expiry_display") != "Expired"
     can_generate = questions_remaining >= QUESTIONS_PER_BATCH or is_premium
     
     st.markdown(f"""
@@ -280,60 +302,106 @@ def handle_question_generation(email, user, status, is_free_user, is_premium,
                                education_level, exam_component, specialization, 
                                difficulty, selected_docs):
     """Handle question generation - separated for cleaner code."""
-    # Fresh check for question count
-    from database.queries import get_fresh_user_by_email
-    from services.usage_tracker import refresh_user_session
+    # Quick check from session state - the charge below re-checks atomically in the DB
+    remaining = user.get("questions_remaining", 0) or 0
     
-    fresh_user = get_fresh_user_by_email(email)
-    fresh_remaining = fresh_user.get("questions_remaining", 0) if fresh_user else 0
+    if remaining < QUESTIONS_PER_BATCH and not is_premium:
+        st.error(f"🚫 Not enough questions! You have {remaining} left but need {QUESTIONS_PER_BATCH}.")
+        return
     
-    if fresh_remaining < QUESTIONS_PER_BATCH and not is_premium:
-        st.error(f"🚫 Not enough questions! You have {fresh_remaining} left but need {QUESTIONS_PER_BATCH}.")
+    # Per-IP / per-account rate limit, answered from memory (after the quota check, so
+    # requests that can't be charged don't use up tokens)
+    from services.abuse_guard import check_generation_allowed, refund_generation
+    ip_address = get_client_ip()
+    allowed, reason = check_generation_allowed(email, ip_address)
+    if not allowed:
+        st.warning(f"⏳ {reason}")
         return
     
+    from_bank = False
     with st.spinner("🎓 Generating questions..."):
         if is_free_user:
             from services.preset_questions import get_aligned_preset_questions
+            from services.usage_tracker import get_preset_seen
+            # Rotate through questions this user hasn't seen before repeating any
+            preset_seen = get_preset_seen(user)
             questions = get_aligned_preset_questions(
                 education_level=education_level,
                 exam_component=exam_component,
                 specialization=specialization,
                 difficulty=difficulty,
-                num_questions=QUESTIONS_PER_BATCH
+                num_questions=QUESTIONS_PER_BATCH,
+                seen=preset_seen
             )
         else:
-            from services.ai_generator import generate_questions
+            from services.ai_generator import generate_questions_stream
+            from services.question_bank import take_bank_questions, add_to_bank
             
-            # Collect document content if any documents are selected
-            doc_content = ""
-            if selected_docs:
-                from database.queries import get_admin_document_text
-                doc_texts = []
+            # Without documents, serve pre-generated questions the user hasn't seen yet
+            questions = None
+            if not selected_docs:
+                questions = take_bank_questions(
+                    email, education_level, exam_component, specialization, difficulty, QUESTIONS_PER_BATCH
+                )
+            from_bank = questions is not None
+            
+            # Look up the chunk index of each selected document (built at upload);
+            # the generator retrieves only the chunks relevant to this exam config
+            doc_indexes = []
+            if selected_docs and not from_bank:
+                from services.document_index import get_document_index
                 for doc in selected_docs:
-                    if doc.get("source") == "admin":
-                        doc_data = get_admin_document_text(doc.get("doc_id"))
-                        if doc_data and doc_data.get("text"):
-                            doc_texts.append(f"--- {doc_data['filename']} ---\n{doc_data['text'][:8000]}")
-                    elif doc.get("extracted_text"):
-                        doc_texts.append(f"--- {doc.get('filename')} ---\n{doc.get('extracted_text')[:8000]}")
-                if doc_texts:
-                    doc_content = "\n\n".join(doc_texts)
+                    if doc.get("source") != "admin" and not doc.get("has_text"):
+                        continue
+                    index = get_document_index(doc, email)
+                    if index is not None:
+                        doc_indexes.append((doc.get("filename"), index))
             
             # Generate questions using enhanced AI generator
             # The AI will use LEPT competencies if document is not relevant
-            questions = generate_questions(
-                exam_type=exam_component,
-                specialization=specialization,
-                difficulty=difficulty,
-                document_text=doc_content,
-                num_questions=QUESTIONS_PER_BATCH,
-                education_level=education_level
-            )
+            if not from_bank:
+                # Stream the batch so each question shows up as soon as it's written
+                questions = []
+                preview = st.container()
+                with span("ai.generate_questions_stream", documents=len(doc_indexes)):
+                    for question in generate_questions_stream(
+                        exam_type=exam_component,
+                        specialization=specialization,
+                        difficulty=difficulty,
+                        document_text="",
+                        num_questions=QUESTIONS_PER_BATCH,
+                        education_level=education_level,
+                        document_indexes=doc_indexes
+                    ):
+                        questions.append(question)
+                        with preview:
+                            render_question_preview(len(questions), question)
+                if questions and not selected_docs:
+                    # Bank was short for this config - keep these for other users
+                    add_to_bank(education_level, exam_component, specialization, difficulty, questions)
     
     if questions:
-        ip_address = get_client_ip()
-        source_type = "PRESET" if is_free_user else ("MIXED" if selected_docs else "AI_GENERATED")
-        use_questions(email, ip_address, QUESTIONS_PER_BATCH, source_type, exam_component, difficulty)
+        if is_free_user:
+            source_type = "PRESET"
+        elif selected_docs:
+            source_type = "MIXED"
+        else:
+            source_type = "AI_BANK" if from_bank else "AI_GENERATED"
+        # Charges quota and logs in one request; also updates session state
+        remaining = use_questions(email, ip_address, QUESTIONS_PER_BATCH, source_type, exam_component, difficulty)
+        if remaining is None:
+            refund_generation(email, ip_address)
+            if from_bank:
+                from services.question_bank import release_bank_questions
+                release_bank_questions(email, education_level, exam_component, specialization, difficulty, questions)
+            st.error(f"🚫 Not enough questions! You need {QUESTIONS_PER_BATCH} to generate a new set.")
+            return
+        if is_free_user:
+            from services.usage_tracker import save_preset_seen
+            save_preset_seen(email, preset_seen)
+        elif not selected_docs:
+            from services.question_bank import mark_bank_questions_served
+            mark_bank_questions_served(email, education_level, exam_component, specialization, difficulty, questions)
         
         st.session_state.current_questions = questions
         st.session_state.current_answers = {}
@@ -345,15 +413,29 @@ def handle_question_generation(email, user, status, is_free_user, is_premium,
             "difficulty": difficulty
         }
         
-        # Update session state with new user data
-        refresh_user_session(force=True)
-        
         st.success(f"✅ Generated {len(questions)} questions!")
         st.rerun()
     else:
+        refund_generation(email, ip_address)
         st.error("Failed to generate questions. Please try again.")
 
 
+def render_question_preview(number, q):
+    """Read-only card for a question that just arrived from the stream (model text is escaped)."""
+    options = "".join(
+        f"<p style='color: {COLORS['text_muted']}; margin: 0.25rem 0 0 0;'>{key}. {html.escape(str(value))}</p>"
+        for key, value in q.get("options", {}).items()
+    )
+    st.markdown(f"""
+    <div style="background: rgba(30, 41, 59, 0.8); padding: 1.5rem; border-radius: 16px; 
+                border: 1px solid {COLORS['border']}; margin-bottom: 1rem;">
+        <h4 style="color: {COLORS['primary']}; margin: 0 0 1rem 0;">Question {number}</h4>
+        <p style="color: {COLORS['text']}; font-size: 1.05rem; line-height: 1.6; margin: 0 0 0.5rem 0;">{html.escape(str(q['question']))}</p>
+        {options}
+    </div>
+    """, unsafe_allow_html=True)
+
+
 def render_quiz_section(user, email):
     """Render quiz section - minimal processing."""
     questions = st.session_state.current_questions
@@ -191,36 +191,22 @@ def render_user_documents_tab(email: str):
                 upload_submit = st.form_submit_button("📤 Upload & Process", use_container_width=True, type="primary")
                 
                 if upload_submit:
-                    with st.spinner("Processing document..."):
-                        from services.document_processor import extract_text_from_file
-                        from database.queries import save_user_document
-                        from database.cached_queries import invalidate_user_docs_cache
-                        
-                        success, extracted_text = extract_text_from_file(uploaded_file)
+                    # Store the file and queue extraction - the page polls the job instead of blocking
+                    from services.ingestion import submit_upload, DOC_KIND_USER
                     
-                    # Always try to save the document, even if text extraction had issues
-                    file_type = uploaded_file.name.split('.')[-1].lower()
-                    storage_path = f"@STAGE_USER_DOCS/{email}/{uploaded_file.name}"
+                    with st.spinner("Uploading document..."):
+                        job_id = submit_upload(uploaded_file, DOC_KIND_USER, email)
                     
-                    # Save with extracted text (may be placeholder text if extraction failed)
-                    doc_id = save_user_document(
-                        email=email,
-                        filename=uploaded_file.name,
-                        file_type=file_type,
-                        storage_path=storage_path,
-                        extracted_text=extracted_text if success else None
-                    )
-                    
-                    if doc_id:
-                        invalidate_user_docs_cache(email)
-                        if success and not extracted_text.startswith("["):
-                            st.success(f"✅ Document uploaded! Extracted {len(extracted_text)} characters of text.")
-                        else:
-                            st.success("✅ Document uploaded! (Limited text extraction)")
+                    if job_id:
+                        st.session_state.setdefault("user_upload_jobs", []).append(job_id)
                         st.rerun()
                     else:
                         st.error("Failed to save document. Please try again.")
     
+    from components.alerts import show_ingestion_progress
+    if show_ingestion_progress("user_upload_jobs"):
+        st.session_state.setdefault("user_docs_loaded", {})[email] = None  # Force reload
+    
     st.markdown("<br>", unsafe_allow_html=True)
     st.markdown(f"<h3 style='color: {COLORS['text']}; margin: 1rem 0;'>My Uploaded Documents</h3>", unsafe_allow_html=True)
     
@@ -370,7 +356,7 @@ def render_admin_document_item(doc: dict, can_use: bool):
                 with st.spinner("Preparing download..."):
                     doc_data = get_admin_document_content(doc_id)
                 
-                if doc_data and doc_data.get("content"):
+                if doc_data and (doc_data.get("storage_key") or doc_data.get("content")):
                     st.session_state[f"download_data_{doc_id}"] = doc_data
                     st.rerun()
                 else:
@@ -383,12 +369,33 @@ def render_admin_document_item(doc: dict, can_use: bool):
                     "pdf": "application/pdf",
                     "docx": "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
                 }
-                st.download_button(
-                    label="💾 Save File",
-                    data=doc_data["content"],
-                    file_name=doc_data["filename"],
-                    mime=mime_types.get(file_type, "application/octet-stream"),
-                    key=f"save_{doc_id}"
-                )
+                mime = mime_types.get(file_type, "application/octet-stream")
+                if doc_data.get("storage_key"):
+                    # st.download_button reads the whole file into memory on every rerun it is
+                    # shown (Streamlit has no streaming download), so the file is only read while
+                    # this button is up, and the button goes away once it has been clicked
+                    from services.file_storage import get_storage_backend
+                    try:
+                        with get_storage_backend().open(doc_data["storage_key"]) as file_handle:
+                            st.download_button(
+                                label="💾 Save File",
+                                data=file_handle,
+                                file_name=doc_data["filename"],
+                                mime=mime,
+                                key=f"save_{doc_id}",
+                                on_click=st.session_state.pop,
+                                args=(f"download_data_{doc_id}", None)
+                            )
+                    except (OSError, ValueError) as e:
+                        print(f"Error opening stored document {doc_id}: {e}")
+                        st.warning("File not available.")
+                else:
+                    st.download_button(
+                        label="💾 Save File",
+                        data=doc_data["content"],
+                        file_name=doc_data["filename"],
+                        mime=mime,
+                        key=f"save_{doc_id}"
+                    )
     elif can_use and not is_downloadable:
         st.caption("📖 Available for AI questions but not download")
@@ -0,0 +1,265 @@
+"""
+LEPT AI Reviewer - Abuse Guard Service
+In-process anti-abuse checks: per-IP and per-email generation rate limits,
+the blocked-IP list and a "many accounts on one IP" signal, all answered
+from memory. A background thread reconciles with Snowflake every
+ABUSE_RECONCILE_INTERVAL_SECONDS: it reloads blocked IPs, pulls new
+USER_IP_HISTORY rows since its last watermark, and flushes the per-IP
+question counters into IP_USAGE.
+"""
+
+import atexit
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+import streamlit as st
+
+from config.settings import (
+    RATE_LIMIT_IP_GENERATIONS_PER_MINUTE, RATE_LIMIT_IP_BURST,
+    RATE_LIMIT_EMAIL_GENERATIONS_PER_MINUTE, RATE_LIMIT_EMAIL_BURST, RATE_LIMIT_MAX_KEYS,
+    ABUSE_RECONCILE_INTERVAL_SECONDS, ABUSE_MAX_EMAILS_PER_IP, ABUSE_IP_HISTORY_WINDOW_DAYS
+)
+from utils.rate_limit import KeyedRateLimiter
+
+
+class AbuseGuard:
+    """
+    Rate limits and IP signals shared by every session in the process.
+
+    Until the first reconciliation has loaded the blocked list,
+    is_ip_blocked returns None so callers can fall back to the database.
+    """
+
+    def __init__(self, interval: float = 30.0):
+        self.interval = interval
+        self._ip_limiter = KeyedRateLimiter(
+            RATE_LIMIT_IP_GENERATIONS_PER_MINUTE, RATE_LIMIT_IP_BURST, RATE_LIMIT_MAX_KEYS, name="ip"
+        )
+        self._email_limiter = KeyedRateLimiter(
+            RATE_LIMIT_EMAIL_GENERATIONS_PER_MINUTE, RATE_LIMIT_EMAIL_BURST, RATE_LIMIT_MAX_KEYS, name="email"
+        )
+        self._lock = threading.Lock()
+        self._blocked_ips: Optional[frozenset] = None
+        self._ip_emails: Dict[str, Dict[str, datetime]] = {}   # ip -> {email: last_seen}
+        self._history_watermark: Optional[datetime] = None
+        self._pending_usage: Counter = Counter()
+        self._stats = {"reconciles": 0, "reconcile_errors": 0, "history_rows": 0, "usage_flushed": 0}
+        self._last_reconcile: Optional[float] = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="abuse-guard", daemon=True)
+        self._thread.start()
+        atexit.register(self.flush_usage)
+
+    # ---- Checks (memory only) ----
+
+    def check_generation(self, email: str, ip_address: str) -> Tuple[bool, str]:
+        """
+        Rate-limit one generation request for an account and IP.
+
+        Both buckets are checked before either is charged, so a throttled
+        account doesn't use up its IP's tokens. Call refund_generation if
+        the request then fails (quota or generation).
+
+        Returns:
+            Tuple of (allowed, reason)
+        """
+        if self.is_ip_blocked(ip_address):
+            return False, "This IP address has been blocked. Please contact support."
+        limit_ip = bool(ip_address) and ip_address != "unknown"
+        if limit_ip and not self._ip_limiter.has_tokens(ip_address):
+            wait = self._ip_limiter.retry_after(ip_address)
+            return False, f"Too many requests from your network. Please wait {wait:.0f} seconds."
+        if email and not self._email_limiter.has_tokens(email):
+            wait = self._email_limiter.retry_after(email)
+            return False, f"You're generating too quickly. Please wait {wait:.0f} seconds."
+
+        # Another session may have drained a bucket since the check - undo the IP charge if so
+        if limit_ip and not self._ip_limiter.try_acquire(ip_address):
+            return False, "Too many requests from your network. Please wait a few seconds."
+        if email and not self._email_limiter.try_acquire(email):
+            if limit_ip:
+                self._ip_limiter.refund(ip_address)
+            return False, "You're generating too quickly. Please wait a few seconds."
+        return True, ""
+
+    def refund_generation(self, email: str, ip_address: str):
+        """Return the tokens check_generation took for a request that didn't go through."""
+        if ip_address and ip_address != "unknown":
+            self._ip_limiter.refund(ip_address)
+        if email:
+            self._email_limiter.refund(email)
+
+    def is_ip_blocked(self, ip_address: str) -> Optional[bool]:
+        """Blocked-list lookup; None until the list has been loaded once."""
+        blocked = self._blocked_ips
+        if blocked is None:
+            return None
+        return ip_address in blocked
+
+    def record_usage(self, ip_address: str, count: int):
+        """Count questions charged from an IP; added to IP_USAGE on the next reconciliation."""
+        if ip_address and count:
+            with self._lock:
+                self._pending_usage[ip_address] += count
+
+    def emails_for_ip(self, ip_address: str) -> int:
+        """Accounts seen on an IP within ABUSE_IP_HISTORY_WINDOW_DAYS."""
+        with self._lock:
+            return len(self._ip_emails.get(ip_address, {}))
+
+    def get_flagged_ips(self, min_emails: int = ABUSE_MAX_EMAILS_PER_IP + 1) -> List[Dict[str, Any]]:
+        """IPs used by at least `min_emails` accounts, most accounts first."""
+        with self._lock:
+            flagged = [
+                {"ip_address": ip, "email_count": len(emails), "emails": sorted(emails)}
+                for ip, emails in self._ip_emails.items() if len(emails) >= min_emails
+            ]
+        return sorted(flagged, key=lambda item: -item["email_count"])
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["pending_usage_ips"] = len(self._pending_usage)
+            stats["tracked_ips"] = len(self._ip_emails)
+            stats["blocked_ips"] = len(self._blocked_ips) if self._blocked_ips is not None else None
+        stats["seconds_since_reconcile"] = (
+            time.monotonic() - self._last_reconcile if self._last_reconcile is not None else None
+        )
+        stats["ip_limiter"] = self._ip_limiter.get_stats()
+        stats["email_limiter"] = self._email_limiter.get_stats()
+        return stats
+
+    # ---- Reconciliation (background thread) ----
+
+    def reconcile(self):
+        """One sync with Snowflake: flush usage counters, reload blocked IPs, pull new IP history."""
+        from database.queries import get_blocked_ips
+
+        ok = self.flush_usage()
+
+        blocked = get_blocked_ips()
+        if blocked is not None:
+            self._blocked_ips = frozenset(blocked)
+        else:
+            ok = False
+
+        ok = self._sync_ip_history() and ok
+
+        with self._lock:
+            self._stats["reconciles" if ok else "reconcile_errors"] += 1
+        self._last_reconcile = time.monotonic()
+
+    def flush_usage(self) -> bool:
+        """Write pending per-IP question counts to IP_USAGE (restored on failure)."""
+        from database.queries import add_ip_usage_counts
+
+        with self._lock:
+            pending, self._pending_usage = self._pending_usage, Counter()
+        if not pending:
+            return True
+        if add_ip_usage_counts(dict(pending)):
+            with self._lock:
+                self._stats["usage_flushed"] += sum(pending.values())
+            return True
+        with self._lock:
+            self._pending_usage.update(pending)
+        return False
+
+    def _sync_ip_history(self) -> bool:
+        from database.queries import get_ip_history_since
+
+        window_start = datetime.now() - timedelta(days=ABUSE_IP_HISTORY_WINDOW_DAYS)
+        since = max(self._history_watermark or window_start, window_start)
+        rows = get_ip_history_since(since)
+        if rows is None:
+            return False
+
+        with self._lock:
+            for email, ip_address, last_seen in rows:
+                if not email or not ip_address:
+                    continue
+                emails = self._ip_emails.setdefault(ip_address, {})
+                emails[email] = max(last_seen, emails.get(email, last_seen))
+                if self._history_watermark is None or last_seen > self._history_watermark:
+                    self._history_watermark = last_seen
+            # Forget accounts that haven't used an IP within the window
+            for ip_address in list(self._ip_emails):
+                emails = self._ip_emails[ip_address]
+                for email in [e for e, seen in emails.items() if seen < window_start]:
+                    del emails[email]
+                if not emails:
+                    del self._ip_emails[ip_address]
+            self._stats["history_rows"] += len(rows)
+        return True
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.reconcile()
+            except Exception as e:
+                print(f"Abuse guard reconciliation failed: {e}")
+                with self._lock:
+                    self._stats["reconcile_errors"] += 1
+            self._stop.wait(self.interval)
+
+
+@st.cache_resource
+def get_abuse_guard() -> AbuseGuard:
+    """Create and cache the process-wide abuse guard (starts its reconciliation thread)."""
+    return AbuseGuard(interval=ABUSE_RECONCILE_INTERVAL_SECONDS)
+
+
+def check_generation_allowed(email: str, ip_address: str) -> Tuple[bool, str]:
+    """Rate-limit check for a generation - answered from memory."""
+    try:
+        return get_abuse_guard().check_generation(email, ip_address)
+    except Exception as e:
+        print(f"Abuse guard check failed: {e}")
+        return True, ""
+
+
+def refund_generation(email: str, ip_address: str):
+    """Undo check_generation_allowed for a generation that failed or wasn't charged."""
+    try:
+        get_abuse_guard().refund_generation(email, ip_address)
+    except Exception as e:
+        print(f"Abuse guard refund failed: {e}")
+
+
+def is_ip_blocked(ip_address: str) -> bool:
+    """Blocked-IP check from the in-memory list, falling back to the cached query until it loads."""
+    try:
+        blocked = get_abuse_guard().is_ip_blocked(ip_address)
+        if blocked is not None:
+            return blocked
+    except Exception as e:
+        print(f"Abuse guard lookup failed: {e}")
+    from database.queries import is_ip_blocked as query_is_ip_blocked
+    return query_is_ip_blocked(ip_address)
+
+
+def record_ip_usage(ip_address: str, count: int):
+    """Count charged questions against an IP (synced to IP_USAGE in the background)."""
+    try:
+        get_abuse_guard().record_usage(ip_address, count)
+    except Exception as e:
+        print(f"Abuse guard usage record failed: {e}")
+
+
+def get_abuse_stats() -> Dict[str, Any]:
+    """Limiter and reconciliation counters (for the admin panel)."""
+    try:
+        return get_abuse_guard().get_stats()
+    except Exception:
+        return {}
+
+
+def get_flagged_ips() -> List[Dict[str, Any]]:
+    """IPs shared by more than ABUSE_MAX_EMAILS_PER_IP accounts (for the admin panel)."""
+    try:
+        return get_abuse_guard().get_flagged_ips()
+    except Exception:
+        return []
@@ -3,11 +3,23 @@ LEPT AI Reviewer - Enhanced AI Question Generation Service
 Strictly aligned with PRC LEPT Board Examination format and competencies
 """
 
+import itertools
 import json
-from typing import List, Dict, Optional
+import random
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import TYPE_CHECKING, Callable, List, Dict, Iterable, Iterator, Optional, Tuple
 import streamlit as st
 
-from config.settings import QUESTIONS_PER_BATCH, EXAM_COMPONENTS
+from config.settings import (
+    QUESTIONS_PER_BATCH, EXAM_COMPONENTS,
+    AI_FANOUT_CHUNK_SIZE, AI_FANOUT_MAX_CONCURRENCY, AI_FANOUT_MAX_ROUNDS,
+    OPENAI_TOKENS_PER_MINUTE, OPENAI_RATE_LIMIT_MAX_WAIT_SECONDS
+)
+from utils.rate_limit import TokenBucket
+from utils.tracing import span, traced, bind_context
+
+if TYPE_CHECKING:
+    from services.document_index import BM25Index
 
 
 # ============== LEPT BOARD EXAM FORMAT SPECIFICATIONS ==============
@@ -368,6 +380,14 @@ SPECIALIZATION_COMPETENCIES = {
 }
 
 
+# Chat completion settings shared by the batch and streaming generators
+COMPLETION_OPTIONS = {
+    "model": "gpt-4o-mini",
+    "temperature": 0.7,
+    "max_tokens": 4000,
+}
+
+
 def get_openai_client():
     """Get OpenAI client instance."""
     try:
@@ -403,6 +423,37 @@ def get_openai_client():
         return None
 
 
+@st.cache_resource
+def get_openai_rate_limiter() -> TokenBucket:
+    """Token-per-minute budget shared by every generation call in this server."""
+    return TokenBucket(OPENAI_TOKENS_PER_MINUTE, name="openai_tokens")
+
+
+def create_completion(client, messages: List[Dict], stream: bool = False, **options):
+    """
+    chat.completions.create under the shared token budget.
+
+    Reserves prompt tokens (estimated at 4 characters per token) plus
+    max_tokens before calling, and refunds what a non-streamed response
+    didn't use. Raises RuntimeError if the budget stays exhausted for
+    OPENAI_RATE_LIMIT_MAX_WAIT_SECONDS.
+    """
+    options = {**COMPLETION_OPTIONS, **options}
+    limiter = get_openai_rate_limiter()
+    reserved = sum(len(m["content"]) for m in messages) // 4 + options["max_tokens"]
+    with span("openai.completion", model=options.get("model"), stream=stream, reserved_tokens=reserved) as trace_span:
+        with span("openai.rate_limit_wait"):
+            acquired = limiter.acquire(reserved, timeout=OPENAI_RATE_LIMIT_MAX_WAIT_SECONDS)
+        if not acquired:
+            raise RuntimeError("AI generation is busy right now. Please try again in a minute.")
+        response = client.chat.completions.create(messages=messages, stream=stream, **options)
+        usage = getattr(response, "usage", None) if not stream else None
+        if usage is not None and getattr(usage, "total_tokens", None):
+            trace_span.set(total_tokens=usage.total_tokens)
+            limiter.refund(reserved - usage.total_tokens)
+    return response
+
+
 def get_competencies_for_config(exam_component: str, specialization: str) -> Dict:
     """Get specific competencies based on exam configuration."""
     
@@ -446,23 +497,36 @@ def build_topics_list(competencies: Dict) -> str:
     return "\n".join(topics_text)
 
 
-def generate_questions(
+def build_retrieval_query(exam_name: str, specialization: Optional[str], competencies: Dict,
+                          topic: Optional[str] = None) -> str:
+    """
+    Search terms for picking relevant document chunks. A chosen topic is the
+    query (weighted, plus the component and specialization); without one,
+    the competency areas and their topics stand in for it.
+    """
+    choices = [exam_name, specialization or ""]
+    # Repeated terms weigh more in BM25Index.search
+    if topic:
+        return " ".join(term for term in [topic] * 3 + choices if term)
+    terms = choices * 2
+    for area, data in competencies.items():
+        terms.append(area)
+        if isinstance(data, dict):
+            terms.extend(data.get("topics", []))
+    return " ".join(term for term in terms if term)
+
+
+def build_generation_messages(
     exam_type: str,
     specialization: Optional[str],
     difficulty: str,
     document_text: str,
     num_questions: int = QUESTIONS_PER_BATCH,
-    education_level: str = "secondary"
+    education_level: str = "secondary",
+    document_indexes: Optional[List[Tuple[str, "BM25Index"]]] = None,
+    topic: Optional[str] = None
 ) -> List[Dict]:
-    """
-    Generate LEPT board exam questions strictly aligned with exam configuration.
-    Uses official LEPT competencies and format.
-    """
-    client = get_openai_client()
-    if client is None:
-        st.error("OpenAI API key not configured. Please check your secrets.")
-        return []
-    
+    """Build the system + user chat messages for a question generation request."""
     # Get exam component details
     exam_info = EXAM_COMPONENTS.get(exam_type, {})
     exam_name = exam_info.get("name", exam_type)
@@ -480,9 +544,15 @@ def generate_questions(
     
     # Handle document context
     doc_instruction = ""
+    if document_indexes:
+        from services.document_index import retrieve_context
+        document_text = retrieve_context(
+            document_indexes, build_retrieval_query(exam_name, specialization, competencies, topic)
+        )
     if document_text and len(document_text.strip()) > 200:
         from services.document_processor import truncate_text_for_ai
-        truncated = truncate_text_for_ai(document_text, max_chars=6000)
+        from config.settings import DOC_CONTEXT_MAX_CHARS
+        truncated = truncate_text_for_ai(document_text, max_chars=DOC_CONTEXT_MAX_CHARS)
         doc_instruction = f"""
 UPLOADED DOCUMENT (Use ONLY if directly relevant to {exam_name}):
 {truncated}
@@ -517,7 +587,7 @@ EXAM CONFIGURATION (MUST FOLLOW EXACTLY)
 • Exam Component: {exam_name}
 • Specialization: {specialization if specialization else "N/A"}
 • Difficulty: {difficulty}
-• Number of Questions: {num_questions}
+• Number of Questions: {num_questions}{f"{chr(10)}• Focus Topic: {topic}" if topic else ""}
 
 {spec_strict}
 
@@ -569,13 +639,7 @@ Return ONLY a valid JSON array:
 
 Generate exactly {num_questions} questions. Return ONLY valid JSON, no other text."""
 
-    try:
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[
-                {
-                    "role": "system",
-                    "content": f"""You are an official LEPT board exam question writer for the Philippine PRC.
+    system_prompt = f"""You are an official LEPT board exam question writer for the Philippine PRC.
                     
 Your expertise:
 - Philippine education system and K-12 curriculum
@@ -591,15 +655,44 @@ CRITICAL RULES:
 4. Use official LEPT competencies as reference
 5. Follow Philippine education context
 6. Return ONLY valid JSON"""
-                },
-                {
-                    "role": "user",
-                    "content": prompt
-                }
-            ],
-            temperature=0.7,
-            max_tokens=4000
-        )
+
+    return [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": prompt}
+    ]
+
+
+@traced("ai.generate_questions")
+def generate_questions(
+    exam_type: str,
+    specialization: Optional[str],
+    difficulty: str,
+    document_text: str,
+    num_questions: int = QUESTIONS_PER_BATCH,
+    education_level: str = "secondary",
+    document_indexes: Optional[List[Tuple[str, "BM25Index"]]] = None,
+    topic: Optional[str] = None
+) -> List[Dict]:
+    """
+    Generate LEPT board exam questions strictly aligned with exam configuration.
+    Uses official LEPT competencies and format.
+    
+    With document_indexes ([(filename, BM25Index), ...]) only the chunks that
+    match the exam component/specialization/topic are put in the prompt;
+    otherwise document_text is truncated as before.
+    """
+    client = get_openai_client()
+    if client is None:
+        st.error("OpenAI API key not configured. Please check your secrets.")
+        return []
+    
+    messages = build_generation_messages(
+        exam_type, specialization, difficulty, document_text,
+        num_questions, education_level, document_indexes, topic
+    )
+    
+    try:
+        response = create_completion(client, messages)
         
         response_text = response.choices[0].message.content.strip()
         questions = parse_questions_response(response_text)
@@ -620,6 +713,232 @@ CRITICAL RULES:
         return []
 
 
+def generate_questions_stream(
+    exam_type: str,
+    specialization: Optional[str],
+    difficulty: str,
+    document_text: str,
+    num_questions: int = QUESTIONS_PER_BATCH,
+    education_level: str = "secondary",
+    document_indexes: Optional[List[Tuple[str, "BM25Index"]]] = None,
+    topic: Optional[str] = None
+) -> Iterator[Dict]:
+    """
+    Streaming version of generate_questions: yields each validated question
+    as soon as its JSON object is complete in the streamed completion,
+    instead of waiting for the whole array.
+    """
+    client = get_openai_client()
+    if client is None:
+        st.error("OpenAI API key not configured. Please check your secrets.")
+        return
+    
+    messages = build_generation_messages(
+        exam_type, specialization, difficulty, document_text,
+        num_questions, education_level, document_indexes, topic
+    )
+    
+    count = 0
+    try:
+        stream = create_completion(client, messages, stream=True)
+        for question in validate_questions_stream(iter_json_objects(_iter_stream_text(stream))):
+            yield question
+            count += 1
+            if count >= num_questions:
+                break
+    except Exception as e:
+        st.error(f"Error generating questions: {str(e)}")
+        return
+    
+    if count == 0:
+        st.error("Failed to parse AI response. Please try again.")
+    elif count < num_questions:
+        st.warning(f"Generated {count} of {num_questions} questions.")
+
+
+def _iter_stream_text(stream) -> Iterator[str]:
+    """Text deltas of a streamed chat completion."""
+    for chunk in stream:
+        if chunk.choices and chunk.choices[0].delta.content:
+            yield chunk.choices[0].delta.content
+
+
+def iter_json_objects(chunks: Iterable[str]) -> Iterator[Dict]:
+    """
+    Incrementally scan text chunks for top-level JSON objects ({...} at
+    brace depth 0, e.g. the items of a JSON array, with or without markdown
+    fences around it) and yield each one as soon as its closing brace arrives.
+    Braces inside strings are ignored; objects that fail to parse are skipped.
+    """
+    depth = 0
+    in_string = False
+    escaped = False
+    current = []
+    
+    for chunk in chunks:
+        start = 0
+        for i, ch in enumerate(chunk):
+            if depth == 0:
+                if ch == "{":
+                    depth, start = 1, i
+                continue
+            if in_string:
+                if escaped:
+                    escaped = False
+                elif ch == "\\":
+                    escaped = True
+                elif ch == '"':
+                    in_string = False
+            elif ch == '"':
+                in_string = True
+            elif ch == "{":
+                depth += 1
+            elif ch == "}":
+                depth -= 1
+                if depth == 0:
+                    current.append(chunk[start:i + 1])
+                    try:
+                        obj = json.loads("".join(current))
+                        if isinstance(obj, dict):
+                            yield obj
+                    except json.JSONDecodeError:
+                        pass
+                    current = []
+        if depth:
+            # Object continues in the next chunk
+            current.append(chunk[start:])
+
+
+def validate_questions_stream(questions: Iterable[Dict]) -> Iterator[Dict]:
+    """validate_questions one question at a time, skipping invalid ones."""
+    for q in questions:
+        yield from validate_questions([q])
+
+
+# ============== FAN-OUT BATCH GENERATION ==============
+
+def split_by_weight(total: int, weights: Dict[str, int]) -> Dict[str, int]:
+    """Split a question count by percentage weights (largest remainder, so counts sum to total)."""
+    weight_sum = sum(weights.values()) or 1
+    exact = {key: total * weight / weight_sum for key, weight in weights.items()}
+    counts = {key: int(value) for key, value in exact.items()}
+    leftover = total - sum(counts.values())
+    for key in sorted(exact, key=lambda k: exact[k] - counts[k], reverse=True)[:leftover]:
+        counts[key] += 1
+    return counts
+
+
+def _topic_cycle(exam_component: str, specialization: Optional[str]) -> Iterator[Optional[str]]:
+    """Endless shuffled cycle of a component's competency topics, to spread sub-requests across topics."""
+    competencies = get_competencies_for_config(exam_component, specialization or "General Education")
+    topics = [
+        topic
+        for data in competencies.get("competencies", {}).values() if isinstance(data, dict)
+        for topic in data.get("topics", [])
+    ]
+    random.shuffle(topics)
+    return itertools.cycle(topics or [None])
+
+
+def _request_questions(client, messages: List[Dict], num_questions: int) -> List[Dict]:
+    """One non-streamed sub-request. Runs on a worker thread, so no st.* calls."""
+    response = create_completion(client, messages)
+    questions = parse_questions_response(response.choices[0].message.content.strip())
+    return validate_questions(questions)[:num_questions]
+
+
+@traced("ai.generate_questions_batch")
+def generate_questions_batch(
+    total: int,
+    specialization: Optional[str],
+    difficulty: str,
+    education_level: str = "secondary",
+    exam_components: Optional[List[str]] = None,
+    document_indexes: Optional[List[Tuple[str, "BM25Index"]]] = None,
+    on_progress: Optional[Callable[[int, int], None]] = None,
+    counts: Optional[Dict[str, int]] = None
+) -> List[Dict]:
+    """
+    Generate a large exam (e.g. 50-150 items) as parallel sub-requests.
+
+    The total is split across exam components by their EXAM_COMPONENTS
+    weight (GenEd 20 / ProfEd 40 / Specialization 40), then into
+    sub-requests of AI_FANOUT_CHUNK_SIZE questions, each focused on a
+    different competency topic. At most AI_FANOUT_MAX_CONCURRENCY run at
+    once, all under the shared token-per-minute budget. Duplicates (same
+    normalized question text) and failed sub-requests are topped up in
+    later rounds, up to AI_FANOUT_MAX_ROUNDS.
+    
+    Args:
+        on_progress: Called on the caller's thread as (questions_done, total)
+        counts: Exact per-component counts, instead of splitting total by weight
+    
+    Returns:
+        Questions grouped by component in EXAM_COMPONENTS order, each
+        tagged with its "exam_component"
+    """
+    from services.question_bank import question_id
+    
+    client = get_openai_client()
+    if client is None:
+        st.error("OpenAI API key not configured. Please check your secrets.")
+        return []
+    
+    if counts:
+        components = [c for c in EXAM_COMPONENTS if counts.get(c, 0) > 0]
+        targets = {c: counts[c] for c in components}
+        total = sum(targets.values())
+    else:
+        components = [c for c in (exam_components or list(EXAM_COMPONENTS)) if c in EXAM_COMPONENTS]
+        targets = split_by_weight(total, {c: EXAM_COMPONENTS[c]["weight"] for c in components})
+    topics = {c: _topic_cycle(c, specialization) for c in components}
+    collected = {c: [] for c in components}
+    seen = set()
+    errors = []
+    
+    # Sub-request spans nest under this call's span
+    request = bind_context(_request_questions)
+    with ThreadPoolExecutor(max_workers=AI_FANOUT_MAX_CONCURRENCY, thread_name_prefix="ai-fanout") as executor:
+        for _ in range(AI_FANOUT_MAX_ROUNDS):
+            futures = {}
+            for component in components:
+                missing = targets[component] - len(collected[component])
+                while missing > 0:
+                    count = min(AI_FANOUT_CHUNK_SIZE, missing)
+                    messages = build_generation_messages(
+                        component, specialization, difficulty, "", count,
+                        education_level, document_indexes, next(topics[component])
+                    )
+                    futures[executor.submit(request, client, messages, count)] = component
+                    missing -= count
+            if not futures:
+                break
+            
+            for future in as_completed(futures):
+                component = futures[future]
+                try:
+                    questions = future.result()
+                except Exception as e:
+                    errors.append(str(e))
+                    print(f"Fan-out sub-request for {component} failed: {e}")
+                    continue
+                for q in questions:
+                    key = question_id(q)
+                    if key in seen or len(collected[component]) >= targets[component]:
+                        continue
+                    seen.add(key)
+                    collected[component].append(dict(q, exam_component=component))
+                if on_progress:
+                    on_progress(sum(len(qs) for qs in collected.values()), total)
+    
+    result = [q for component in components for q in collected[component]]
+    if not result and errors:
+        st.error(f"Error generating questions: {errors[-1]}")
+    elif len(result) < total:
+        st.warning(f"Generated {len(result)} of {total} questions.")
+    return result
+
+
 def parse_questions_response(response_text: str) -> List[Dict]:
     """Parse AI response to extract questions."""
     # Try direct JSON parse
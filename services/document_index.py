@@ -0,0 +1,275 @@
+"""
+LEPT AI Reviewer - Document Index Service
+Reviewer text is split into chunks and indexed with BM25 once, at ingestion.
+Question generation retrieves only the chunks that match the selected exam
+component/specialization instead of sending the first few thousand
+characters of every document.
+"""
+
+import gzip
+import json
+import math
+import os
+import re
+import tempfile
+from collections import Counter
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from config.settings import (
+    DOC_INDEX_CHUNK_CHARS, DOC_INDEX_PATH, DOC_INDEX_CACHE_MAX_ENTRIES,
+    DOC_CONTEXT_MAX_CHARS, DOC_RETRIEVAL_TOP_K
+)
+from database.keyed_cache import KeyedTTLCache
+
+
+INDEX_FORMAT_VERSION = 1
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+_SENTENCE_END_RE = re.compile(r"(?<=[.!?])\s+")
+
+# Common English/Filipino function words that carry no topical signal
+_STOPWORDS = frozenset("""
+a an and are as at be but by for from has have in is it its of on or that the their there
+these this to was were will with which who what when where how than then so such not no
+can may also into about between each other more most only own same very
+ang ng mga sa na at ay si ni kay para ito iyon mula
+""".split())
+
+# Indexes are immutable once built: shared without copying, and they only leave the cache by LRU
+_index_cache = KeyedTTLCache(
+    maxsize=DOC_INDEX_CACHE_MAX_ENTRIES, ttl=24 * 3600, name="document_index", copy_values=False
+)
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase word tokens without stopwords, numbers or one-letter words."""
+    return [
+        token for token in _TOKEN_RE.findall(text.lower())
+        if len(token) > 1 and not token.isdigit() and token not in _STOPWORDS
+    ]
+
+
+def chunk_text(text: str, chunk_chars: int = DOC_INDEX_CHUNK_CHARS) -> List[str]:
+    """
+    Split text into chunks of about `chunk_chars`, on paragraph boundaries
+    where possible and on sentence boundaries inside oversized paragraphs.
+    """
+    chunks = []
+    current = []
+    current_len = 0
+
+    def flush():
+        nonlocal current, current_len
+        if current:
+            chunks.append("\n\n".join(current))
+        current, current_len = [], 0
+
+    for paragraph in text.split("\n\n"):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        pieces = [paragraph] if len(paragraph) <= chunk_chars else _split_long(paragraph, chunk_chars)
+        for piece in pieces:
+            if current_len and current_len + len(piece) > chunk_chars:
+                flush()
+            current.append(piece)
+            current_len += len(piece) + 2
+    flush()
+    return chunks
+
+
+def _split_long(paragraph: str, chunk_chars: int) -> List[str]:
+    pieces = []
+    current = ""
+    for sentence in _SENTENCE_END_RE.split(paragraph):
+        while len(sentence) > chunk_chars:
+            # No sentence break in sight - hard split at the last space
+            cut = sentence.rfind(" ", 0, chunk_chars)
+            cut = cut if cut > chunk_chars // 2 else chunk_chars
+            pieces.append(sentence[:cut])
+            sentence = sentence[cut:].lstrip()
+        if current and len(current) + len(sentence) + 1 > chunk_chars:
+            pieces.append(current)
+            current = sentence
+        else:
+            current = f"{current} {sentence}" if current else sentence
+    if current:
+        pieces.append(current)
+    return pieces
+
+
+class BM25Index:
+    """
+    Okapi BM25 over a document's chunks, stored as an inverted index
+    (term -> [(chunk_id, term_frequency), ...]).
+    """
+
+    def __init__(self, chunks: List[str], postings: Dict[str, List[Tuple[int, int]]],
+                 chunk_lengths: List[int], k1: float = 1.5, b: float = 0.75):
+        self.chunks = chunks
+        self.postings = postings
+        self.chunk_lengths = chunk_lengths
+        self.k1 = k1
+        self.b = b
+        self.avg_length = (sum(chunk_lengths) / len(chunk_lengths)) if chunk_lengths else 0.0
+
+    @classmethod
+    def build(cls, text: str, chunk_chars: int = DOC_INDEX_CHUNK_CHARS) -> "BM25Index":
+        """Chunk and index a document's text."""
+        chunks = chunk_text(text, chunk_chars)
+        postings: Dict[str, List[Tuple[int, int]]] = {}
+        chunk_lengths = []
+        for chunk_id, chunk in enumerate(chunks):
+            tokens = tokenize(chunk)
+            chunk_lengths.append(len(tokens))
+            for term, tf in Counter(tokens).items():
+                postings.setdefault(term, []).append((chunk_id, tf))
+        return cls(chunks, postings, chunk_lengths)
+
+    def search(self, query: str, top_k: int = DOC_RETRIEVAL_TOP_K) -> List[Tuple[int, float]]:
+        """
+        Return up to top_k (chunk_id, score) pairs, best first. Chunks sharing
+        no term score 0 and are omitted. A term repeated in the query counts
+        that many times, so callers can weight terms by repeating them.
+        """
+        n = len(self.chunks)
+        if not n:
+            return []
+        scores: Dict[int, float] = {}
+        for term, query_tf in Counter(tokenize(query)).items():
+            term_postings = self.postings.get(term)
+            if not term_postings:
+                continue
+            df = len(term_postings)
+            idf = query_tf * math.log(1 + (n - df + 0.5) / (df + 0.5))
+            for chunk_id, tf in term_postings:
+                norm = self.k1 * (1 - self.b + self.b * self.chunk_lengths[chunk_id] / (self.avg_length or 1))
+                scores[chunk_id] = scores.get(chunk_id, 0.0) + idf * tf * (self.k1 + 1) / (tf + norm)
+        return sorted(scores.items(), key=lambda item: (-item[1], item[0]))[:top_k]
+
+    def to_dict(self) -> Dict:
+        return {
+            "version": INDEX_FORMAT_VERSION,
+            "chunks": self.chunks,
+            "postings": self.postings,
+            "chunk_lengths": self.chunk_lengths,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "BM25Index":
+        postings = {term: [tuple(entry) for entry in entries] for term, entries in data["postings"].items()}
+        return cls(data["chunks"], postings, data["chunk_lengths"])
+
+
+# ============== INDEX STORE ==============
+
+def _index_path(text_hash: str) -> Optional[Path]:
+    # Only content hashes name files on disk; chunk size is part of the name so
+    # changing DOC_INDEX_CHUNK_CHARS rebuilds instead of reusing stale indexes
+    if not text_hash or not re.fullmatch(r"[0-9a-f]{64}", text_hash):
+        return None
+    return Path(DOC_INDEX_PATH) / f"{text_hash}.v{INDEX_FORMAT_VERSION}-{DOC_INDEX_CHUNK_CHARS}.json.gz"
+
+
+def _load_from_disk(text_hash: str) -> Optional[BM25Index]:
+    path = _index_path(text_hash)
+    if path is None or not path.is_file():
+        return None
+    try:
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            return BM25Index.from_dict(json.load(f))
+    except Exception as e:
+        print(f"Error loading document index {path}: {e}")
+        return None
+
+
+def _save_to_disk(text_hash: str, index: BM25Index):
+    path = _index_path(text_hash)
+    if path is None:
+        return
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_name = tempfile.mkstemp(prefix=".index-", dir=path.parent)
+        with os.fdopen(fd, "wb") as raw, gzip.open(raw, "wt", encoding="utf-8") as f:
+            json.dump(index.to_dict(), f)
+        os.replace(tmp_name, path)
+    except Exception as e:
+        print(f"Error saving document index {path}: {e}")
+
+
+def build_document_index(text_hash: str, text: str) -> Optional[BM25Index]:
+    """Build, cache and persist the index for a document (called at ingestion)."""
+    if not text or text.startswith("["):
+        return None
+    index = BM25Index.build(text)
+    _index_cache.set(text_hash, index)
+    _save_to_disk(text_hash, index)
+    return index
+
+
+def get_document_index(doc: Dict, email: str) -> Optional[BM25Index]:
+    """
+    Get the index for a user or admin document dict (from the document list queries).
+
+    Looks in memory, then on disk, and only as a last resort loads the text
+    and builds it (e.g. documents uploaded before indexing existed).
+    """
+    key = doc.get("text_hash") or f"{doc.get('source')}-{doc.get('doc_id')}"
+    index = _index_cache.get(key)
+    if index is not None:
+        return index
+
+    index = _load_from_disk(key)
+    if index is not None:
+        _index_cache.set(key, index)
+        return index
+
+    from database.queries import get_admin_document_text, get_user_document_text
+    if doc.get("source") == "admin":
+        doc_data = get_admin_document_text(doc.get("doc_id"))
+    else:
+        doc_data = get_user_document_text(doc.get("doc_id"), email)
+    if not doc_data or not doc_data.get("text"):
+        return None
+    return build_document_index(key, doc_data["text"])
+
+
+def retrieve_context(indexes: List[Tuple[str, BM25Index]], query: str,
+                     max_chars: int = DOC_CONTEXT_MAX_CHARS, top_k: int = DOC_RETRIEVAL_TOP_K) -> str:
+    """
+    Pick the best-scoring chunks across documents, up to max_chars, and
+    return them grouped by document in reading order.
+
+    If nothing matches the query, the opening chunks are used instead so
+    the model can still judge whether the document is relevant.
+    """
+    candidates = []
+    for doc_pos, (_, index) in enumerate(indexes):
+        for chunk_id, score in index.search(query, top_k):
+            candidates.append((score, doc_pos, chunk_id))
+    if not candidates:
+        candidates = [(0.0, doc_pos, chunk_id)
+                      for doc_pos, (_, index) in enumerate(indexes)
+                      for chunk_id in range(min(2, len(index.chunks)))]
+    candidates.sort(key=lambda item: (-item[0], item[1], item[2]))
+
+    picked = []
+    used = 0
+    for _, doc_pos, chunk_id in candidates:
+        chunk = indexes[doc_pos][1].chunks[chunk_id]
+        if used + len(chunk) > max_chars:
+            continue
+        picked.append((doc_pos, chunk_id))
+        used += len(chunk)
+    if not picked and candidates:
+        # Budget smaller than one chunk - send the best one cut to size
+        _, doc_pos, chunk_id = candidates[0]
+        return f"--- {indexes[doc_pos][0]} ---\n" + indexes[doc_pos][1].chunks[chunk_id][:max_chars]
+
+    sections = []
+    for doc_pos in sorted({doc_pos for doc_pos, _ in picked}):
+        chunk_ids = sorted(chunk_id for pos, chunk_id in picked if pos == doc_pos)
+        index = indexes[doc_pos][1]
+        sections.append(f"--- {indexes[doc_pos][0]} ---\n" + "\n[...]\n".join(index.chunks[c] for c in chunk_ids))
+    return "\n\n".join(sections)
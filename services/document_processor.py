@@ -4,99 +4,424 @@ Enhanced to handle various file formats and sizes
 """
 
 import io
-from typing import Optional, Tuple
+import multiprocessing
+import os
+import re
+import shutil
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures import TimeoutError as FuturesTimeoutError
+from typing import BinaryIO, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
 from pathlib import Path
 
 import streamlit as st
 
+from config.settings import (
+    EXTRACTION_CACHE_MAX_ENTRIES, EXTRACTION_CACHE_TTL_SECONDS, EXTRACTED_TEXT_MAX_CHARS,
+    PDF_PARALLEL_MIN_BYTES, PDF_WORKER_PROCESSES, PDF_MAX_CONCURRENT_EXTRACTIONS,
+    PDF_EXTRACTION_TIMEOUT_SECONDS, STORAGE_CHUNK_SIZE
+)
+from database.keyed_cache import KeyedTTLCache
+from utils.file_utils import compute_file_hash
+from utils.tracing import current_span, traced
 
-def extract_text_from_pdf(file_bytes: bytes) -> Tuple[bool, str]:
+
+# Progress callback: (pages_done, page_count)
+ProgressCallback = Callable[[int, int], None]
+
+
+# ============== EXTRACTION DEDUPE ==============
+
+# Extracted text keyed by SHA-256 of the file bytes, shared by all sessions
+_extraction_cache = KeyedTTLCache(
+    maxsize=EXTRACTION_CACHE_MAX_ENTRIES, ttl=EXTRACTION_CACHE_TTL_SECONDS, name="extracted_text"
+)
+_extraction_stats_lock = threading.Lock()
+_extraction_stats = {"extracted": 0, "skipped_cache": 0, "skipped_db": 0}
+
+
+def _count_extraction(outcome: str):
+    current_span().set(outcome=outcome)
+    with _extraction_stats_lock:
+        _extraction_stats[outcome] += 1
+
+
+# Stand-ins returned when a file yields no usable text. They let the upload
+# go through but are never cached or persisted under the file's hash.
+PLACEHOLDER_LIMITED_TEXT = "[{kind} document uploaded - text extraction limited. The document can still be used for reference.]"
+PLACEHOLDER_MINIMAL_TEXT = "[{kind} document uploaded - contains minimal extractable text.]"
+PLACEHOLDER_SQL_PATTERN = "[% document uploaded - %]"
+_PLACEHOLDER_RE = re.compile(r"\[(?:PDF|DOCX) document uploaded - [^\]]*\]")
+
+
+def is_placeholder_text(text: Optional[str]) -> bool:
+    """True for the stand-in texts above (vs. text actually extracted from a file)."""
+    return bool(text) and _PLACEHOLDER_RE.fullmatch(text) is not None
+
+
+def get_extraction_stats() -> Dict[str, int]:
+    """Get how many uploads were parsed vs. served from an earlier extraction."""
+    with _extraction_stats_lock:
+        stats = dict(_extraction_stats)
+    stats["skipped"] = stats["skipped_cache"] + stats["skipped_db"]
+    return stats
+
+
+# ============== PDF EXTRACTION ==============
+
+def _open_pypdf2(stream):
+    from PyPDF2 import PdfReader
+    return PdfReader(stream)
+
+
+def _open_pdfplumber(stream):
+    import pdfplumber
+    return pdfplumber.open(stream)
+
+
+def _open_pypdf(stream):
+    from pypdf import PdfReader as PyPdfReader
+    return PyPdfReader(stream)
+
+
+# Tried in this order per page; later backends only see pages earlier ones returned empty
+_PDF_BACKENDS = [
+    ("PyPDF2", _open_pypdf2),
+    ("pdfplumber", _open_pdfplumber),
+    ("pypdf", _open_pypdf),
+]
+
+
+def _pdf_stream_factory(source) -> Callable[[], BinaryIO]:
     """
-    Extract text from a PDF file using multiple methods.
+    Return a function that opens an independent stream over the PDF, so each
+    backend keeps its own read position without copying the file.
+    """
+    if isinstance(source, (str, Path)):
+        return lambda: open(source, "rb")
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return lambda: io.BytesIO(source)
+    if hasattr(source, "getvalue"):
+        # BytesIO / UploadedFile: getvalue() shares the buffer instead of copying it
+        data = source.getvalue()
+        return lambda: io.BytesIO(data)
+
+    def rewind():
+        source.seek(0)
+        return source
+    return rewind
+
+
+class _PdfPageSource:
+    """One PDF library, opened lazily the first time a page needs it."""
+
+    def __init__(self, name: str, opener: Callable, open_stream: Callable[[], BinaryIO]):
+        self.name = name
+        self._opener = opener
+        self._open_stream = open_stream
+        self._stream = None
+        self._doc = None
+        self._failed = False
+        self.page_count = 0
+
+    def open(self) -> bool:
+        if self._doc is not None:
+            return True
+        if self._failed:
+            return False
+        try:
+            self._stream = self._open_stream()
+            self._doc = self._opener(self._stream)
+            self.page_count = len(self._doc.pages)
+            return True
+        except ImportError:
+            pass
+        except Exception as e:
+            print(f"{self.name} extraction error: {e}")
+        self._failed = True
+        self.close()
+        return False
+
+    def extract(self, page_index: int) -> str:
+        if page_index >= self.page_count:
+            return ""
+        try:
+            page = self._doc.pages[page_index]
+            text = page.extract_text() or ""
+            # pdfplumber caches layout objects per page until closed
+            close_page = getattr(page, "close", None)
+            if close_page:
+                close_page()
+            return text if text.strip() else ""
+        except Exception:
+            return ""
+
+    def close(self):
+        for resource in (self._doc, self._stream):
+            close = getattr(resource, "close", None)
+            if close:
+                try:
+                    close()
+                except Exception:
+                    pass
+        self._doc = None
+        self._stream = None
+
+
+def iter_pdf_pages(source, max_chars: Optional[int] = None,
+                   start_page: int = 0, end_page: Optional[int] = None,
+                   on_page: Optional[ProgressCallback] = None) -> Iterator[Tuple[int, str]]:
+    """
+    Yield (page_index, text) for each PDF page that has text, one page at a time.
     
-    Args:
-        file_bytes: PDF file as bytes
+    Each page is read with the first backend that opens; only pages that come
+    back empty are retried with the next backend. Stops once `max_chars`
+    characters have been yielded, so callers can collect just enough text
+    for the AI context budget.
     
-    Returns:
-        Tuple of (success, extracted_text_or_error)
+    Args:
+        source: File path, bytes, or a binary file-like object (e.g. UploadedFile)
+        max_chars: Stop after at least this many characters (None = whole document)
+        start_page: First page index to read
+        end_page: Stop before this page index (None = last page)
+        on_page: Called with (pages_done, page_count) after every page, with or without text
     """
-    text_parts = []
-    
-    # Method 1: Try PyPDF2
+    open_stream = _pdf_stream_factory(source)
+    backends = [_PdfPageSource(name, opener, open_stream) for name, opener in _PDF_BACKENDS]
     try:
-        from PyPDF2 import PdfReader
-        
-        pdf_file = io.BytesIO(file_bytes)
-        reader = PdfReader(pdf_file)
+        primary = next((backend for backend in backends if backend.open()), None)
+        if primary is None:
+            return
         
-        for page in reader.pages:
-            try:
-                page_text = page.extract_text()
-                if page_text and page_text.strip():
-                    text_parts.append(page_text)
-            except Exception:
+        total_chars = 0
+        stop = primary.page_count if end_page is None else min(end_page, primary.page_count)
+        for page_index in range(start_page, stop):
+            text = primary.extract(page_index)
+            if not text:
+                for fallback in backends:
+                    if fallback is primary or not fallback.open():
+                        continue
+                    text = fallback.extract(page_index)
+                    if text:
+                        break
+            if on_page:
+                on_page(page_index - start_page + 1, stop - start_page)
+            if not text:
                 continue
-        
-    except ImportError:
-        pass
-    except Exception as e:
-        print(f"PyPDF2 extraction error: {e}")
-    
-    # Method 2: Try pdfplumber if PyPDF2 didn't get much text
-    if len("".join(text_parts)) < 100:
-        try:
-            import pdfplumber
             
-            pdf_file = io.BytesIO(file_bytes)
-            with pdfplumber.open(pdf_file) as pdf:
-                for page in pdf.pages:
-                    try:
-                        page_text = page.extract_text()
-                        if page_text and page_text.strip():
-                            text_parts.append(page_text)
-                    except Exception:
-                        continue
-        except ImportError:
+            yield page_index, text
+            total_chars += len(text)
+            if max_chars is not None and total_chars >= max_chars:
+                return
+    finally:
+        for backend in backends:
+            backend.close()
+
+
+# ============== PARALLEL PDF EXTRACTION ==============
+
+# Caps whole-document extractions in the process pool; when all are taken, PDFs extract inline
+_extraction_slots = threading.BoundedSemaphore(PDF_MAX_CONCURRENT_EXTRACTIONS)
+_process_pool_lock = threading.Lock()
+_process_pool: Optional[ProcessPoolExecutor] = None
+_process_pool_jobs: Dict[ProcessPoolExecutor, int] = {}   # pool -> extractions using it
+_retired_pools = set()
+_PDF_POOL_WORKERS = max(1, min(PDF_WORKER_PROCESSES, os.cpu_count() or 1))
+
+
+def _acquire_process_pool() -> ProcessPoolExecutor:
+    """Get the shared extraction process pool (created on first use) for one extraction."""
+    global _process_pool
+    with _process_pool_lock:
+        if _process_pool is None:
+            # spawn, not fork: forking a multi-threaded Streamlit server can deadlock
+            _process_pool = ProcessPoolExecutor(
+                max_workers=_PDF_POOL_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        _process_pool_jobs[_process_pool] = _process_pool_jobs.get(_process_pool, 0) + 1
+        return _process_pool
+
+
+def _release_process_pool(pool: ProcessPoolExecutor, retire: bool = False):
+    """
+    Finish one extraction's use of a pool. `retire` (its workers hung past
+    the timeout) takes the pool out of service so new extractions get a
+    fresh one; a retired pool is only killed once the last extraction
+    still using it is done, so other uploads aren't cut off.
+    """
+    global _process_pool
+    with _process_pool_lock:
+        if retire:
+            _retired_pools.add(pool)
+            if _process_pool is pool:
+                _process_pool = None
+        _process_pool_jobs[pool] -= 1
+        kill = pool in _retired_pools and not _process_pool_jobs[pool]
+        if kill:
+            del _process_pool_jobs[pool]
+            _retired_pools.discard(pool)
+    if kill:
+        _kill_process_pool(pool)
+
+
+def _kill_process_pool(pool: ProcessPoolExecutor):
+    for process in list((getattr(pool, "_processes", None) or {}).values()):
+        try:
+            process.terminate()
+        except Exception:
             pass
-        except Exception as e:
-            print(f"pdfplumber extraction error: {e}")
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _extract_page_range(path: str, start_page: int, end_page: int) -> List[Tuple[int, str]]:
+    """Worker entry point: extract one contiguous page range from a PDF on disk."""
+    return list(iter_pdf_pages(path, start_page=start_page, end_page=end_page))
+
+
+def _pdf_source_size(source) -> int:
+    if isinstance(source, (str, Path)):
+        return os.path.getsize(source)
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return len(source)
+    if hasattr(source, "getbuffer"):
+        return source.getbuffer().nbytes
+    return getattr(source, "size", 0) or 0
+
+
+def _count_pdf_pages(path: str) -> int:
+    open_stream = _pdf_stream_factory(path)
+    for name, opener in _PDF_BACKENDS:
+        backend = _PdfPageSource(name, opener, open_stream)
+        try:
+            if backend.open():
+                return backend.page_count
+        finally:
+            backend.close()
+    return 0
+
+
+def _spool_pdf_to_disk(source) -> Tuple[str, bool]:
+    """Give workers a path to open instead of pickling the file. Returns (path, is_temp)."""
+    if isinstance(source, (str, Path)):
+        return str(source), False
+    
+    open_stream = _pdf_stream_factory(source)
+    fd, path = tempfile.mkstemp(suffix=".pdf", prefix="extract-")
+    with os.fdopen(fd, "wb") as tmp:
+        shutil.copyfileobj(open_stream(), tmp, STORAGE_CHUNK_SIZE)
+    if hasattr(source, "seek"):
+        source.seek(0)
+    return path, True
+
+
+@traced("extract.pdf_parallel")
+def extract_pdf_pages_parallel(source, timeout: float = PDF_EXTRACTION_TIMEOUT_SECONDS,
+                               on_page: Optional[ProgressCallback] = None) -> Optional[List[str]]:
+    """
+    Extract page texts in worker processes, one contiguous page range per
+    worker, and reassemble them in page order. `on_page` is called as each
+    range finishes.
+    
+    Returns:
+        Page texts, or None if all extraction slots are busy (extract inline instead)
     
-    # Method 3: Try pypdf if others failed
-    if len("".join(text_parts)) < 100:
+    Raises:
+        TimeoutError: Workers ran past the timeout
+    """
+    if not _extraction_slots.acquire(blocking=False):
+        return None
+    try:
+        path, is_temp = _spool_pdf_to_disk(source)
         try:
-            from pypdf import PdfReader as PyPdfReader
+            page_count = _count_pdf_pages(path)
+            if not page_count:
+                return []
             
-            pdf_file = io.BytesIO(file_bytes)
-            reader = PyPdfReader(pdf_file)
-            
-            for page in reader.pages:
+            pool = _acquire_process_pool()
+            timed_out = False
+            try:
+                per_job = -(-page_count // _PDF_POOL_WORKERS)  # ceil
+                futures = {
+                    pool.submit(_extract_page_range, path, start, min(start + per_job, page_count)):
+                        min(start + per_job, page_count) - start
+                    for start in range(0, page_count, per_job)
+                }
+                pages_done = 0
                 try:
-                    page_text = page.extract_text()
-                    if page_text and page_text.strip():
-                        text_parts.append(page_text)
-                except Exception:
-                    continue
-        except ImportError:
-            pass
+                    for future in as_completed(futures, timeout=timeout):
+                        pages_done += futures[future]
+                        if on_page:
+                            on_page(pages_done, page_count)
+                except FuturesTimeoutError:
+                    timed_out = True
+                    for future in futures:
+                        future.cancel()  # Ranges not started yet; running ones die with the pool
+                    raise TimeoutError(f"PDF extraction of {page_count} pages exceeded {timeout:.0f}s")
+                
+                pages = sorted(page for future in futures for page in future.result())
+                return [text for _, text in pages]
+            finally:
+                _release_process_pool(pool, retire=timed_out)
+        finally:
+            if is_temp:
+                os.unlink(path)
+    finally:
+        _extraction_slots.release()
+
+
+@traced("extract.pdf")
+def extract_text_from_pdf(source, max_chars: Optional[int] = None,
+                          on_page: Optional[ProgressCallback] = None) -> Tuple[bool, str]:
+    """
+    Extract text from a PDF file page by page (see iter_pdf_pages).
+    
+    PDFs of PDF_PARALLEL_MIN_BYTES or more are parsed in the process pool so
+    the CPU-bound work doesn't hold this server's GIL; smaller ones (and large
+    ones while every extraction slot is busy) inline.
+    
+    Args:
+        source: PDF as a file path, bytes, or binary file-like object
+        max_chars: Optional cap on extracted characters
+        on_page: Progress callback, called with (pages_done, page_count)
+    
+    Returns:
+        Tuple of (success, extracted_text_or_error)
+    """
+    text_parts = None
+    if PDF_WORKER_PROCESSES > 0 and _pdf_source_size(source) >= PDF_PARALLEL_MIN_BYTES:
+        try:
+            text_parts = extract_pdf_pages_parallel(source, on_page=on_page)
+        except TimeoutError as e:
+            print(f"Parallel PDF extraction timed out: {e}")
+            return False, "Text extraction timed out. Please try uploading the file again."
         except Exception as e:
-            print(f"pypdf extraction error: {e}")
+            print(f"Parallel PDF extraction error, extracting inline: {e}")
+    
+    if text_parts is None:
+        text_parts = [text for _, text in iter_pdf_pages(source, max_chars=max_chars, on_page=on_page)]
     
     if not text_parts:
         # Return success with a placeholder - allow upload even without text
-        return True, "[PDF document uploaded - text extraction limited. The document can still be used for reference.]"
-    
-    full_text = "\n\n".join(text_parts)
+        return True, PLACEHOLDER_LIMITED_TEXT.format(kind="PDF")
     
-    # Clean up the text
-    full_text = clean_extracted_text(full_text)
+    # Clean page by page - the raw pages are never joined into one big string
+    full_text = clean_text_stream(text_parts)
+    del text_parts
+    if max_chars is not None:
+        full_text = full_text[:max_chars]
     
     # Don't reject based on text length - allow any content
     if not full_text.strip():
-        return True, "[PDF document uploaded - contains minimal extractable text.]"
+        return True, PLACEHOLDER_MINIMAL_TEXT.format(kind="PDF")
     
     return True, full_text
 
 
+# ============== DOCX EXTRACTION ==============
+
+@traced("extract.docx")
 def extract_text_from_docx(file_bytes: bytes) -> Tuple[bool, str]:
     """
     Extract text from a DOCX file with multiple fallback methods.
@@ -168,45 +493,153 @@ def extract_text_from_docx(file_bytes: bytes) -> Tuple[bool, str]:
     
     if not text_parts:
         # Return success with placeholder - allow upload even without extracted text
-        return True, "[DOCX document uploaded - text extraction limited. The document can still be used for reference.]"
-    
-    full_text = "\n\n".join(text_parts)
+        return True, PLACEHOLDER_LIMITED_TEXT.format(kind="DOCX")
     
     # Clean up the text
-    full_text = clean_extracted_text(full_text)
+    full_text = clean_text_stream(text_parts)
     
     # Don't reject based on text length - allow any content
     if not full_text.strip():
-        return True, "[DOCX document uploaded - contains minimal extractable text.]"
+        return True, PLACEHOLDER_MINIMAL_TEXT.format(kind="DOCX")
     
     return True, full_text
 
 
-def extract_text_from_file(uploaded_file) -> Tuple[bool, str]:
+def extract_text_from_file(uploaded_file, content_hash: Optional[str] = None,
+                           on_page: Optional[ProgressCallback] = None) -> Tuple[bool, str]:
     """
     Extract text from an uploaded file (PDF or DOCX).
     
     Args:
         uploaded_file: Streamlit UploadedFile object
+        content_hash: SHA-256 hex of the file bytes, if the caller already has it
+        on_page: PDF progress callback, called with (pages_done, page_count)
     
     Returns:
         Tuple of (success, extracted_text_or_error)
     """
     if uploaded_file is None:
         return False, "No file provided"
+    return extract_text(uploaded_file, uploaded_file.name, content_hash=content_hash, on_page=on_page)
+
+
+@traced("extract.text")
+def extract_text(source, filename: str, content_hash: Optional[str] = None,
+                 on_page: Optional[ProgressCallback] = None) -> Tuple[bool, str]:
+    """
+    Extract text from a PDF or DOCX given as a path, bytes or binary stream.
     
-    filename = uploaded_file.name.lower()
-    file_bytes = uploaded_file.read()
+    Files already extracted (same SHA-256, by anyone) are served from the
+    in-process cache or the TEXT_HASH of an existing document row instead of
+    being parsed again.
     
-    # Reset file pointer for potential reuse
-    uploaded_file.seek(0)
+    Args:
+        source: File path, bytes, or binary file-like object
+        filename: Original file name (decides the parser)
+        content_hash: SHA-256 hex of the file bytes, if the caller already has it
+        on_page: PDF progress callback, called with (pages_done, page_count)
+    
+    Returns:
+        Tuple of (success, extracted_text_or_error)
+    """
+    filename = filename.lower()
+    if not filename.endswith(('.pdf', '.docx')):
+        return False, "Unsupported file format. Please upload a PDF or DOCX file."
+    
+    if not content_hash:
+        if isinstance(source, (str, Path)):
+            with open(source, "rb") as f:
+                content_hash = compute_file_hash(f)
+        else:
+            content_hash = compute_file_hash(source)
+    
+    cached_text = _extraction_cache.get(content_hash)
+    if cached_text is not None:
+        _count_extraction("skipped_cache")
+        return True, cached_text
+    
+    from database.queries import get_extracted_text_by_hash
+    stored_text = get_extracted_text_by_hash(content_hash)
+    if stored_text:
+        _count_extraction("skipped_db")
+        _extraction_cache.set(content_hash, stored_text)
+        return True, stored_text
     
     if filename.endswith('.pdf'):
-        return extract_text_from_pdf(file_bytes)
-    elif filename.endswith('.docx'):
-        return extract_text_from_docx(file_bytes)
+        # Pages are streamed from the source itself - no extra copy of the file
+        success, text = extract_text_from_pdf(source, max_chars=EXTRACTED_TEXT_MAX_CHARS, on_page=on_page)
     else:
-        return False, "Unsupported file format. Please upload a PDF or DOCX file."
+        if isinstance(source, (str, Path)):
+            with open(source, "rb") as f:
+                file_bytes = f.read()
+        elif isinstance(source, (bytes, bytearray, memoryview)):
+            file_bytes = bytes(source)
+        else:
+            file_bytes = source.read()
+        success, text = extract_text_from_docx(file_bytes)
+        text = text[:EXTRACTED_TEXT_MAX_CHARS]
+    
+    # Reset file pointer for potential reuse
+    if hasattr(source, "seek"):
+        source.seek(0)
+    
+    _count_extraction("extracted")
+    if success and not is_placeholder_text(text):
+        _extraction_cache.set(content_hash, text)
+    return success, text
+
+
+# Lines made only of separator characters (dot leaders, rules, ASCII borders)
+_DECORATION_LINE = re.compile(r"[.\-_=*# ]+")
+
+
+def iter_text_lines(chunks: Iterable[str], separator: str = "\n\n") -> Iterator[str]:
+    """
+    Yield the lines of `separator.join(chunks)` without building the joined string.
+    
+    Lets page texts be cleaned as they arrive; a line split across two
+    chunks is carried over and yielded whole.
+    """
+    carry = None
+    for chunk in chunks:
+        if carry is None:
+            text = chunk
+        else:
+            text = carry + separator + chunk
+        lines = text.split('\n')
+        carry = lines.pop()
+        yield from lines
+    if carry is not None:
+        yield carry
+
+
+def iter_clean_lines(lines: Iterable[str]) -> Iterator[str]:
+    """
+    Single-pass line normalizer.
+    
+    Strips each line, drops separator-only lines and collapses runs of blank
+    lines to one empty line - only ever emitted between two kept lines, so
+    the output never starts or ends with a blank.
+    """
+    pending_blank = False
+    emitted = False
+    for line in lines:
+        line = line.strip()
+        if not line:
+            pending_blank = emitted
+            continue
+        if _DECORATION_LINE.fullmatch(line):
+            continue
+        if pending_blank:
+            yield ""
+            pending_blank = False
+        emitted = True
+        yield line
+
+
+def clean_text_stream(chunks: Iterable[str], separator: str = "\n\n") -> str:
+    """Clean text given as chunks (e.g. one per PDF page) joined by `separator`."""
+    return "\n".join(iter_clean_lines(iter_text_lines(chunks, separator)))
 
 
 def clean_extracted_text(text: str) -> str:
@@ -221,34 +654,7 @@ def clean_extracted_text(text: str) -> str:
     """
     if not text:
         return ""
-    
-    # Remove excessive whitespace
-    lines = text.split('\n')
-    cleaned_lines = []
-    
-    for line in lines:
-        # Strip whitespace
-        line = line.strip()
-        
-        # Skip empty lines (but keep some for paragraph separation)
-        if not line:
-            if cleaned_lines and cleaned_lines[-1] != "":
-                cleaned_lines.append("")
-            continue
-        
-        # Remove lines that are just special characters
-        if all(c in '.-_=*#' for c in line.replace(' ', '')):
-            continue
-        
-        cleaned_lines.append(line)
-    
-    cleaned_text = '\n'.join(cleaned_lines)
-    
-    # Remove multiple consecutive newlines (keep max 2)
-    while '\n\n\n' in cleaned_text:
-        cleaned_text = cleaned_text.replace('\n\n\n', '\n\n')
-    
-    return cleaned_text.strip()
+    return "\n".join(iter_clean_lines(text.split('\n')))
 
 
 def truncate_text_for_ai(text: str, max_chars: int = 15000) -> str:
@@ -0,0 +1,222 @@
+"""
+LEPT AI Reviewer - File Storage Service
+Content-addressed binary storage for uploaded documents.
+Files are written in chunks while being hashed (SHA-256) and stored under
+their hash, so identical uploads are stored once and never base64-encoded.
+"""
+
+import hashlib
+import os
+import tempfile
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import BinaryIO, Iterator, Optional, Tuple
+
+import streamlit as st
+
+from config.settings import (
+    STORAGE_BACKEND, STORAGE_LOCAL_PATH, STORAGE_STAGE_NAME, STORAGE_CHUNK_SIZE
+)
+
+
+STORAGE_KEY_PREFIX = "sha256:"
+
+
+def is_storage_key(value: Optional[str]) -> bool:
+    """True if value is a content-hash storage key (vs. a legacy stage path)."""
+    return bool(value) and value.startswith(STORAGE_KEY_PREFIX)
+
+
+def _key_to_hash(key: str) -> str:
+    digest = key[len(STORAGE_KEY_PREFIX):] if is_storage_key(key) else ""
+    if len(digest) != 64 or any(c not in "0123456789abcdef" for c in digest):
+        raise ValueError(f"Invalid storage key: {key!r}")
+    return digest
+
+
+class StorageBackend(ABC):
+    """Interface for content-addressed blob storage."""
+
+    @abstractmethod
+    def save(self, stream: BinaryIO) -> Tuple[str, int]:
+        """
+        Store the contents of a binary stream.
+
+        Returns:
+            Tuple of (storage_key, size_in_bytes)
+        """
+
+    def spool(self, stream: BinaryIO) -> Tuple[str, int]:
+        """
+        Write a stream to this server's disk only; commit() makes it durable.
+        Lets callers on the script thread skip the slow remote upload.
+        """
+        return self.save(stream)
+
+    def commit(self, key: str):
+        """Upload a spooled blob to the backend's durable store (no-op if already there)."""
+
+    @abstractmethod
+    def open(self, key: str) -> BinaryIO:
+        """Open a stored blob for streaming reads. Caller closes it."""
+
+    @abstractmethod
+    def exists(self, key: str) -> bool:
+        """Check if a blob is stored."""
+
+    @abstractmethod
+    def local_path(self, key: str) -> Path:
+        """Path of a blob on this server's disk (e.g. for worker processes to open)."""
+
+    def iter_chunks(self, key: str, chunk_size: int = STORAGE_CHUNK_SIZE) -> Iterator[bytes]:
+        """Yield a stored blob in chunks without loading it all into memory."""
+        with self.open(key) as f:
+            while True:
+                chunk = f.read(chunk_size)
+                if not chunk:
+                    break
+                yield chunk
+
+
+class LocalFileStorage(StorageBackend):
+    """
+    Blobs on the local filesystem at <root>/<ab>/<cd>/<sha256>.
+
+    Uploads are streamed to a temp file in the same directory tree, then
+    atomically renamed into place; if the hash already exists the temp file
+    is dropped instead.
+    """
+
+    def __init__(self, root: str = STORAGE_LOCAL_PATH, chunk_size: int = STORAGE_CHUNK_SIZE):
+        self.root = Path(root)
+        self.chunk_size = max(64 * 1024, chunk_size)
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    def path_for(self, key: str) -> Path:
+        digest = _key_to_hash(key)
+        return self.root / digest[:2] / digest[2:4] / digest
+
+    def save(self, stream: BinaryIO) -> Tuple[str, int]:
+        key, size, _ = self._write_local(stream)
+        return key, size
+
+    def open(self, key: str) -> BinaryIO:
+        return open(self.path_for(key), "rb")
+
+    def exists(self, key: str) -> bool:
+        return self.path_for(key).is_file()
+
+    def local_path(self, key: str) -> Path:
+        path = self.path_for(key)
+        if not path.is_file():
+            raise FileNotFoundError(f"{key} not found in {self.root}")
+        return path
+
+    def _write_local(self, stream: BinaryIO) -> Tuple[str, int, Path]:
+        """Chunked write + hash. Returns (key, size, final_path)."""
+        if hasattr(stream, "seek"):
+            stream.seek(0)
+
+        sha = hashlib.sha256()
+        size = 0
+        fd, tmp_name = tempfile.mkstemp(prefix=".upload-", dir=self.root)
+        try:
+            with os.fdopen(fd, "wb") as tmp:
+                while True:
+                    chunk = stream.read(self.chunk_size)
+                    if not chunk:
+                        break
+                    sha.update(chunk)
+                    tmp.write(chunk)
+                    size += len(chunk)
+
+            key = STORAGE_KEY_PREFIX + sha.hexdigest()
+            final_path = self.path_for(key)
+            if final_path.is_file():
+                os.unlink(tmp_name)  # Identical content already stored
+            else:
+                final_path.parent.mkdir(parents=True, exist_ok=True)
+                os.replace(tmp_name, final_path)
+            return key, size, final_path
+        except Exception:
+            if os.path.exists(tmp_name):
+                os.unlink(tmp_name)
+            raise
+        finally:
+            if hasattr(stream, "seek"):
+                stream.seek(0)
+
+
+class SnowflakeStageStorage(LocalFileStorage):
+    """
+    Blobs in a Snowflake internal stage at <stage>/<ab>/<sha256>, uploaded
+    uncompressed with PUT. The local directory is a read-through cache so a
+    blob is fetched with GET at most once per server.
+    """
+
+    def __init__(self, stage: str = STORAGE_STAGE_NAME, cache_root: str = STORAGE_LOCAL_PATH,
+                 chunk_size: int = STORAGE_CHUNK_SIZE):
+        super().__init__(cache_root, chunk_size)
+        self.stage = stage.rstrip("/")
+
+    def save(self, stream: BinaryIO) -> Tuple[str, int]:
+        key, size = self.spool(stream)
+        self.commit(key)
+        return key, size
+
+    def spool(self, stream: BinaryIO) -> Tuple[str, int]:
+        key, size, _ = self._write_local(stream)
+        return key, size
+
+    def commit(self, key: str):
+        from database.connection import execute_query
+
+        local_path = super().local_path(key)
+        digest = _key_to_hash(key)
+        # OVERWRITE = FALSE makes PUT skip blobs the stage already has
+        result = execute_query(
+            f"PUT 'file://{local_path.resolve().as_posix()}' {self.stage}/{digest[:2]}/ "
+            f"AUTO_COMPRESS = FALSE OVERWRITE = FALSE PARALLEL = 4"
+        )
+        if result is None:
+            raise IOError(f"Failed to upload {key} to {self.stage}")
+
+    def open(self, key: str) -> BinaryIO:
+        local_path = self.path_for(key)
+        if not local_path.is_file():
+            self._download(key, local_path)
+        return open(local_path, "rb")
+
+    def local_path(self, key: str) -> Path:
+        path = self.path_for(key)
+        if not path.is_file():
+            self._download(key, path)
+        return path
+
+    def exists(self, key: str) -> bool:
+        from database.connection import execute_query
+
+        if super().exists(key):
+            return True
+        digest = _key_to_hash(key)
+        result = execute_query(f"LIST {self.stage}/{digest[:2]}/{digest}")
+        return bool(result)
+
+    def _download(self, key: str, local_path: Path):
+        from database.connection import execute_query
+
+        digest = _key_to_hash(key)
+        local_path.parent.mkdir(parents=True, exist_ok=True)
+        result = execute_query(
+            f"GET {self.stage}/{digest[:2]}/{digest} 'file://{local_path.parent.resolve().as_posix()}/'"
+        )
+        if not result or not local_path.is_file():
+            raise FileNotFoundError(f"{key} not found in {self.stage}")
+
+
+@st.cache_resource
+def get_storage_backend() -> StorageBackend:
+    """Create and cache the configured storage backend."""
+    if STORAGE_BACKEND == "stage":
+        return SnowflakeStageStorage()
+    return LocalFileStorage()
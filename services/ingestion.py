@@ -0,0 +1,255 @@
+"""
+LEPT AI Reviewer - Document Ingestion Service
+Uploads are stored first, then extracted and saved by background workers.
+Upload pages get a job ID back immediately and poll its status/progress
+instead of holding the session in a spinner for the whole parse.
+"""
+
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+import streamlit as st
+
+from config.settings import (
+    INGESTION_QUEUED, INGESTION_EXTRACTING, INGESTION_STORED, INGESTION_FAILED,
+    INGESTION_WORKERS, INGESTION_PROGRESS_WRITE_INTERVAL_SECONDS, INGESTION_JOB_RETENTION_SECONDS,
+    ACTION_UPLOAD_ADMIN_DOC
+)
+from services.file_storage import get_storage_backend, STORAGE_KEY_PREFIX
+
+
+DOC_KIND_USER = "user"
+DOC_KIND_ADMIN = "admin"
+
+FINISHED_STATUSES = (INGESTION_STORED, INGESTION_FAILED)
+
+
+class IngestionQueue:
+    """
+    Runs extract-and-save jobs on a small thread pool.
+
+    Job state lives in memory for fast polling and is persisted to
+    INGESTION_JOBS on every status change (progress at most every
+    INGESTION_PROGRESS_WRITE_INTERVAL_SECONDS) through the write-behind queue.
+    CPU-heavy PDF parsing inside a job still goes to the extraction process pool.
+
+    Jobs are not resumed across restarts (their upload options live only in
+    memory): on startup, rows a previous process left QUEUED/EXTRACTING are
+    marked FAILED so their owners are told to upload again.
+    """
+
+    def __init__(self, workers: int = 2):
+        self._executor = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="ingest")
+        self._jobs: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self._executor.submit(self._sweep_interrupted, datetime.now())
+
+    def submit(self, kind: str, filename: str, storage_key: str, owner_email: str,
+               options: Optional[Dict[str, Any]] = None) -> str:
+        """
+        Queue a spooled upload for committing, extraction and saving.
+
+        Args:
+            kind: DOC_KIND_USER or DOC_KIND_ADMIN
+            filename: Original file name
+            storage_key: Key returned by the storage backend's spool()
+            owner_email: Uploading user's email ("admin" for admin uploads)
+            options: Extra save_*_document arguments (category, is_downloadable)
+
+        Returns:
+            The new job ID
+        """
+        job_id = uuid.uuid4().hex
+        job = {
+            "job_id": job_id,
+            "kind": kind,
+            "filename": filename,
+            "storage_key": storage_key,
+            "owner_email": owner_email,
+            "options": dict(options or {}),
+            "status": INGESTION_QUEUED,
+            "pages_done": 0,
+            "page_count": 0,
+            "doc_id": None,
+            "text_length": 0,
+            "error": None,
+            "updated_at": time.time(),
+        }
+        with self._lock:
+            self._prune_locked()
+            self._jobs[job_id] = job
+        self._persist(job)
+        self._executor.submit(self._run, job_id)
+        return job_id
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Snapshot of a job held in memory, or None."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
+
+    def get_stats(self) -> Dict[str, int]:
+        """Count of in-memory jobs by status."""
+        with self._lock:
+            stats = {status: 0 for status in (INGESTION_QUEUED, INGESTION_EXTRACTING) + FINISHED_STATUSES}
+            for job in self._jobs.values():
+                stats[job["status"]] += 1
+        return stats
+
+    def _update(self, job_id: str, persist: bool = True, **changes):
+        with self._lock:
+            job = self._jobs[job_id]
+            job.update(changes, updated_at=time.time())
+            snapshot = dict(job)
+        if persist:
+            self._persist(snapshot)
+
+    def _sweep_interrupted(self, started_at: datetime):
+        from database.queries import fail_interrupted_ingestion_jobs
+        try:
+            fail_interrupted_ingestion_jobs(
+                started_at, "Processing was interrupted by a server restart. Please upload the file again."
+            )
+        except Exception as e:
+            print(f"Error sweeping interrupted ingestion jobs: {e}")
+
+    def _persist(self, job: Dict[str, Any]):
+        from database.queries import save_ingestion_job
+        try:
+            save_ingestion_job(job)
+        except Exception as e:
+            print(f"Error persisting ingestion job {job['job_id']}: {e}")
+
+    def _prune_locked(self):
+        cutoff = time.time() - INGESTION_JOB_RETENTION_SECONDS
+        for job_id in [job_id for job_id, job in self._jobs.items()
+                       if job["status"] in FINISHED_STATUSES and job["updated_at"] < cutoff]:
+            del self._jobs[job_id]
+
+    def _run(self, job_id: str):
+        from services.document_processor import extract_text, is_placeholder_text
+        from database.queries import save_user_document, save_admin_document, log_admin_action
+
+        job = self.get(job_id)
+        self._update(job_id, status=INGESTION_EXTRACTING)
+        last_write = [0.0]
+
+        def on_page(pages_done: int, page_count: int):
+            now = time.monotonic()
+            persist = now - last_write[0] >= INGESTION_PROGRESS_WRITE_INTERVAL_SECONDS
+            if persist:
+                last_write[0] = now
+            self._update(job_id, persist=persist, pages_done=pages_done, page_count=page_count)
+
+        try:
+            storage_key = job["storage_key"]
+            text_hash = storage_key[len(STORAGE_KEY_PREFIX):]
+            backend = get_storage_backend()
+            backend.commit(storage_key)  # e.g. the stage PUT, kept off the script thread
+            path = backend.local_path(storage_key)
+            success, extracted_text = extract_text(path, job["filename"], content_hash=text_hash, on_page=on_page)
+            # Placeholder texts ("[PDF document uploaded - ...]") are not stored under TEXT_HASH,
+            # or every later upload of the same file would be served the placeholder
+            extracted_text = extracted_text if success and not is_placeholder_text(extracted_text) else None
+
+            file_type = job["filename"].split('.')[-1].lower()
+            options = job["options"]
+            if job["kind"] == DOC_KIND_ADMIN:
+                doc_id = save_admin_document(
+                    filename=job["filename"],
+                    file_type=file_type,
+                    storage_path=storage_key,
+                    is_downloadable=options.get("is_downloadable", False),
+                    uploaded_by=job["owner_email"],
+                    text_hash=text_hash,
+                    extracted_text=extracted_text,
+                    category=options.get("category", "General")
+                )
+                if doc_id:
+                    log_admin_action(
+                        job["owner_email"], ACTION_UPLOAD_ADMIN_DOC,
+                        f"Uploaded {job['filename']} (ID: {doc_id}, Category: {options.get('category', 'General')})"
+                    )
+            else:
+                doc_id = save_user_document(
+                    email=job["owner_email"],
+                    filename=job["filename"],
+                    file_type=file_type,
+                    storage_path=storage_key,
+                    text_hash=text_hash,
+                    extracted_text=extracted_text
+                )
+
+            if not doc_id:
+                raise RuntimeError("Failed to save document")
+
+            if extracted_text:
+                # Chunk + index now so question generation only has to retrieve
+                from services.document_index import build_document_index
+                try:
+                    build_document_index(text_hash, extracted_text)
+                except Exception as e:
+                    print(f"Error indexing {job['filename']}: {e}")
+
+            text_length = len(extracted_text) if extracted_text else 0
+            self._update(job_id, status=INGESTION_STORED, doc_id=doc_id, text_length=text_length)
+        except Exception as e:
+            print(f"Ingestion job {job_id} failed: {e}")
+            self._update(job_id, status=INGESTION_FAILED, error=str(e)[:1000])
+
+
+@st.cache_resource
+def get_ingestion_queue() -> IngestionQueue:
+    """Create and cache the process-wide ingestion queue."""
+    return IngestionQueue(workers=INGESTION_WORKERS)
+
+
+def submit_upload(uploaded_file, kind: str, owner_email: str,
+                  options: Optional[Dict[str, Any]] = None) -> Optional[str]:
+    """
+    Spool an uploaded file to local disk and queue it for ingestion.
+
+    Only the chunked local write happens on the caller's thread; the upload
+    to the storage backend (stage PUT), extraction and the database insert
+    run in the background job.
+
+    Returns:
+        Job ID, or None if the file couldn't be stored
+    """
+    try:
+        storage_key, _ = get_storage_backend().spool(uploaded_file)
+    except Exception as e:
+        print(f"Error storing upload {uploaded_file.name}: {e}")
+        return None
+    return get_ingestion_queue().submit(kind, uploaded_file.name, storage_key, owner_email, options)
+
+
+def get_ingestion_job(job_id: str) -> Optional[Dict[str, Any]]:
+    """Get a job's status - from memory, or from INGESTION_JOBS if this server doesn't have it."""
+    job = get_ingestion_queue().get(job_id)
+    if job:
+        return job
+    from database.queries import get_ingestion_job_row
+    return get_ingestion_job_row(job_id)
+
+
+def get_ingestion_jobs(job_ids: List[str]) -> List[Dict[str, Any]]:
+    """Get the status of several jobs, skipping unknown IDs."""
+    jobs = []
+    for job_id in job_ids:
+        job = get_ingestion_job(job_id)
+        if job:
+            jobs.append(job)
+    return jobs
+
+
+def get_ingestion_stats() -> Dict[str, int]:
+    """Job counts by status (for the admin panel)."""
+    try:
+        return get_ingestion_queue().get_stats()
+    except Exception:
+        return {}
@@ -0,0 +1,131 @@
+"""
+LEPT AI Reviewer - Mock Exam Assembler
+Builds a full-length LEPT mock exam in one pass, weighted by EXAM_COMPONENTS,
+from the preset question pools and the AI question bank. Items the pools
+can't cover are generated with the fan-out generator when allowed.
+"""
+
+import random
+from typing import Callable, Dict, List, Optional
+
+from config.settings import (
+    EXAM_COMPONENTS, DIFFICULTY_LEVELS, MOCK_EXAM_ITEMS, MOCK_EXAM_SECONDS_PER_ITEM
+)
+from services.preset_questions import get_preset_question_ids, get_preset_question
+from utils.tracing import traced
+
+
+QUESTION_FIELDS = ("question", "options", "correct_answer", "explanation")
+
+
+def _exam_item(question: Dict, exam_component: str) -> Dict:
+    item = {field: question[field] for field in QUESTION_FIELDS if field in question}
+    item["exam_component"] = exam_component
+    return item
+
+
+@traced("mock_exam.assemble")
+def assemble_mock_exam(
+    education_level: str,
+    specialization: Optional[str],
+    total: int = MOCK_EXAM_ITEMS,
+    max_generated: int = 0,
+    on_progress: Optional[Callable[[int, int], None]] = None
+) -> Dict:
+    """
+    Assemble a mock exam.
+
+    Each component gets its EXAM_COMPONENTS share of `total`, sampled
+    without repeats from its preset questions (every difficulty, via the
+    preset index) plus every difficulty of its AI bank. Up to
+    `max_generated` missing items are generated in parallel (and added to
+    the bank for later exams).
+
+    Args:
+        max_generated: Max items to generate live (0 = pools only)
+        on_progress: Progress callback for live generation, as (done, total)
+
+    Returns:
+        Dict with questions (grouped by component, shuffled within each),
+        targets per component, item counts by source, and duration_seconds
+    """
+    from services.ai_generator import split_by_weight
+    from services.question_bank import question_id, get_banked_questions
+
+    components = list(EXAM_COMPONENTS)
+    targets = split_by_weight(total, {c: EXAM_COMPONENTS[c]["weight"] for c in components})
+    picked: Dict[str, List[Dict]] = {c: [] for c in components}
+    sources = {"preset": 0, "bank": 0, "generated": 0}
+    seen = set()
+
+    for component in components:
+        candidates = {}
+        for preset_id in get_preset_question_ids(component, specialization):
+            q = get_preset_question(preset_id)
+            candidates.setdefault(question_id(q), ("preset", q))
+        for difficulty in DIFFICULTY_LEVELS:
+            for q in get_banked_questions(education_level, component, specialization, difficulty):
+                candidates.setdefault(q["question_id"], ("bank", q))
+
+        keys = [key for key in candidates if key not in seen]
+        for key in random.sample(keys, min(targets[component], len(keys))):
+            source, q = candidates[key]
+            seen.add(key)
+            sources[source] += 1
+            picked[component].append(_exam_item(q, component))
+
+    # Generate what the pools couldn't cover, within the allowance
+    budget = max(0, max_generated)
+    shortfall = {}
+    for component in components:
+        missing = min(targets[component] - len(picked[component]), budget)
+        if missing > 0:
+            shortfall[component] = missing
+            budget -= missing
+
+    if shortfall:
+        from services.ai_generator import generate_questions_batch
+        from services.question_bank import add_to_bank
+
+        generated = generate_questions_batch(
+            sum(shortfall.values()), specialization, "Medium",
+            education_level=education_level, counts=shortfall, on_progress=on_progress
+        )
+        for component in shortfall:
+            new = [q for q in generated if q["exam_component"] == component and question_id(q) not in seen]
+            seen.update(question_id(q) for q in new)
+            picked[component].extend(_exam_item(q, component) for q in new)
+            sources["generated"] += len(new)
+            if new:
+                add_to_bank(education_level, component, specialization, "Medium",
+                            [{field: q[field] for field in QUESTION_FIELDS} for q in new])
+
+    questions = []
+    for component in components:
+        random.shuffle(picked[component])
+        questions.extend(picked[component])
+
+    return {
+        "questions": questions,
+        "targets": targets,
+        "sources": sources,
+        "duration_seconds": len(questions) * MOCK_EXAM_SECONDS_PER_ITEM,
+    }
+
+
+def score_mock_exam(questions: List[Dict], answers: Dict[int, str]) -> Dict:
+    """Overall and per-component scores for answers keyed by question index."""
+    by_component = {c: {"correct": 0, "total": 0} for c in EXAM_COMPONENTS}
+    correct = 0
+    for i, q in enumerate(questions):
+        stats = by_component.setdefault(q.get("exam_component"), {"correct": 0, "total": 0})
+        stats["total"] += 1
+        if answers.get(i) == q.get("correct_answer"):
+            stats["correct"] += 1
+            correct += 1
+    return {
+        "correct": correct,
+        "total": len(questions),
+        "answered": sum(1 for i in range(len(questions)) if answers.get(i)),
+        "by_component": {c: s for c, s in by_component.items() if s["total"]},
+    }
@@ -4,8 +4,11 @@ Default questions for FREE users based on 2026 PRC LEPT Competencies
 Questions are aligned to specific exam configurations
 """
 
+import hashlib
 import random
-from typing import List, Dict
+from typing import List, Dict, Optional, Tuple
+
+from utils.bitset import Bitset
 
 # ============== GENERAL EDUCATION (GenEd) QUESTIONS ==============
 # Covers: English, Filipino, Mathematics, Science, Social Studies fundamentals
@@ -1230,12 +1233,88 @@ SPECIALIZATION_CONTENT_QUESTIONS = {
 }
 
 
+# ============== PRECOMPUTED QUESTION INDEX ==============
+# Built once at import: every preset question gets a global integer ID, and
+# each (component, specialization, difficulty) maps to a tuple of those IDs.
+# Specialization is None for GenEd/ProfEd; difficulty None means all three.
+
+PRESET_DIFFICULTIES = ("easy", "medium", "hard")
+
+# Specializations without their own questions use a related pool
+SPECIALIZATION_ALIASES = {
+    "Technical-Vocational Teacher Education (TVTE)": "Technology and Livelihood Education (TLE)",
+}
+
+
+def _build_preset_index() -> Tuple[Tuple[Dict, ...], Dict[Tuple, Tuple[int, ...]]]:
+    questions = []
+    index = {}
+
+    def add_pools(component: str, specialization: Optional[str], pools: Dict[str, List[Dict]]):
+        for difficulty in PRESET_DIFFICULTIES:
+            start = len(questions)
+            questions.extend(pools.get(difficulty, []))
+            index[(component, specialization, difficulty)] = tuple(range(start, len(questions)))
+        index[(component, specialization, None)] = tuple(
+            qid for difficulty in PRESET_DIFFICULTIES for qid in index[(component, specialization, difficulty)]
+        )
+
+    add_pools("general_education", None, GENERAL_EDUCATION_QUESTIONS)
+    add_pools("professional_education", None, PROFESSIONAL_EDUCATION_QUESTIONS)
+    for specialization, pools in SPECIALIZATION_CONTENT_QUESTIONS.items():
+        add_pools("specialization", specialization, pools)
+
+    for alias, target in SPECIALIZATION_ALIASES.items():
+        for difficulty in PRESET_DIFFICULTIES + (None,):
+            index.setdefault(("specialization", alias, difficulty), index.get(("specialization", target, difficulty), ()))
+
+    return tuple(questions), index
+
+
+PRESET_QUESTIONS, PRESET_INDEX = _build_preset_index()
+
+# IDs are positions, so any edit to the pools changes them; seen-sets saved
+# under another version are discarded rather than pointing at the wrong questions
+PRESET_INDEX_VERSION = hashlib.sha256(
+    "\n".join(q["question"] for q in PRESET_QUESTIONS).encode("utf-8")
+).hexdigest()[:8]
+
+
+def load_preset_seen(value: Optional[str]) -> Bitset:
+    """Parse a stored PRESET_SEEN value ("<version>:<base64>"); empty if missing or stale."""
+    version, _, bits = (value or "").partition(":")
+    return Bitset.from_base64(bits) if version == PRESET_INDEX_VERSION else Bitset()
+
+
+def dump_preset_seen(seen: Bitset) -> str:
+    """Serialize a seen-set for the USERS.PRESET_SEEN column."""
+    return f"{PRESET_INDEX_VERSION}:{seen.to_base64()}"
+
+
+def get_preset_question_ids(exam_component: str, specialization: Optional[str] = None,
+                            difficulty: Optional[str] = None) -> Tuple[int, ...]:
+    """
+    IDs of the preset questions for a configuration (empty if none).
+    
+    Args:
+        difficulty: 'Easy', 'Medium' or 'Hard', or None for all difficulties
+    """
+    spec = specialization if exam_component == "specialization" else None
+    return PRESET_INDEX.get((exam_component, spec, difficulty.lower() if difficulty else None), ())
+
+
+def get_preset_question(question_id: int) -> Dict:
+    """Preset question by its global ID (shared - don't mutate)."""
+    return PRESET_QUESTIONS[question_id]
+
+
 def get_aligned_preset_questions(
     education_level: str,
     exam_component: str,
     specialization: str,
     difficulty: str = "Medium",
-    num_questions: int = 5
+    num_questions: int = 5,
+    seen: Optional[Bitset] = None
 ) -> List[Dict]:
     """
     Get preset questions that are properly aligned to the exam configuration.
@@ -1244,68 +1323,55 @@ def get_aligned_preset_questions(
     - Professional Education: Returns ProfEd questions (teaching methodology)
     - Specialization: Returns subject-specific content questions
     
+    Samples IDs from the precomputed index, so no pool is copied or shuffled.
+    If the chosen difficulty has fewer than num_questions, the sample is
+    drawn from all difficulties.
+    
+    With a `seen` set, questions the user hasn't seen are picked first. Once
+    every question of the chosen difficulty has been seen, that difficulty's
+    IDs are cleared so its rotation starts over; other difficulties are only
+    drawn on when the chosen one has fewer than num_questions in total.
+    Picked IDs are added to `seen`; the caller persists it.
+    
     Args:
         education_level: 'elementary' or 'secondary'
         exam_component: 'general_education', 'professional_education', or 'specialization'
         specialization: The user's selected specialization
         difficulty: 'Easy', 'Medium', or 'Hard'
         num_questions: Number of questions to return
+        seen: The user's seen preset IDs (see load_preset_seen)
     
     Returns:
         List of question dictionaries aligned to the configuration
     """
-    difficulty_key = difficulty.lower()
-    questions = []
-    
-    if exam_component == "general_education":
-        # Return General Education questions (foundational subjects)
-        question_pool = GENERAL_EDUCATION_QUESTIONS.get(difficulty_key, [])
-        
-    elif exam_component == "professional_education":
-        # Return Professional Education questions (teaching methodology)
-        question_pool = PROFESSIONAL_EDUCATION_QUESTIONS.get(difficulty_key, [])
-        
-    elif exam_component == "specialization":
-        # Return specialization-specific content questions
-        spec_questions = SPECIALIZATION_CONTENT_QUESTIONS.get(specialization, {})
-        question_pool = spec_questions.get(difficulty_key, [])
-        
-        # If no questions for this specialization, try to find related
-        if not question_pool:
-            # Map similar specializations
-            spec_mapping = {
-                "Technical-Vocational Teacher Education (TVTE)": "Technology and Livelihood Education (TLE)",
-            }
-            mapped_spec = spec_mapping.get(specialization, specialization)
-            spec_questions = SPECIALIZATION_CONTENT_QUESTIONS.get(mapped_spec, {})
-            question_pool = spec_questions.get(difficulty_key, [])
-    else:
-        question_pool = []
-    
-    # If not enough questions at specified difficulty, add from other difficulties
-    all_questions = list(question_pool)
+    ids = get_preset_question_ids(exam_component, specialization, difficulty)
+    all_ids = get_preset_question_ids(exam_component, specialization)
+    if seen is None:
+        if len(ids) < num_questions:
+            ids = all_ids
+        return [PRESET_QUESTIONS[qid] for qid in random.sample(ids, min(num_questions, len(ids)))]
     
-    if len(all_questions) < num_questions:
-        if exam_component == "general_education":
-            source = GENERAL_EDUCATION_QUESTIONS
-        elif exam_component == "professional_education":
-            source = PROFESSIONAL_EDUCATION_QUESTIONS
-        elif exam_component == "specialization":
-            source = SPECIALIZATION_CONTENT_QUESTIONS.get(specialization, {})
-        else:
-            source = {}
-        
-        for diff in ["easy", "medium", "hard"]:
-            if diff != difficulty_key:
-                additional = source.get(diff, [])
-                all_questions.extend(additional)
+    picked = _sample_unseen(ids, num_questions, seen, [])
+    if len(picked) < num_questions and len(ids) >= num_questions:
+        # Every question of this difficulty has been seen - start its rotation over
+        for qid in ids:
+            seen.discard(qid)
+        picked += _sample_unseen(ids, num_questions - len(picked), seen, picked)
+    if len(picked) < num_questions:
+        # Too few questions of this difficulty - fill from the others, then start the pool over
+        picked += _sample_unseen(all_ids, num_questions - len(picked), seen, picked)
+        if len(picked) < num_questions:
+            for qid in all_ids:
+                seen.discard(qid)
+            picked += _sample_unseen(all_ids, num_questions - len(picked), seen, picked)
     
-    # Shuffle and select
-    if all_questions:
-        random.shuffle(all_questions)
-        questions = all_questions[:num_questions]
-    
-    return questions
+    seen.update(picked)
+    return [PRESET_QUESTIONS[qid] for qid in picked]
+
+
+def _sample_unseen(ids: Tuple[int, ...], k: int, seen: Bitset, exclude: List[int]) -> List[int]:
+    unseen = [qid for qid in ids if qid not in seen and qid not in exclude]
+    return random.sample(unseen, min(k, len(unseen)))
 
 
 # Keep backward compatibility
@@ -1330,7 +1396,8 @@ def get_mixed_preset_questions(
     education_level: str,
     specialization: str = None,
     difficulty: str = "Medium",
-    num_questions: int = 5
+    num_questions: int = 5,
+    seen: Optional[Bitset] = None
 ) -> List[Dict]:
     """
     Get a mix of preset questions from all exam components based on weight distribution.
@@ -1342,10 +1409,10 @@ def get_mixed_preset_questions(
     
     questions = []
     
-    questions.extend(get_aligned_preset_questions(education_level, "general_education", specialization, difficulty, gened_count))
-    questions.extend(get_aligned_preset_questions(education_level, "professional_education", specialization, difficulty, profed_count))
+    questions.extend(get_aligned_preset_questions(education_level, "general_education", specialization, difficulty, gened_count, seen))
+    questions.extend(get_aligned_preset_questions(education_level, "professional_education", specialization, difficulty, profed_count, seen))
     if specialization:
-        questions.extend(get_aligned_preset_questions(education_level, "specialization", specialization, difficulty, spec_count))
+        questions.extend(get_aligned_preset_questions(education_level, "specialization", specialization, difficulty, spec_count, seen))
     
     random.shuffle(questions)
     return questions
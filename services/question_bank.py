@@ -0,0 +1,273 @@
+"""
+LEPT AI Reviewer - AI Question Bank Service
+Pre-generated AI questions keyed by (education level, exam component,
+specialization, difficulty). Practice requests without reviewer documents
+are served from the bank instantly; a background worker tops a bank up with
+generate_questions whenever a user gets close to having seen all of it.
+"""
+
+import hashlib
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, FrozenSet, List, Optional, Tuple
+
+import streamlit as st
+
+from config.settings import (
+    QUESTION_BANK_LOW_WATERMARK, QUESTION_BANK_REFILL_BATCH, QUESTION_BANK_MAX_PER_KEY,
+    QUESTION_BANK_REFILL_WORKERS, QUESTION_BANK_CACHE_TTL_SECONDS, QUERY_CACHE_MAX_ENTRIES
+)
+from database.keyed_cache import KeyedTTLCache
+
+
+BankKey = Tuple[str, str, str, str]
+
+
+def make_bank_key(education_level: str, exam_component: str, specialization: Optional[str],
+                  difficulty: str) -> BankKey:
+    """Bank key for an exam config. Specialization only matters for the specialization component."""
+    spec = (specialization or "") if exam_component == "specialization" else ""
+    return (education_level, exam_component, spec, difficulty)
+
+
+def bank_key_str(key: BankKey) -> str:
+    """Flat form of a bank key, as stored in QUESTION_BANK_SERVED."""
+    return "|".join(key)
+
+
+def question_id(question: Dict) -> str:
+    """Stable ID for a question: SHA-256 of its normalized text, so regenerated duplicates merge."""
+    text = " ".join(str(question.get("question", "")).lower().split())
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class QuestionBank:
+    """
+    In-memory view of QUESTION_BANK plus per-user served sets, with a small
+    thread pool for refills.
+
+    Banks are loaded from the database on first use and reloaded after
+    QUESTION_BANK_CACHE_TTL_SECONDS so refills on other servers show up.
+    At most one refill per bank key is in flight at a time.
+    """
+
+    def __init__(self, workers: int = 1):
+        self._executor = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="qbank")
+        # Bank contents and served sets are replaced, never mutated, so they can be shared uncopied
+        self._banks = KeyedTTLCache(maxsize=256, ttl=QUESTION_BANK_CACHE_TTL_SECONDS,
+                                    name="question_bank", copy_values=False)
+        self._served = KeyedTTLCache(maxsize=QUERY_CACHE_MAX_ENTRIES, ttl=QUESTION_BANK_CACHE_TTL_SECONDS,
+                                     name="question_bank_served", copy_values=False)
+        self._lock = threading.Lock()
+        self._refilling = set()
+        self._stats = {"served": 0, "misses": 0, "refills": 0, "refill_failures": 0, "added": 0}
+
+    def take(self, email: str, key: BankKey, count: int) -> Optional[List[Dict]]:
+        """
+        Reserve `count` questions this user hasn't been served from a bank.
+
+        The reservation only hides them from the user's other sessions on
+        this server; call mark_served once the user has been charged for
+        them, or release if the charge failed.
+
+        Returns:
+            List of question dicts, or None if the bank doesn't have enough
+            unseen questions (the caller should generate live). Either way a
+            refill is queued if the user is below the low watermark.
+        """
+        questions = self._questions(key)
+        served = self._served_ids(email, key)
+        with self._lock:
+            # Re-read under the lock - another session of the same user may have just taken some
+            served = self._served.get((email, key), served)
+            unseen = [q for q in questions if q["question_id"] not in served]
+            picked = random.sample(unseen, count) if len(unseen) >= count else None
+            if picked:
+                self._served.set((email, key), served | {q["question_id"] for q in picked})
+                self._stats["served"] += 1
+            else:
+                self._stats["misses"] += 1
+
+        if len(unseen) - (count if picked else 0) < QUESTION_BANK_LOW_WATERMARK:
+            self.request_refill(key, len(questions))
+        if not picked:
+            return None
+        return [dict(q) for q in picked]
+
+    def mark_served(self, email: str, key: BankKey, question_ids: List[str]):
+        """Record questions as served to a user (once they have been charged for them)."""
+        from database.queries import log_served_questions
+
+        with self._lock:
+            served = self._served.get((email, key))
+            if served is not None:
+                self._served.set((email, key), served | set(question_ids))
+        log_served_questions(email, bank_key_str(key), question_ids)
+
+    def release(self, email: str, key: BankKey, question_ids: List[str]):
+        """Undo a take() the user was never charged for."""
+        with self._lock:
+            served = self._served.get((email, key))
+            if served is not None:
+                self._served.set((email, key), served - set(question_ids))
+
+    def add(self, key: BankKey, questions: List[Dict]) -> int:
+        """
+        Add generated questions to a bank.
+
+        Returns:
+            Number of questions new to this server's copy of the bank
+        """
+        from database.queries import save_bank_questions
+
+        questions = [dict(q, question_id=question_id(q)) for q in questions if q.get("question")]
+        if not questions:
+            return 0
+        if not save_bank_questions(*key, questions):
+            print(f"Error saving {len(questions)} questions to bank {bank_key_str(key)}")
+            return 0
+
+        with self._lock:
+            current = self._banks.get(key)
+            if current is not None:
+                known = {q["question_id"] for q in current}
+                new = [q for q in questions if q["question_id"] not in known]
+                self._banks.set(key, current + tuple(new))
+            else:
+                new = questions
+            self._stats["added"] += len(new)
+        return len(new)
+
+    def get_questions(self, key: BankKey) -> Tuple[Dict, ...]:
+        """All questions in a bank (shared - don't mutate)."""
+        return self._questions(key)
+
+    def request_refill(self, key: BankKey, bank_size: int = 0):
+        """Queue a background refill for a bank unless one is running or the bank is full."""
+        if bank_size >= QUESTION_BANK_MAX_PER_KEY:
+            return
+        with self._lock:
+            if key in self._refilling:
+                return
+            self._refilling.add(key)
+        self._executor.submit(self._refill, key)
+
+    def get_stats(self) -> Dict[str, int]:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["refilling"] = len(self._refilling)
+        stats["banks_loaded"] = self._banks.get_stats()["size"]
+        return stats
+
+    def _questions(self, key: BankKey) -> Tuple[Dict, ...]:
+        questions = self._banks.get(key)
+        if questions is None:
+            from database.queries import get_bank_questions
+            questions = tuple(get_bank_questions(*key, limit=QUESTION_BANK_MAX_PER_KEY))
+            self._banks.set(key, questions)
+        return questions
+
+    def _served_ids(self, email: str, key: BankKey) -> FrozenSet[str]:
+        served = self._served.get((email, key))
+        if served is None:
+            from database.queries import get_served_question_ids
+            served = frozenset(get_served_question_ids(email, bank_key_str(key)))
+            self._served.set((email, key), served)
+        return served
+
+    def _refill(self, key: BankKey):
+        # Not generate_questions: its st.error/st.warning calls need a ScriptRunContext
+        from services.ai_generator import build_generation_messages, get_openai_client, _request_questions
+
+        education_level, exam_component, specialization, difficulty = key
+        try:
+            client = get_openai_client()
+            if client is None:
+                raise RuntimeError("OpenAI API key not configured")
+            messages = build_generation_messages(
+                exam_component, specialization or None, difficulty, "",
+                QUESTION_BANK_REFILL_BATCH, education_level
+            )
+            questions = _request_questions(client, messages, QUESTION_BANK_REFILL_BATCH)
+            added = self.add(key, questions) if questions else 0
+            with self._lock:
+                self._stats["refills" if added else "refill_failures"] += 1
+        except Exception as e:
+            print(f"Question bank refill failed for {bank_key_str(key)}: {e}")
+            with self._lock:
+                self._stats["refill_failures"] += 1
+        finally:
+            with self._lock:
+                self._refilling.discard(key)
+
+
+@st.cache_resource
+def get_question_bank() -> QuestionBank:
+    """Create and cache the process-wide question bank."""
+    return QuestionBank(workers=QUESTION_BANK_REFILL_WORKERS)
+
+
+def take_bank_questions(email: str, education_level: str, exam_component: str,
+                        specialization: Optional[str], difficulty: str, count: int) -> Optional[List[Dict]]:
+    """
+    Reserve unseen pre-generated questions for an exam config, or None to
+    generate live. Follow up with mark_bank_questions_served or
+    release_bank_questions depending on whether the charge went through.
+    """
+    try:
+        key = make_bank_key(education_level, exam_component, specialization, difficulty)
+        return get_question_bank().take(email, key, count)
+    except Exception as e:
+        print(f"Error reading question bank: {e}")
+        return None
+
+
+def mark_bank_questions_served(email: str, education_level: str, exam_component: str,
+                               specialization: Optional[str], difficulty: str, questions: List[Dict]):
+    """Record bank (or just-banked) questions as served to a user after a successful charge."""
+    try:
+        key = make_bank_key(education_level, exam_component, specialization, difficulty)
+        get_question_bank().mark_served(email, key, [q.get("question_id") or question_id(q) for q in questions])
+    except Exception as e:
+        print(f"Error recording served bank questions: {e}")
+
+
+def release_bank_questions(email: str, education_level: str, exam_component: str,
+                           specialization: Optional[str], difficulty: str, questions: List[Dict]):
+    """Give back questions reserved by take_bank_questions when the charge failed."""
+    try:
+        key = make_bank_key(education_level, exam_component, specialization, difficulty)
+        get_question_bank().release(email, key, [q["question_id"] for q in questions])
+    except Exception as e:
+        print(f"Error releasing bank questions: {e}")
+
+
+def add_to_bank(education_level: str, exam_component: str, specialization: Optional[str],
+                difficulty: str, questions: List[Dict]) -> int:
+    """Add live-generated questions to the bank so later requests can reuse them."""
+    try:
+        key = make_bank_key(education_level, exam_component, specialization, difficulty)
+        return get_question_bank().add(key, questions)
+    except Exception as e:
+        print(f"Error adding to question bank: {e}")
+        return 0
+
+
+def get_banked_questions(education_level: str, exam_component: str, specialization: Optional[str],
+                         difficulty: str) -> List[Dict]:
+    """Every question in one bank, regardless of who has been served them (e.g. for mock exams)."""
+    try:
+        key = make_bank_key(education_level, exam_component, specialization, difficulty)
+        return [dict(q) for q in get_question_bank().get_questions(key)]
+    except Exception as e:
+        print(f"Error reading question bank: {e}")
+        return []
+
+
+def get_question_bank_stats() -> Dict[str, int]:
+    """Served/miss/refill counters (for the admin panel)."""
+    try:
+        return get_question_bank().get_stats()
+    except Exception:
+        return {}
@@ -14,10 +14,10 @@ from config.settings import (
 )
 from database.queries import (
     get_user_by_email, get_fresh_user_by_email, create_user, update_user_ip,
-    decrement_user_questions, log_usage, check_premium_expiry,
-    update_user_plan, increment_ip_usage, is_ip_blocked
+    charge_questions, refund_questions, check_premium_expiry, update_user_plan
 )
 from database.cached_queries import invalidate_user_cache
+from services.abuse_guard import is_ip_blocked, record_ip_usage
 from utils.ip_utils import get_client_ip
 
 
@@ -28,7 +28,7 @@ def get_or_create_user(email: str) -> Tuple[Optional[dict], str]:
     """
     ip_address = get_client_ip()
     
-    # Check if IP is blocked (cached)
+    # Check if IP is blocked (in-memory list, reconciled in the background)
     if is_ip_blocked(ip_address):
         return None, "This IP address has been blocked. Please contact support."
     
@@ -105,10 +105,14 @@ def can_generate_questions(user: dict) -> Tuple[bool, str]:
 
 
 def use_questions(email: str, ip_address: str, count: int = 1, 
-                  source_type: str = None, category: str = None, difficulty: str = None) -> bool:
+                  source_type: str = None, category: str = None, difficulty: str = None) -> Optional[int]:
     """
-    Decrement question count for a user and log usage.
-    OPTIMIZED: Uses session state user data when possible.
+    Charge questions against the user's quota and log usage.
+    OPTIMIZED: One atomic DB request; the returned remaining count updates
+    session state directly, so no user refetch is needed afterwards.
+    
+    Returns:
+        New questions remaining, or None if the user doesn't have enough left
     """
     # Get user from session state if available, otherwise from DB
     user = st.session_state.get("user")
@@ -116,33 +120,49 @@ def use_questions(email: str, ip_address: str, count: int = 1,
         user = get_user_by_email(email)
     
     if not user:
-        return False
-    
-    # Log the usage
-    log_usage(email, ip_address, count, source_type, category, difficulty)
-    
-    # Increment IP usage
-    increment_ip_usage(ip_address, count)
+        return None
     
-    # Premium users don't decrement quota
+    # Premium users are logged but their quota isn't decremented
+    unlimited = False
     if user.get("plan_type") == PLAN_PREMIUM:
         expiry = user.get("premium_expiry")
         if expiry:
             if isinstance(expiry, str):
                 expiry = datetime.fromisoformat(expiry)
-            if expiry > datetime.now():
-                return True
+            unlimited = expiry > datetime.now()
+    
+    remaining = charge_questions(email, ip_address, count, unlimited, source_type, category, difficulty)
     
-    # Decrement for Free and Pro users
-    result = decrement_user_questions(email, count)
+    # Per-IP totals are batched into IP_USAGE by the abuse guard, off the charge transaction
+    if remaining is not None:
+        record_ip_usage(ip_address, count)
     
     # Update session state with new questions remaining
-    if result and "user" in st.session_state:
-        current_remaining = st.session_state.user.get("questions_remaining", 0)
-        st.session_state.user["questions_remaining"] = max(0, current_remaining - count)
+    if remaining is not None and st.session_state.get("user") and st.session_state.user.get("email") == email:
+        st.session_state.user["questions_remaining"] = remaining
+        if not unlimited:
+            st.session_state.user["questions_used_total"] = (st.session_state.user.get("questions_used_total") or 0) + count
+        st.session_state.user_status = get_user_status(st.session_state.user)
+    
+    return remaining
+
+
+def return_questions(email: str, ip_address: str, count: int, source_type: str = None) -> Optional[int]:
+    """
+    Refund questions charged by use_questions that were never delivered
+    (e.g. a mock exam that came up short). Keeps session state in sync.
+    
+    Returns:
+        New questions remaining, or None on error
+    """
+    remaining = refund_questions(email, ip_address, count, source_type, notes="Refund for undelivered items")
+    
+    if remaining is not None and st.session_state.get("user") and st.session_state.user.get("email") == email:
+        st.session_state.user["questions_remaining"] = remaining
+        st.session_state.user["questions_used_total"] = max(0, (st.session_state.user.get("questions_used_total") or 0) - count)
         st.session_state.user_status = get_user_status(st.session_state.user)
     
-    return result
+    return remaining
 
 
 def get_user_status(user: dict) -> dict:
@@ -231,3 +251,20 @@ def refresh_user_session(force: bool = False):
             if fresh_user:
                 st.session_state.user = fresh_user
                 st.session_state.user_status = get_user_status(fresh_user)
+
+
+def get_preset_seen(user: dict):
+    """The user's seen preset question IDs, from the session's user row - no DB query."""
+    from services.preset_questions import load_preset_seen
+    return load_preset_seen(user.get("preset_seen"))
+
+
+def save_preset_seen(email: str, seen):
+    """Store an updated seen-set in session state now and in USERS in the background."""
+    from services.preset_questions import dump_preset_seen
+    from database.queries import save_preset_seen as queue_preset_seen
+    
+    value = dump_preset_seen(seen)
+    if st.session_state.get("user") and st.session_state.user.get("email") == email:
+        st.session_state.user["preset_seen"] = value
+    queue_preset_seen(email, value)
@@ -0,0 +1,47 @@
+"""
+LEPT AI Reviewer - Bitset Utility
+Compact set of small non-negative integers (e.g. question IDs) with O(1)
+membership, serializable to a short base64 string.
+"""
+
+import base64
+from typing import Iterable
+
+
+class Bitset:
+    """Set of non-negative ints stored one bit each in a bytearray that grows as needed."""
+
+    def __init__(self, data: bytes = b""):
+        self._bits = bytearray(data)
+
+    def __contains__(self, n: int) -> bool:
+        byte = n >> 3
+        return byte < len(self._bits) and bool(self._bits[byte] & (1 << (n & 7)))
+
+    def add(self, n: int):
+        byte = n >> 3
+        if byte >= len(self._bits):
+            self._bits.extend(bytes(byte + 1 - len(self._bits)))
+        self._bits[byte] |= 1 << (n & 7)
+
+    def update(self, numbers: Iterable[int]):
+        for n in numbers:
+            self.add(n)
+
+    def discard(self, n: int):
+        byte = n >> 3
+        if byte < len(self._bits):
+            self._bits[byte] &= ~(1 << (n & 7)) & 0xFF
+
+    def __len__(self) -> int:
+        return sum(bin(b).count("1") for b in self._bits)
+
+    def to_base64(self) -> str:
+        return base64.b64encode(bytes(self._bits.rstrip(b"\x00"))).decode("ascii")
+
+    @classmethod
+    def from_base64(cls, value: str) -> "Bitset":
+        try:
+            return cls(base64.b64decode(value or "", validate=True))
+        except (ValueError, TypeError):
+            return cls()
@@ -4,6 +4,7 @@ LEPT AI Reviewer - File Handling Utilities
 
 import os
 import base64
+import hashlib
 from pathlib import Path
 from typing import Optional, Tuple
 
@@ -43,6 +44,27 @@ def get_file_extension(filename: str) -> str:
     return Path(filename).suffix.lower()
 
 
+def compute_file_hash(uploaded_file, chunk_size: int = 1024 * 1024) -> str:
+    """
+    Compute the SHA-256 hex digest of a file-like object or bytes.
+    
+    Reads in chunks so large uploads are never copied whole, and rewinds
+    the file afterwards for the next reader.
+    """
+    if isinstance(uploaded_file, (bytes, bytearray, memoryview)):
+        return hashlib.sha256(uploaded_file).hexdigest()
+    
+    sha = hashlib.sha256()
+    uploaded_file.seek(0)
+    while True:
+        chunk = uploaded_file.read(chunk_size)
+        if not chunk:
+            break
+        sha.update(chunk)
+    uploaded_file.seek(0)
+    return sha.hexdigest()
+
+
 def encode_file_to_base64(file_bytes: bytes) -> str:
     """Encode file bytes to base64 string for storage."""
     return base64.b64encode(file_bytes).decode('utf-8')
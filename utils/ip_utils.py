@@ -2,49 +2,113 @@
 LEPT AI Reviewer - IP Address Utilities
 """
 
+import ipaddress
+from typing import List, Mapping, Optional
+
 import streamlit as st
-import requests
+
+from config.settings import TRUSTED_PROXIES
+
+
+_TRUSTED_NETWORKS = [ipaddress.ip_network(net, strict=False) for net in TRUSTED_PROXIES]
 
 
 def get_client_ip() -> str:
     """
-    Get the client's IP address.
+    Get the client's IP address from the request headers.
     
-    In Streamlit Cloud or behind a proxy, we try multiple methods:
-    1. X-Forwarded-For header (when behind proxy/load balancer)
-    2. External IP service (fallback)
-    3. Default placeholder if all else fails
+    Resolved once per session and memoized in st.session_state.client_ip;
+    no outbound HTTP is made, so this never adds network latency.
+    1. X-Forwarded-For - the right-most address that isn't a trusted proxy
+    2. X-Real-IP (set by nginx-style proxies)
+    3. "unknown" if neither header holds a valid address
     
     Returns:
         Client IP address as string
     """
-    # Try to get from Streamlit's experimental features if available
     try:
-        # Check for headers in session state (if set by middleware)
         if "client_ip" in st.session_state:
             return st.session_state.client_ip
-    except:
+    except Exception:
         pass
     
-    # Try external IP service as fallback
+    ip = resolve_client_ip(_get_request_headers()) or "unknown"
     try:
-        response = requests.get("https://api.ipify.org?format=json", timeout=5)
-        if response.status_code == 200:
-            ip = response.json().get("ip", "unknown")
-            return ip
-    except:
+        st.session_state.client_ip = ip
+    except Exception:
         pass
+    return ip
+
+
+def resolve_client_ip(headers: Mapping[str, str]) -> Optional[str]:
+    """
+    Pick the client address out of proxy headers.
+    
+    Each proxy appends the address it received the request from to
+    X-Forwarded-For, so walking the list from the right and skipping our
+    own (trusted) proxies gives the first address a client could not have
+    forged. If every hop is trusted, the left-most address is used.
+    """
+    forwarded = _parse_ip_list(_header(headers, "X-Forwarded-For"))
+    for ip in reversed(forwarded):
+        if not is_trusted_proxy(ip):
+            return ip
+    if forwarded:
+        return forwarded[0]
     
-    # Try alternative service
+    real_ip = _parse_ip_list(_header(headers, "X-Real-IP"))
+    return real_ip[0] if real_ip else None
+
+
+def is_trusted_proxy(ip: str) -> bool:
+    """True if ip belongs to one of the TRUSTED_PROXIES networks."""
+    try:
+        address = ipaddress.ip_address(ip)
+    except ValueError:
+        return False
+    return any(address in network for network in _TRUSTED_NETWORKS)
+
+
+def _get_request_headers() -> Mapping[str, str]:
+    """Headers of the session's websocket request (st.context on Streamlit >= 1.37)."""
     try:
-        response = requests.get("https://ifconfig.me/ip", timeout=5)
-        if response.status_code == 200:
-            return response.text.strip()
-    except:
+        headers = st.context.headers
+        if headers is not None:
+            return headers
+    except AttributeError:
         pass
+    except Exception:
+        return {}
     
-    # Return placeholder if all methods fail
-    return "unknown"
+    try:
+        from streamlit.web.server.websocket_headers import _get_websocket_headers
+        return _get_websocket_headers() or {}
+    except Exception:
+        return {}
+
+
+def _header(headers: Mapping[str, str], name: str) -> str:
+    value = headers.get(name)
+    if value is None:
+        # Plain dicts aren't case-insensitive like the request header objects
+        value = next((v for k, v in headers.items() if k.lower() == name.lower()), None)
+    return value or ""
+
+
+def _parse_ip_list(value: str) -> List[str]:
+    """Valid addresses from a comma-separated header value, ports and brackets stripped."""
+    ips = []
+    for part in value.split(","):
+        part = part.strip().strip('"')
+        if part.startswith("["):
+            part = part[1:part.find("]")] if "]" in part else part[1:]
+        elif part.count(":") == 1:
+            part = part.split(":")[0]  # IPv4 with port
+        try:
+            ips.append(str(ipaddress.ip_address(part)))
+        except ValueError:
+            continue
+    return ips
 
 
 def mask_ip(ip: str) -> str:
@@ -0,0 +1,164 @@
+"""
+LEPT AI Reviewer - Rate Limiting Utilities
+Thread-safe token buckets shared by every session in the server process:
+one global bucket (e.g. OpenAI tokens per minute) or one bucket per key
+(e.g. generations per IP / email).
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional
+
+
+class TokenBucket:
+    """
+    Token bucket refilled continuously at `rate_per_minute`, holding at most
+    `capacity` tokens (defaults to one minute's worth).
+
+    acquire() blocks until enough tokens are available (or the timeout
+    passes); refund() returns tokens that were reserved but not used, e.g.
+    when a completion used fewer tokens than estimated.
+    """
+
+    def __init__(self, rate_per_minute: float, capacity: Optional[float] = None, name: str = "bucket"):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = float(capacity if capacity is not None else rate_per_minute)
+        self.name = name
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._cond = threading.Condition()
+        self._stats = {"acquired": 0, "rejected": 0, "waited": 0, "wait_seconds": 0.0}
+
+    def try_acquire(self, tokens: float = 1) -> bool:
+        """Take tokens if available right now, without waiting."""
+        return self.acquire(tokens, timeout=0)
+
+    def acquire(self, tokens: float = 1, timeout: Optional[float] = None) -> bool:
+        """
+        Take tokens, waiting for the bucket to refill if needed.
+
+        Requests larger than the capacity are clamped to it so they can
+        eventually succeed.
+
+        Returns:
+            True if acquired, False if the timeout passed first
+        """
+        tokens = min(float(tokens), self.capacity)
+        start = time.monotonic()
+        deadline = None if timeout is None else start + timeout
+        with self._cond:
+            while True:
+                self._refill_locked()
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    waited = time.monotonic() - start
+                    self._stats["acquired"] += 1
+                    if waited > 0.001:
+                        self._stats["waited"] += 1
+                        self._stats["wait_seconds"] += waited
+                    return True
+                wait = (tokens - self._tokens) / self.rate if self.rate > 0 else 1.0
+                if deadline is not None:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._stats["rejected"] += 1
+                        return False
+                    wait = min(wait, remaining)
+                self._cond.wait(wait)
+
+    def refund(self, tokens: float):
+        """Give back unused tokens (never above capacity)."""
+        if tokens <= 0:
+            return
+        with self._cond:
+            self._refill_locked()
+            self._tokens = min(self.capacity, self._tokens + tokens)
+            self._cond.notify_all()
+
+    def available(self) -> float:
+        with self._cond:
+            self._refill_locked()
+            return self._tokens
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._cond:
+            self._refill_locked()
+            stats = dict(self._stats)
+            stats["available"] = int(self._tokens)
+            stats["capacity"] = int(self.capacity)
+        return stats
+
+    def _refill_locked(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+
+class KeyedRateLimiter:
+    """
+    A token bucket per key, `burst` tokens deep and refilled at
+    `rate_per_minute`, kept in one LRU-bounded dict.
+
+    Checks never block or touch the database - try_acquire is a dict lookup
+    and some arithmetic under a lock. Keys idle long enough to be evicted
+    simply come back with a full bucket.
+    """
+
+    def __init__(self, rate_per_minute: float, burst: float, max_keys: int = 50000, name: str = "limiter"):
+        self.rate = rate_per_minute / 60.0
+        self.burst = float(burst)
+        self.max_keys = max_keys
+        self.name = name
+        self._buckets: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"allowed": 0, "throttled": 0}
+
+    def try_acquire(self, key: Hashable, tokens: float = 1) -> bool:
+        """Take tokens from key's bucket if it has them; never waits."""
+        now = time.monotonic()
+        with self._lock:
+            available = self._available_locked(key, now)
+            allowed = available >= tokens
+            if allowed:
+                available -= tokens
+            self._buckets[key] = (available, now)
+            self._buckets.move_to_end(key)
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+            self._stats["allowed" if allowed else "throttled"] += 1
+        return allowed
+
+    def has_tokens(self, key: Hashable, tokens: float = 1) -> bool:
+        """Check key's bucket without taking anything (a miss counts as throttled)."""
+        with self._lock:
+            allowed = self._available_locked(key, time.monotonic()) >= tokens
+            if not allowed:
+                self._stats["throttled"] += 1
+        return allowed
+
+    def refund(self, key: Hashable, tokens: float = 1):
+        """Give back tokens taken for a request that didn't go through (never above burst)."""
+        now = time.monotonic()
+        with self._lock:
+            if key in self._buckets:
+                self._buckets[key] = (min(self.burst, self._available_locked(key, now) + tokens), now)
+
+    def retry_after(self, key: Hashable, tokens: float = 1) -> float:
+        """Seconds until key's bucket will have `tokens` again (0 if it does now)."""
+        with self._lock:
+            missing = tokens - self._available_locked(key, time.monotonic())
+        return max(0.0, missing / self.rate) if self.rate > 0 else float("inf")
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["keys"] = len(self._buckets)
+        return stats
+
+    def _available_locked(self, key: Hashable, now: float) -> float:
+        state = self._buckets.get(key)
+        if state is None:
+            return self.burst
+        tokens, updated = state
+        return min(self.burst, tokens + (now - updated) * self.rate)
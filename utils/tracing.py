@@ -0,0 +1,241 @@
+"""
+LEPT AI Reviewer - Request Tracing
+Lightweight spans (trace/span/parent IDs, timestamps, attributes) carried in
+a contextvar, so nested calls - page render, DB queries, OpenAI calls,
+extraction - become children of whatever span is open. When a root span
+ends, its whole trace is appended to a Chrome trace-event file that opens
+as a timeline/flame chart in ui.perfetto.dev or chrome://tracing.
+
+Tracing is off unless TRACING_ENABLED is set (or switched on from the admin
+panel); disabled spans are a shared no-op object, as are child_span()s
+opened outside any trace.
+"""
+
+import contextvars
+import functools
+import json
+import os
+import secrets
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from config.settings import TRACING_ENABLED, TRACE_FILE, TRACE_MAX_FILE_MB, TRACE_MIN_ROOT_MS
+
+
+class Span:
+    """
+    One timed operation. Use as a context manager (or call end()); spans
+    started while it is current become its children.
+    """
+
+    __slots__ = ("name", "trace_id", "span_id", "parent_id", "start", "duration",
+                 "attributes", "thread_id", "_trace", "_token")
+
+    def __init__(self, name: str, parent: Optional["Span"], attributes: Dict[str, Any]):
+        self.name = name
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent.span_id if parent else None
+        self.trace_id = parent.trace_id if parent else secrets.token_hex(16)
+        # Spans of one trace are collected on the root and exported together
+        self._trace: List["Span"] = parent._trace if parent else []
+        self.attributes = attributes
+        self.thread_id = threading.get_ident()
+        self.duration: Optional[float] = None
+        self.start = time.time()
+        self._token = _current_span.set(self)
+
+    def set(self, **attributes):
+        """Add or overwrite attributes."""
+        self.attributes.update(attributes)
+
+    def end(self, error: Optional[BaseException] = None):
+        if self.duration is not None:
+            return
+        self.duration = time.time() - self.start
+        if error is not None:
+            self.attributes["error"] = type(error).__name__
+        try:
+            _current_span.reset(self._token)
+        except ValueError:
+            # Ended from a different context (e.g. another thread) - just drop back to the parent
+            pass
+        self._trace.append(self)
+        if self.parent_id is None:
+            _export(self._trace)
+
+    def __enter__(self) -> "Span":
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.end(exc)
+        return False
+
+
+class _NoopSpan:
+    """Returned while tracing is disabled."""
+
+    __slots__ = ()
+
+    def set(self, **attributes):
+        pass
+
+    def end(self, error: Optional[BaseException] = None):
+        pass
+
+    def __enter__(self) -> "_NoopSpan":
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NOOP_SPAN = _NoopSpan()
+_current_span: contextvars.ContextVar = contextvars.ContextVar("lept_current_span", default=None)
+_enabled = TRACING_ENABLED
+
+
+def span(name: str, **attributes) -> Span:
+    """
+    Start a span as a child of the current one (or a new trace).
+
+        with span("db.query", statement=key) as s:
+            ...
+            s.set(rows=len(rows))
+    """
+    if not _enabled:
+        return _NOOP_SPAN
+    return Span(name, _current_span.get(), attributes)
+
+
+def child_span(name: str, **attributes):
+    """
+    Like span(), but a no-op when no trace is open. For low-level operations
+    (DB queries) that background threads - abuse-guard reconciles, the
+    write-behind flusher, pool health checks - also run, so each of those
+    doesn't export as a one-span trace of its own.
+    """
+    parent = _current_span.get()
+    if not _enabled or parent is None:
+        return _NOOP_SPAN
+    return Span(name, parent, attributes)
+
+
+def current_span():
+    """The innermost open span (a no-op span if none)."""
+    return _current_span.get() or _NOOP_SPAN
+
+
+def traced(name: Optional[str] = None) -> Callable:
+    """Decorator: run the function inside a span named `name` (default: module.function)."""
+    def decorator(func: Callable) -> Callable:
+        span_name = name or f"{func.__module__}.{func.__name__}"
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+            with span(span_name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def bind_context(func: Callable) -> Callable:
+    """
+    Wrap a callable to run in a copy of the caller's context, so spans it
+    opens on a worker thread nest under the caller's current span.
+    """
+    context = contextvars.copy_context()
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        # A fresh copy per call - one context can't be entered by two threads at once
+        return context.copy().run(func, *args, **kwargs)
+    return wrapper
+
+
+def set_tracing_enabled(enabled: bool):
+    """Turn tracing on/off for the whole process (spans already open still finish)."""
+    global _enabled
+    _enabled = bool(enabled)
+
+
+def is_tracing_enabled() -> bool:
+    return _enabled
+
+
+# ============== EXPORT ==============
+
+class ChromeTraceExporter:
+    """
+    Appends spans to a Chrome trace-event JSON file as complete ("X")
+    events, one line per span. The array is left unterminated, which the
+    Perfetto and chrome://tracing viewers accept, so the file can be
+    appended to forever; it rolls over to `<path>.1` past `max_bytes`.
+    """
+
+    def __init__(self, path: str, max_bytes: int):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+        self._stats = {"traces": 0, "spans": 0, "dropped": 0}
+
+    def export(self, spans: List[Span]):
+        lines = "".join(json.dumps(self._event(s), default=str) + ",\n" for s in spans)
+        with self._lock:
+            try:
+                directory = os.path.dirname(self.path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                if os.path.exists(self.path) and os.path.getsize(self.path) > self.max_bytes:
+                    os.replace(self.path, self.path + ".1")
+                new_file = not os.path.exists(self.path)
+                with open(self.path, "a", encoding="utf-8") as f:
+                    if new_file:
+                        f.write("[\n")
+                    f.write(lines)
+                self._stats["traces"] += 1
+                self._stats["spans"] += len(spans)
+            except OSError as e:
+                self._stats["dropped"] += 1
+                print(f"Trace export failed: {e}")
+
+    def get_stats(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._stats)
+
+    def _event(self, s: Span) -> Dict[str, Any]:
+        return {
+            "name": s.name,
+            "cat": s.name.split(".", 1)[0],
+            "ph": "X",
+            "ts": int(s.start * 1_000_000),
+            "dur": int((s.duration or 0) * 1_000_000),
+            "pid": self._pid,
+            "tid": s.thread_id,
+            "args": dict(s.attributes, trace_id=s.trace_id, span_id=s.span_id, parent_id=s.parent_id),
+        }
+
+
+_exporter = ChromeTraceExporter(TRACE_FILE, TRACE_MAX_FILE_MB * 1024 * 1024)
+
+
+def _export(spans: List[Span]):
+    root = spans[-1]
+    if (root.duration or 0) * 1000 < TRACE_MIN_ROOT_MS:
+        return
+    # Parents end after their children - sort so viewers get start order
+    _exporter.export(sorted(spans, key=lambda s: s.start))
+
+
+def get_trace_file() -> str:
+    return _exporter.path
+
+
+def get_tracing_stats() -> Dict[str, Any]:
+    """Exporter counters (for the admin panel)."""
+    stats = dict(_exporter.get_stats(), enabled=_enabled, file=_exporter.path)
+    stats["file_bytes"] = os.path.getsize(_exporter.path) if os.path.exists(_exporter.path) else 0
+    return stats